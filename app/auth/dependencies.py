@@ -1,4 +1,6 @@
-from fastapi import Cookie, Depends
+import time
+
+from fastapi import Cookie, Depends, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import ExpiredSignatureError, JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -12,25 +14,52 @@ from app.auth.exceptions import (
     AccessTokenInvalid,
     RefreshTokenNotValid,
 )
-from app.auth.schemas import JWTData
+from app.auth.schemas import AuthUser, JWTData
 from app.auth.services import TokenService
 from app.config import settings
-from app.database import get_db
+from app.database import async_session, get_db, get_read_db
+from app.external.redis_db.dependencies import get_redis_service
+from app.external.redis_db.services import RedisService
+from app.users.cache import user_cache
 from app.users.models import UserModel, UserRole
 from app.users.services import UserService
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/token", auto_error=False)
 
 
+def get_token_service(request: Request) -> TokenService:
+    """
+    Returns a token service, with the Redis session store if it is enabled.
+
+    The sessions are not cached in the process, so a revoked session
+    is not served by the other workers.
+
+    Args:
+        request (Request): The current request.
+
+    Returns:
+        TokenService: The token service.
+    """
+
+    if not settings.SESSION_STORE_ENABLED:
+        return TokenService()
+
+    return TokenService(RedisService(request.app.state.redis_pool))
+
+
 async def get_user_from_refresh_token(
     db: AsyncSession = Depends(get_db),
     refresh_token_value: str = Cookie(default=None, alias="refreshToken"),
-    token_service: TokenService = Depends(TokenService),
+    token_service: TokenService = Depends(get_token_service),
     user_service: UserService = Depends(UserService),
 ) -> UserModel:
     """
     Retrieves a user from the database using a refresh token.
 
+    The token and the user are read from the primary: the access tokens
+    are issued from this user, and a replica may not have the latest
+    changes of the user or the revocation of the token yet.
+
     Args:
         db (AsyncSession): Async database session
         db_refresh_token (RefreshToken): The refresh token from the database
@@ -82,24 +111,29 @@ async def get_admin_from_refresh_token(
 
 
 async def get_user_from_access_token(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     access_token: str = Depends(oauth2_scheme),
     user_service: UserService = Depends(UserService),
-) -> UserModel:
+    cache: RedisService = Depends(get_redis_service),
+) -> AuthUser:
     """
     Retrieves a user by access token.
 
+    The user claims of the token are trusted unless the user was changed
+    after the token was issued. Otherwise the user is taken from
+    the in-process cache or loaded from the database. The changes are
+    shared by all the workers through Redis.
+
     Args:
         db (AsyncSession): The async session for database operations.
         access_token (str): The access token for authentication.
         user_service (UserService): The user manager for user-related operations.
+        cache (RedisService): The Redis service with the user changes.
 
     Returns:
-        User: The user corresponding to the provided access token.
+        AuthUser: The user corresponding to the provided access token.
     """
 
-    print("!!!!!!! get_user_from_access_token")
-
     if not access_token:
         raise AccessTokenRequired()
 
@@ -118,26 +152,53 @@ async def get_user_from_access_token(
         raise AccessTokenInvalid()
 
     user_id = jwt_token.user_id
-    user_db = await user_service.get_by_id(db, user_id)
+    changed_at = await user_cache.get_changed_at(cache, user_id)
+
+    if (
+        settings.ACCESS_TOKEN_STATELESS
+        and jwt_token.role
+        and not user_cache.is_changed_since(changed_at, jwt_token.issued_at)
+    ):
+        return AuthUser(
+            id=user_id,
+            role=jwt_token.role,
+            membership_status=jwt_token.membership_status,
+            unavailable_categories=jwt_token.unavailable_categories,
+        )
+
+    auth_user = user_cache.get(user_id, changed_at)
+    if auth_user:
+        return auth_user
+
+    loaded_at = time.time()
+    if changed_at and loaded_at - changed_at < settings.READ_YOUR_WRITES_WINDOW:
+        # the replica may not have the change yet
+        async with async_session() as primary_db:
+            user_db = await user_service.get_by_id(primary_db, user_id)
+    else:
+        user_db = await user_service.get_by_id(db, user_id)
 
     if not user_db:
         raise AccessTokenInvalid()
 
-    return user_db
+    auth_user = auth_utils.get_auth_user(user_db)
+    user_cache.set(auth_user, loaded_at)
+
+    return auth_user
 
 
 # TODO do I need it ???
 async def get_admin_from_access_token(
-    user: UserModel = Depends(get_user_from_access_token),
-) -> UserModel:
+    user: AuthUser = Depends(get_user_from_access_token),
+) -> AuthUser:
     """
     Retrieves the admin user from a access token.
 
     Args:
-        user (User): The user from the access token
+        user (AuthUser): The user from the access token
 
     Returns:
-        User: The admin user
+        AuthUser: The admin user
     """
 
     if user.role != UserRole.ADMIN:
@@ -1,6 +1,6 @@
 from fastapi import status
 
-from app.exceptions import DetailedHTTPException
+from app.exceptions import DetailedHTTPException, ServiceUnavailable
 
 
 class ErrorCode:
@@ -12,6 +12,7 @@ class ErrorCode:
     REFRESH_TOKEN_REQUIRED = "Refresh token is required either in the body or cookie."
     ACCESS_TOKEN_REQUIRED = "Access token is required in the Authorization header."
     ACCESS_TOKEN_EXPIRED = "Access token has expired. Get a new one."
+    PASSWORD_HASHER_BUSY = "Too many authentication requests. Try again later."
 
 
 class NotAuthenticated(DetailedHTTPException):
@@ -53,3 +54,7 @@ class AccessTokenExpired(PermissionDenied):
 
 class AccessTokenInvalid(PermissionDenied):
     DETAIL = ErrorCode.INVALID_TOKEN
+
+
+class PasswordHasherBusy(ServiceUnavailable):
+    DETAIL = ErrorCode.PASSWORD_HASHER_BUSY
@@ -0,0 +1,126 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import bcrypt
+
+from app.auth.exceptions import PasswordHasherBusy
+from app.auth.schemas import PasswordHasherStats
+from app.config import settings
+from app.metrics import password_hash_wait
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated bounded thread pool.
+
+    bcrypt releases the GIL while hashing, so the hashes are computed
+    in parallel without blocking the event loop. When too many calls are
+    pending, new ones are rejected instead of queueing without limit.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, rounds: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.executor: ThreadPoolExecutor | None = None
+        self.pending = 0  # calls submitted to the pool and not finished yet
+        self.rejected = 0
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """
+        Runs the function in the thread pool.
+
+        Args:
+            func (Callable): The blocking function to run.
+            *args: The arguments of the function.
+
+        Raises:
+            PasswordHasherBusy: If there are too many pending calls.
+
+        Returns:
+            Any: The result of the function.
+        """
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="password-hasher"
+            )
+
+        def timed() -> tuple[float, Any]:
+            return time.perf_counter(), func(*args)
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            submitted_at = time.perf_counter()
+            started_at, result = await loop.run_in_executor(self.executor, timed)
+            password_hash_wait.observe(started_at - submitted_at)
+            return result
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> bytes:
+        """
+        Hashes the given password using bcrypt.
+
+        Args:
+            password (str): The password to be hashed.
+
+        Returns:
+            bytes: The hashed password.
+        """
+
+        pw = bytes(password, "utf-8")
+        salt = bcrypt.gensalt(rounds=self.rounds)
+
+        return await self.run(bcrypt.hashpw, pw, salt)
+
+    async def check(self, password: str, password_in_db: bytes) -> bool:
+        """
+        Checks if the password matches the hashed password.
+
+        Args:
+            password (str): The password to be checked.
+            password_in_db (bytes): The hashed password.
+
+        Returns:
+            bool: True if the password matches, False otherwise.
+        """
+
+        password_bytes = bytes(password, "utf-8")
+
+        return await self.run(bcrypt.checkpw, password_bytes, password_in_db)
+
+    async def shutdown(self) -> None:
+        """Stops the thread pool after the pending calls are finished"""
+
+        if self.executor is None:
+            return
+
+        executor, self.executor = self.executor, None
+        # waited for in another thread, the event loop keeps running meanwhile
+        await asyncio.to_thread(executor.shutdown, True)
+
+    def stats(self) -> PasswordHasherStats:
+        """Returns the current usage statistics of the hasher"""
+
+        return PasswordHasherStats(
+            max_workers=self.max_workers,
+            max_pending=self.max_pending,
+            pending=self.pending,
+            queued=max(self.pending - self.max_workers, 0),
+            rejected=self.rejected,
+        )
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASH_MAX_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    rounds=settings.PASSWORD_HASH_ROUNDS,
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -10,12 +10,17 @@ class RefreshTokenModel(Base):
 
     uuid = Column(UUID, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"))
-    refresh_token = Column(String)
-    expires_at = Column(DateTime)
+    token_digest = Column(String(64), unique=True, index=True)  # SHA-256 of the value
+    expires_at = Column(DateTime, index=True)  # expired tokens are purged in batches
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     user = relationship("UserModel", back_populates="refresh_tokens")
 
+    __table_args__ = (
+        # the active sessions of a user, newest first
+        Index("refresh_token_user_id_expires_at_idx", "user_id", "expires_at"),
+    )
+
     def __str__(self):
         return f" Refresh token {self.uuid}"
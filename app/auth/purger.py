@@ -0,0 +1,67 @@
+import asyncio
+import logging
+
+from app.auth.services import TokenService
+from app.config import settings
+from app.database import async_session
+from app.metrics import refresh_tokens_purged
+
+
+class TokenPurger:
+    """
+    Deletes the expired refresh tokens every `interval` seconds.
+
+    Every worker may run it, the purges skip the tokens locked by each other.
+    """
+
+    def __init__(self, interval: int, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Starts purging the tokens periodically"""
+
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stops the purges, the current batch is rolled back"""
+
+        if self.task is None:
+            return
+
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    async def run(self) -> None:
+        """Purges the tokens until stopped"""
+
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.purge()
+
+    async def purge(self) -> int:
+        """
+        Deletes the expired tokens.
+
+        Returns:
+            int: The number of deleted tokens.
+        """
+
+        try:
+            async with async_session() as db:
+                purged = await TokenService().purge_expired_tokens(db, self.batch_size)
+        except Exception as error:
+            logging.warning(f"Failed to purge the refresh tokens: {error}")
+            return 0
+
+        refresh_tokens_purged.inc(amount=purged)
+
+        return purged
+
+
+token_purger = TokenPurger(
+    interval=settings.TOKEN_PURGE_INTERVAL,
+    batch_size=settings.TOKEN_PURGE_BATCH_SIZE,
+)
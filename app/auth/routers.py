@@ -2,7 +2,7 @@ from fastapi import APIRouter, Cookie, Depends, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth.dependencies import get_user_from_refresh_token
+from app.auth.dependencies import get_token_service, get_user_from_refresh_token
 from app.auth.exceptions import InvalidCredentials
 from app.auth.schemas import (
     AccessTokenResponse,
@@ -48,7 +48,7 @@ async def login(
     response: Response,
     db: AsyncSession = Depends(get_db),
     auth_form: OAuth2PasswordRequestForm = Depends(),
-    token_service: TokenService = Depends(TokenService),
+    token_service: TokenService = Depends(get_token_service),
     user_service: UserService = Depends(UserService),
 ) -> dict:
     """Authenticates user and sets a cookie with the refresh token"""
@@ -80,7 +80,7 @@ async def logout_user(
     response: Response,
     db: AsyncSession = Depends(get_db),
     refresh_token_value: str = Cookie(..., alias="refreshToken"),
-    token_service: TokenService = Depends(TokenService),
+    token_service: TokenService = Depends(get_token_service),
 ) -> None:
     """Deletes the refresh token from cookie and expires it"""
 
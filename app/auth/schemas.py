@@ -1,9 +1,33 @@
+from datetime import datetime
+
 from pydantic import BaseModel as BaseSchema, Field
 
+from app.users.schemas import MembershipStatus, UserRole
+
 
 class JWTData(BaseSchema):
     user_id: int = Field(alias="sub")
     is_admin: bool = False
+    issued_at: int | None = Field(default=None, alias="iat")
+    role: UserRole | None = None
+    membership_status: MembershipStatus | None = None
+    unavailable_categories: list[int] = []
+
+
+class AuthUser(BaseSchema):
+    id: int
+    role: UserRole
+    membership_status: MembershipStatus | None = None
+    unavailable_categories: list[int] = []
+
+
+class RefreshTokenSession(BaseSchema):
+    uuid: str
+    user_id: int
+    expires_at: datetime  # naive UTC, as in the database
+
+    class Config:
+        from_attributes = True
 
 
 class AccessTokenResponse(BaseSchema):
@@ -20,3 +44,11 @@ class SuccessLoginPesponse(BaseSchema):
 
 class SuccessLogoutPesponse(BaseSchema):
     detail: str = "Logout successful"
+
+
+class PasswordHasherStats(BaseSchema):
+    max_workers: int
+    max_pending: int
+    pending: int  # calls being hashed or waiting for a worker
+    queued: int  # calls waiting for a worker
+    rejected: int
@@ -2,15 +2,39 @@ import uuid
 from datetime import datetime, timedelta
 
 from pydantic import UUID4
+from sqlalchemy import delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.auth import utils as auth_utils
 from app.auth.models import RefreshTokenModel
+from app.auth.schemas import RefreshTokenSession
 from app.config import settings
+from app.external.redis_db.services import RedisService
+
+# stores the session unless it was revoked meanwhile, returns 1 if it was stored
+STORE_SESSION_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
 
 
 class TokenService:
+    """
+    Issues and validates the refresh tokens.
+
+    Only the SHA-256 digests of the values are stored. With a session store
+    the tokens are also kept in Redis by digest until they expire, so
+    the validation of a token does not query the database. A revoked token
+    leaves a short-lived tombstone, so that a lookup which read it before
+    the revocation does not store it again.
+    """
+
+    def __init__(self, session_store: RedisService | None = None):
+        self.session_store = session_store
 
     async def create_refresh_token(
         self,
@@ -20,6 +44,9 @@ class TokenService:
         """
         Creates new refresh token for a user and saves it in the database.
 
+        The oldest active tokens of the user beyond `MAX_SESSIONS_PER_USER`
+        are revoked.
+
         Args:
             db (AsyncSession): The asynchronous database session.
             user_id (int): The ID of the user for whom the refresh token is being created.
@@ -29,41 +56,71 @@ class TokenService:
         """
 
         refresh_token_value = auth_utils.generate_random_alphanum(64)
+        token_digest = auth_utils.hash_refresh_token(refresh_token_value)
 
-        new_token = RefreshTokenModel(
+        session = RefreshTokenSession(
+            uuid=str(uuid.uuid4()),
             user_id=user_id,
-            refresh_token=refresh_token_value,
             expires_at=datetime.utcnow() + timedelta(seconds=settings.REFRESH_TOKEN_EXP),
-            uuid=str(uuid.uuid4()),
         )
+        new_token = RefreshTokenModel(token_digest=token_digest, **session.model_dump())
 
+        revoked_digests = await self._revoke_old_sessions(db, user_id)
         db.add(new_token)
         await db.commit()
 
+        await self._store_session(token_digest, session)
+        for revoked_digest in revoked_digests:
+            await self._delete_session(revoked_digest)
+
         return refresh_token_value
 
     async def get_refresh_token_by_value(
         self,
         db: AsyncSession,
         refresh_token: str,
-    ) -> RefreshTokenModel | None:
+        *,
+        backfill: bool = True,
+    ) -> RefreshTokenSession | None:
         """
-        Asynchronous function to retrieve a refresh token from the database.
+        Retrieves a refresh token by its value, from the session store if possible.
+
+        A token missing in the session store is stored again only if it is
+        active and `db` is a session of the primary, as a replica may not
+        have its revocation yet.
 
         Args:
             db (AsyncSession): The asynchronous session to interact with the database.
             refresh_token (str): The refresh token to retrieve.
+            backfill (bool, optional): Whether a token read from the database
+                is stored in the session store. Defaults to True.
 
         Returns:
-            Union[RefreshTokenModel, None]: The retrieved refresh token, if found, or None.
+            Union[RefreshTokenSession, None]: The retrieved refresh token, if found, or None.
         """
 
+        token_digest = auth_utils.hash_refresh_token(refresh_token)
+
+        if self.session_store is not None:
+            value = await self.session_store.client.get(self._session_key(token_digest))
+            if value is not None:
+                return RefreshTokenSession.model_validate_json(value)
+
         q = select(RefreshTokenModel).filter(
-            RefreshTokenModel.refresh_token == refresh_token
+            RefreshTokenModel.token_digest == token_digest
         )
         result = await db.execute(q)
+        token = result.scalars().first()
+
+        if token is None:
+            return None
+
+        # the tokens issued before the session store was enabled, or evicted
+        session = RefreshTokenSession.model_validate(token)
+        if backfill and not auth_utils.is_refresh_token_expired(session):
+            await self._store_session(token_digest, session, if_not_revoked=True)
 
-        return result.scalars().first()
+        return session
 
     async def get_refresh_token_by_uuid(
         self, db: AsyncSession, refresh_token_uuid: str
@@ -103,3 +160,107 @@ class TokenService:
         if token:
             token.expires_at = datetime.utcnow() - timedelta(days=1)
             await db.commit()
+
+            await self._delete_session(token.token_digest)
+
+    async def purge_expired_tokens(self, db: AsyncSession, batch_size: int) -> int:
+        """
+        Deletes the expired refresh tokens, in transactions of `batch_size` tokens.
+
+        The tokens locked by another purge are skipped, so the workers may
+        purge at the same time. Their sessions have already left the store.
+
+        Args:
+            db (AsyncSession): The database session.
+            batch_size (int): The number of tokens deleted in one transaction.
+
+        Returns:
+            int: The number of deleted tokens.
+        """
+
+        expired = (
+            select(RefreshTokenModel.uuid)
+            .filter(RefreshTokenModel.expires_at < datetime.utcnow())
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        q = delete(RefreshTokenModel).filter(RefreshTokenModel.uuid.in_(expired))
+
+        purged = 0
+        while True:
+            result = await db.execute(
+                q, execution_options={"synchronize_session": False}
+            )
+            await db.commit()
+            purged += result.rowcount
+
+            if result.rowcount < batch_size:
+                return purged
+
+    async def _revoke_old_sessions(self, db: AsyncSession, user_id: int) -> list[str]:
+        """Deletes the oldest active tokens to make room for a new one"""
+
+        if not settings.MAX_SESSIONS_PER_USER:
+            return []
+
+        oldest = (
+            select(RefreshTokenModel.uuid)
+            .filter(
+                RefreshTokenModel.user_id == user_id,
+                RefreshTokenModel.expires_at > datetime.utcnow(),
+            )
+            .order_by(RefreshTokenModel.expires_at.desc())
+            .offset(settings.MAX_SESSIONS_PER_USER - 1)
+        )
+        q = (
+            delete(RefreshTokenModel)
+            .filter(RefreshTokenModel.uuid.in_(oldest))
+            .returning(RefreshTokenModel.token_digest)
+        )
+        result = await db.execute(q, execution_options={"synchronize_session": False})
+
+        return list(result.scalars())
+
+    async def _delete_session(self, token_digest: str) -> None:
+        """Removes the refresh token from the session store, leaving a tombstone"""
+
+        if self.session_store is None:
+            return
+
+        async with self.session_store.client.pipeline(transaction=True) as pipe:
+            pipe.delete(self._session_key(token_digest))
+            pipe.set(
+                self._tombstone_key(token_digest), 1, ex=settings.SESSION_TOMBSTONE_TTL
+            )
+            await pipe.execute()
+
+    async def _store_session(
+        self,
+        token_digest: str,
+        session: RefreshTokenSession,
+        if_not_revoked: bool = False,
+    ) -> None:
+        """Keeps the refresh token in the session store until it expires"""
+
+        if self.session_store is None:
+            return
+
+        ttl = int((session.expires_at - datetime.utcnow()).total_seconds())
+        if ttl <= 0:
+            return
+
+        key, value = self._session_key(token_digest), session.model_dump_json()
+        if if_not_revoked:
+            await self.session_store.client.register_script(STORE_SESSION_SCRIPT)(
+                keys=[key, self._tombstone_key(token_digest)], args=[value, ttl]
+            )
+        else:
+            await self.session_store.client.set(key, value, ex=ttl)
+
+    @staticmethod
+    def _session_key(token_digest: str) -> str:
+        return f"session:{token_digest}"
+
+    @staticmethod
+    def _tombstone_key(token_digest: str) -> str:
+        return f"session:revoked:{token_digest}"
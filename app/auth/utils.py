@@ -1,12 +1,14 @@
-import random
+import hashlib
 import re
+import secrets
 import string
 from datetime import datetime, timedelta
 
-import bcrypt
 from jose import jwt
 
+from app.auth.hashing import password_hasher
 from app.auth.models import RefreshTokenModel
+from app.auth.schemas import AuthUser, RefreshTokenSession
 from app.config import settings
 from app.users.models import UserModel, UserRole
 
@@ -27,11 +29,27 @@ def generate_random_alphanum(length: int = 20) -> str:
     """
 
     alpha_num = string.ascii_letters + string.digits
-    random_alphanum = "".join(random.choices(alpha_num, k=length))
+    random_alphanum = "".join(secrets.choice(alpha_num) for _ in range(length))
 
     return random_alphanum
 
 
+def hash_refresh_token(refresh_token: str) -> str:
+    """
+    Hashes the refresh token value, which is stored only as the digest.
+
+    The values are long and random, so a fast unsalted hash is enough.
+
+    Args:
+        refresh_token (str): The refresh token value.
+
+    Returns:
+        str: The hex SHA-256 digest of the value.
+    """
+
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
 def get_refresh_token_cookie_settings(
     refresh_token: str,
     expired: bool = False,
@@ -64,12 +82,15 @@ def get_refresh_token_cookie_settings(
     }
 
 
-def is_refresh_token_expired(refresh_token: RefreshTokenModel) -> bool:
+def is_refresh_token_expired(
+    refresh_token: RefreshTokenModel | RefreshTokenSession,
+) -> bool:
     """
     Check if the refresh token has expired.
 
     Args:
-        refresh_token (RefreshTokenModel): The refresh token database model.
+        refresh_token (RefreshTokenModel | RefreshTokenSession): The refresh token
+            from the database or the session store.
 
     Returns:
         bool: True if the refresh token has expired, False otherwise.
@@ -78,6 +99,32 @@ def is_refresh_token_expired(refresh_token: RefreshTokenModel) -> bool:
     return datetime.utcnow() > refresh_token.expires_at
 
 
+def get_auth_user(user: UserModel) -> AuthUser:
+    """
+    Get the claims of the user needed by the routes.
+
+    Args:
+        user (UserModel): The user with loaded library membership and
+            unavailable book categories.
+
+    Returns:
+        AuthUser: The authenticated user claims.
+    """
+
+    membership_status = None
+    if user.library_member:
+        membership_status = user.library_member.membership_status
+
+    return AuthUser(
+        id=user.id,
+        role=user.role,
+        membership_status=membership_status,
+        unavailable_categories=[
+            category.id for category in user.unavailable_book_categories
+        ],
+    )
+
+
 def generate_access_token(
     user: UserModel,
     expires_delta: timedelta = timedelta(minutes=settings.JWT_EXP),
@@ -85,6 +132,9 @@ def generate_access_token(
     """
     Generate an access token for the given user.
 
+    The token carries the user claims needed by the routes,
+    so they can be authorized without loading the user from the database.
+
     Args:
         user (UserModel): The user for whom the access token is being generated.
         expires_delta (timedelta, optional): The expiration time for the token.
@@ -94,19 +144,24 @@ def generate_access_token(
         str: The generated access token.
     """
 
+    auth_user = get_auth_user(user)
+    now = datetime.utcnow()
+
     jwt_data = {
         "sub": str(user.id),
-        "exp": datetime.utcnow() + expires_delta,
+        "iat": now,
+        "exp": now + expires_delta,
         "is_admin": user.role == UserRole.ADMIN,
+        **auth_user.model_dump(mode="json", exclude={"id"}),
     }
     access_token = jwt.encode(jwt_data, settings.JWT_SECRET, algorithm=settings.JWT_ALG)
 
     return access_token
 
 
-def hash_password(password: str) -> bytes:
+async def hash_password(password: str) -> bytes:
     """
-    Hashes the given password using bcrypt.
+    Hashes the given password using bcrypt without blocking the event loop.
 
     Args:
         password (str): The password to be hashed.
@@ -115,14 +170,10 @@ def hash_password(password: str) -> bytes:
         bytes: The hashed password.
     """
 
-    pw = bytes(password, "utf-8")
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(pw, salt)
-
-    return hashed_password
+    return await password_hasher.hash(password)
 
 
-def check_password(password: str, password_in_db: bytes) -> bool:
+async def check_password(password: str, password_in_db: bytes) -> bool:
     """
     Check if the provided password matches the password stored in the database.
 
@@ -134,10 +185,7 @@ def check_password(password: str, password_in_db: bytes) -> bool:
         bool: True if the password matches, False otherwise.
     """
 
-    password_bytes = bytes(password, "utf-8")
-    result = bcrypt.checkpw(password_bytes, password_in_db)
-
-    return result
+    return await password_hasher.check(password, password_in_db)
 
 
 def is_strong_password(password: str) -> bool:
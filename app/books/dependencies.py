@@ -1,6 +1,9 @@
 import re
 
-from fastapi import HTTPException, Path, status
+from fastapi import HTTPException, Path, Query, status
+
+from app.books.schemas import PaginationParams
+from app.config import settings
 
 
 def validate_isbn_10(
@@ -27,3 +30,28 @@ def validate_isbn_10(
         )
 
     return isbn
+
+
+def get_pagination(
+    limit: int = Query(
+        settings.PAGE_DEFAULT_LIMIT,
+        ge=1,
+        le=settings.PAGE_MAX_LIMIT,
+        description="Maximum number of items in the page",
+    ),
+    cursor: str | None = Query(
+        None, description="The next_cursor value of the previous page"
+    ),
+) -> PaginationParams:
+    """
+    Get the pagination parameters from the query.
+
+    Args:
+        limit (int): Maximum number of items in the page.
+        cursor (str | None): Cursor of the page, None for the first page.
+
+    Returns:
+        PaginationParams: The pagination parameters.
+    """
+
+    return PaginationParams(limit=limit, cursor=cursor)
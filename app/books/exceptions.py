@@ -6,6 +6,8 @@ class ErrorCode:
     CATEGORY_NOT_FOUND = "Category(s) not found."
     SEARCH_QUERY_EMPTY = "Search query cannot be empty."
     ISBN_NOT_VALID ="ISBN must be a 10-digit number"
+    CURSOR_NOT_VALID = "Cursor is not valid."
+    ISBN_BATCH_TOO_LARGE = "Too many ISBNs in one request."
 
 
 class BookNotFound(NotFound):
@@ -22,3 +24,11 @@ class SearchQueryEmpty(BadRequest):
 
 class NotValidISBN(BadRequest):
     DETAIL = ErrorCode.ISBN_NOT_VALID
+
+
+class CursorNotValid(BadRequest):
+    DETAIL = ErrorCode.CURSOR_NOT_VALID
+
+
+class ISBNBatchTooLarge(BadRequest):
+    DETAIL = ErrorCode.ISBN_BATCH_TOO_LARGE
@@ -1,27 +1,40 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, Table
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
 from app.auth.models import Base
 
 book_author = Table(
     "book_author",
     Base.metadata,
-    Column("book_id", Integer, ForeignKey("book.id")),
-    Column("author_id", Integer, ForeignKey("author.id")),
+    Column("book_id", Integer, ForeignKey("book.id"), primary_key=True),
+    Column("author_id", Integer, ForeignKey("author.id"), primary_key=True, index=True),
 )
 
 book_category = Table(
     "book_category",
     Base.metadata,
-    Column("book_id", Integer, ForeignKey("book.id")),
-    Column("category_id", Integer, ForeignKey("category.id")),
+    Column("book_id", Integer, ForeignKey("book.id"), primary_key=True),
+    Column(
+        "category_id",
+        Integer,
+        ForeignKey("category.id"),
+        primary_key=True,
+        index=True,
+    ),
 )
 
 user_unavailable_book_category = Table(
     "user_unavailable_book_category",
     Base.metadata,
-    Column("user_id", Integer, ForeignKey("user.id")),
-    Column("category_id", Integer, ForeignKey("category.id")),
+    Column("user_id", Integer, ForeignKey("user.id"), primary_key=True),
+    Column(
+        "category_id",
+        Integer,
+        ForeignKey("category.id"),
+        primary_key=True,
+        index=True,
+    ),
 )
 
 
@@ -29,7 +42,7 @@ class AuthorModel(Base):
     __tablename__ = "author"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    name = Column(String, unique=True, index=True)
 
     books = relationship("BookModel", secondary=book_author, back_populates="authors")
 
@@ -41,7 +54,7 @@ class CategoryModel(Base):
     __tablename__ = "category"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    name = Column(String, unique=True, index=True)
 
     books = relationship(
         "BookModel", secondary=book_category, back_populates="categories"
@@ -63,7 +76,9 @@ class BookModel(Base):
     title = Column(String, index=True)
     language = Column(String, index=True)
     publication_date = Column(String, index=True)
-    isbn = Column(String, index=True)
+    isbn = Column(String, index=True, unique=True)
+    # title, author names and categories, maintained by database triggers
+    search_vector = deferred(Column(TSVECTOR))
 
     authors = relationship(
         "AuthorModel", secondary=book_author, back_populates="books", lazy="selectin"
@@ -75,5 +90,15 @@ class BookModel(Base):
         lazy="selectin",
     )
 
+    __table_args__ = (
+        Index("book_search_vector_idx", "search_vector", postgresql_using="gin"),
+        Index(
+            "book_title_trgm_idx",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+    )
+
     def __str__(self):
         return f" Book {self.title}"
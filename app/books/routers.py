@@ -1,28 +1,50 @@
-import json
-
-from fastapi import APIRouter, BackgroundTasks, Depends, Path
+from fastapi import APIRouter, BackgroundTasks, Depends, Path, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.dependencies import (
     get_admin_from_refresh_token,
     get_user_from_access_token,
 )
-from app.books.dependencies import validate_isbn_10
+from app.auth.schemas import AuthUser
+from app.books.dependencies import get_pagination, validate_isbn_10
 from app.books.exceptions import BookNotFound, CategoryNotFound
 from app.books.schemas import (
     Book,
+    BookLookups,
     Books,
     BookSearchRequest,
     CategoriesResponse,
     CategoryResponse,
+    ISBNBatchRequest,
+    PaginationParams,
+    UsersUnavailableCategoriesChangeRequest,
+    UsersUnavailableCategoriesChangeResponse,
     UserUnavailableCategoriesChangeRequest,
     UserUnavailableCategoriesResponse,
 )
 from app.books.services import BookService
-from app.database import get_db
+from app.books.utils import (
+    BOOKS_TAG,
+    CATEGORIES_NAMESPACE,
+    CATEGORIES_TAG,
+    CATEGORY_BOOKS_NAMESPACE,
+    CATEGORY_NAMESPACE,
+    ISBN_NAMESPACE,
+    SEARCH_NAMESPACE,
+    category_tag,
+    encode_book_lookups,
+    is_book_available,
+    restriction_params,
+)
+from app.books.writer import book_writer
+from app.config import settings
+from app.database import get_db, get_read_db, replica_session
+from app.external.google_books_api.dependencies import get_google_books_service
 from app.external.google_books_api.services import GoogleBooksService
+from app.external.redis_db.dependencies import get_redis_service
 from app.external.redis_db.schemas import RedisData
 from app.external.redis_db.services import RedisService
+from app.responses import CachedJSONResponse, encode_response_body
 from app.users.exceptions import UserNotFound
 from app.users.models import UserModel
 from app.users.services import UserService
@@ -32,177 +54,302 @@ router = APIRouter()
 
 @router.get("/by-isbn/{isbn}", response_model=Book)
 async def get_book_by_isbn(
+    request: Request,
     worker: BackgroundTasks,
     isbn: str = Depends(validate_isbn_10),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     book_service: BookService = Depends(BookService),
-    google_books_api: GoogleBooksService = Depends(GoogleBooksService),
-    cache: RedisService = Depends(RedisService),
-    user: UserModel = Depends(get_user_from_access_token),
+    google_books_api: GoogleBooksService = Depends(get_google_books_service),
+    cache: RedisService = Depends(get_redis_service),
+    user: AuthUser = Depends(get_user_from_access_token),
 ) -> dict:
     """Retrieves a book details by ISBN"""
 
-    cached_book = await cache.get_by_key(f"book:{isbn}")
-    if cached_book:
-        book = Book(**json.loads(cached_book))
-        return book
+    unavailable_categories = user.unavailable_categories
+
+    async def load_book(db: AsyncSession) -> bytes | None:
+        book_db = await book_service.get_book_by_isbn(db, isbn, unavailable_categories)
+        if book_db:
+            return encode_response_body(Book.model_validate(book_db))
+
+        if unavailable_categories and await book_service.get_existing_isbns(db, [isbn]):
+            return None  # the book is in an unavailable category
 
-    book_db = await book_service.get_book_by_isbn(db, isbn)
-    if book_db:
-        book = Book.model_validate(book_db)
-    else:
         book = await google_books_api.get_book_by_isbn(isbn)
         if not book:
-            raise BookNotFound()
+            return None
+
+        await book_writer.submit(book)
+        if unavailable_categories and not is_book_available(
+            book, await book_service.get_category_names(db, unavailable_categories)
+        ):
+            return None
+
+        return encode_response_body(book)
+
+    async def refresh_book() -> bytes | None:
+        # the session of the request is closed when the background tasks run
+        async with replica_session() as db:
+            return await load_book(db)
+
+    cached_book = await cache.get_or_load(
+        await cache.make_key(
+            ISBN_NAMESPACE,
+            isbn,
+            *restriction_params(unavailable_categories),
+            hashed=False,
+        ),
+        lambda: load_book(db),
+        ttl=settings.BOOK_CACHE_TTL,
+        stale_ttl=settings.CACHE_STALE_TTL,
+        worker=worker,
+        background_load=refresh_book,
+    )
+    if not cached_book:
+        raise BookNotFound()
 
-        worker.add_task(book_service.create_book, db, book)
+    return CachedJSONResponse(cached_book, request)
 
-    cache_data = RedisData(key=f"book:{isbn}", value=book.model_dump_json(), ttl=3600)
-    worker.add_task(cache.set_key, cache_data)
 
-    return book
+@router.post("/by-isbn/batch", response_model=BookLookups)
+async def get_books_by_isbns(
+    request: Request,
+    worker: BackgroundTasks,
+    lookup: ISBNBatchRequest,
+    db: AsyncSession = Depends(get_read_db),
+    book_service: BookService = Depends(BookService),
+    google_books_api: GoogleBooksService = Depends(get_google_books_service),
+    cache: RedisService = Depends(get_redis_service),
+    user: AuthUser = Depends(get_user_from_access_token),
+) -> dict:
+    """Retrieves the details of many books by ISBN, in the order of the ISBNs"""
+
+    unavailable_categories = user.unavailable_categories
+    restriction = restriction_params(unavailable_categories)
+
+    isbns = list(dict.fromkeys(lookup.isbns))
+    keys = {
+        isbn: await cache.make_key(ISBN_NAMESPACE, isbn, *restriction, hashed=False)
+        for isbn in isbns
+    }
+
+    cached_books = await cache.get_many_bytes(list(keys.values()))
+    books = {isbn: book for isbn, book in zip(isbns, cached_books) if book}
+
+    missing_isbns = [isbn for isbn in isbns if isbn not in books]
+    if missing_isbns:
+        found_books: dict[str, Book] = {}
+        for book_db in await book_service.get_books_by_isbns(
+            db, missing_isbns, unavailable_categories
+        ):
+            found_books.setdefault(book_db.isbn, Book.model_validate(book_db))
+
+        unknown_isbns = [isbn for isbn in missing_isbns if isbn not in found_books]
+        if unavailable_categories and unknown_isbns:
+            # the books in unavailable categories are not looked up elsewhere
+            existing_isbns = await book_service.get_existing_isbns(db, unknown_isbns)
+            unknown_isbns = [
+                isbn for isbn in unknown_isbns if isbn not in existing_isbns
+            ]
+
+        fetched_books = await google_books_api.get_books_by_isbns(unknown_isbns)
+        new_books = [book for book in fetched_books.values() if book]
+        if new_books:
+            await book_writer.submit(*new_books)
+        if new_books and unavailable_categories:
+            unavailable_names = await book_service.get_category_names(
+                db, unavailable_categories
+            )
+            new_books = [
+                book for book in new_books if is_book_available(book, unavailable_names)
+            ]
+
+        found_books.update((book.isbn, book) for book in new_books)
+        cache_data = []
+        for isbn, book in found_books.items():
+            books[isbn] = encode_response_body(book)
+            cache_data.append(
+                RedisData(key=keys[isbn], value=books[isbn], ttl=settings.BOOK_CACHE_TTL)
+            )
+        worker.add_task(cache.set_many, cache_data, stale_ttl=settings.CACHE_STALE_TTL)
+
+    return CachedJSONResponse(encode_book_lookups(lookup.isbns, books), request)
 
 
 @router.get("/by-category/{category_name}", response_model=Books)
 async def get_books_by_category(
     category_name: str,
+    request: Request,
     worker: BackgroundTasks,
-    db: AsyncSession = Depends(get_db),
+    pagination: PaginationParams = Depends(get_pagination),
+    db: AsyncSession = Depends(get_read_db),
     book_service: BookService = Depends(BookService),
-    cache: RedisService = Depends(RedisService),
-    user: UserModel = Depends(get_user_from_access_token),
+    cache: RedisService = Depends(get_redis_service),
+    user: AuthUser = Depends(get_user_from_access_token),
 ) -> dict:
-    """Retrieves books details by category name"""
+    """Retrieves a page of books details by category name"""
+
+    cache_key = await cache.make_key(
+        CATEGORY_BOOKS_NAMESPACE,
+        category_name.lower(),
+        pagination.limit,
+        pagination.cursor,
+        *restriction_params(user.unavailable_categories),
+    )
 
-    cached_books = await cache.get_by_key(f"book:{category_name}")
+    cached_books = await cache.get_bytes(cache_key)
     if cached_books:
-        books = Books(
-            books=[Book(**json.loads(book)) for book in json.loads(cached_books)]
-        )
-        return books
+        return CachedJSONResponse(cached_books, request)
+
+    # read before the books, the page is not cached if they change meanwhile
+    tags = [category_tag(category_name)]
+    tag_versions = await cache.get_tag_versions(*tags)
 
-    books_db = await book_service.get_books_by_category(db, category_name)
+    books_db, next_cursor = await book_service.get_books_by_category(
+        db, category_name, pagination, user.unavailable_categories
+    )
     if not books_db:
         raise BookNotFound()
 
-    books = Books(books=[Book.model_validate(book) for book in books_db])
+    books = Books(
+        books=[Book.model_validate(book) for book in books_db],
+        next_cursor=next_cursor,
+    )
 
+    body = encode_response_body(books)
     cache_data = RedisData(
-        key=f"book:{category_name}",
-        value=json.dumps([book.model_dump_json() for book in books.books]),
-        ttl=600,
+        key=cache_key,
+        value=body,
+        ttl=settings.BOOK_LIST_CACHE_TTL,
+        tags=tags,
     )
-    worker.add_task(cache.set_key, cache_data)
+    worker.add_task(cache.set_key, cache_data, tag_versions=tag_versions)
 
-    return books
+    return CachedJSONResponse(body, request)
 
 
 @router.get("/category/{category_id}", response_model=CategoryResponse)
 async def get_category_by_id(
+    request: Request,
     worker: BackgroundTasks,
     category_id: int = Path(..., title="Category ID in URL"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     book_service: BookService = Depends(BookService),
-    cache: RedisService = Depends(RedisService),
-    user: UserModel = Depends(get_user_from_access_token),
+    cache: RedisService = Depends(get_redis_service),
+    user: AuthUser = Depends(get_user_from_access_token),
 ) -> dict:
     """Retrieves category details by ID"""
 
-    cached_category = await cache.get_by_key(f"category:{category_id}")
+    cache_key = await cache.make_key(CATEGORY_NAMESPACE, category_id, hashed=False)
+
+    cached_category = await cache.get_bytes(cache_key)
     if cached_category:
-        category = CategoryResponse(**json.loads(cached_category))
-        return category
+        return CachedJSONResponse(cached_category, request)
 
     category_db = await book_service.get_category_by_id(db, category_id)
     if not category_db:
         raise CategoryNotFound()
 
     category = CategoryResponse.model_validate(category_db)
+    body = encode_response_body(category)
 
-    cache_data = RedisData(
-        key=f"category:{category_id}",
-        value=category.model_dump_json(),
-        ttl=3600,
-    )
+    cache_data = RedisData(key=cache_key, value=body, ttl=settings.CATEGORY_CACHE_TTL)
     worker.add_task(cache.set_key, cache_data)
 
-    return category
+    return CachedJSONResponse(body, request)
 
 
 @router.get("/categories", response_model=CategoriesResponse)
 async def get_all_categories(
+    request: Request,
     worker: BackgroundTasks,
-    db: AsyncSession = Depends(get_db),
+    pagination: PaginationParams = Depends(get_pagination),
+    db: AsyncSession = Depends(get_read_db),
     book_service: BookService = Depends(BookService),
-    cache: RedisService = Depends(RedisService),
-    user: UserModel = Depends(get_user_from_access_token),
+    cache: RedisService = Depends(get_redis_service),
+    user: AuthUser = Depends(get_user_from_access_token),
 ) -> dict:
-    """Retrieves all categories"""
+    """Retrieves a page of categories"""
 
-    cached_categories = await cache.get_by_key("categories")
+    cache_key = await cache.make_key(
+        CATEGORIES_NAMESPACE, pagination.limit, pagination.cursor
+    )
+
+    cached_categories = await cache.get_bytes(cache_key)
     if cached_categories:
-        categories = CategoriesResponse(
-            categories=[
-                CategoryResponse(**json.loads(category))
-                for category in json.loads(cached_categories)
-            ]
-        )
-        return categories
+        return CachedJSONResponse(cached_categories, request)
 
-    categories_db = await book_service.get_all_categories(db)
+    tag_versions = await cache.get_tag_versions(CATEGORIES_TAG)
+    categories_db, next_cursor = await book_service.get_all_categories(db, pagination)
     if not categories_db:
         raise CategoryNotFound()
 
     categories = CategoriesResponse(
         categories=[
             CategoryResponse.model_validate(category) for category in categories_db
-        ]
+        ],
+        next_cursor=next_cursor,
     )
 
+    body = encode_response_body(categories)
     cache_data = RedisData(
-        key="categories",
-        value=json.dumps(
-            [category.model_dump_json() for category in categories.categories]
-        ),
-        ttl=600,
+        key=cache_key,
+        value=body,
+        ttl=settings.CATEGORY_CACHE_TTL,
+        tags=[CATEGORIES_TAG],
     )
-    worker.add_task(cache.set_key, cache_data)
+    worker.add_task(cache.set_key, cache_data, tag_versions=tag_versions)
 
-    return categories
+    return CachedJSONResponse(body, request)
 
 
 @router.post("/search", response_model=Books)
 async def search_books(
+    request: Request,
     worker: BackgroundTasks,
     search: BookSearchRequest,
-    db: AsyncSession = Depends(get_db),
+    pagination: PaginationParams = Depends(get_pagination),
+    db: AsyncSession = Depends(get_read_db),
     book_service: BookService = Depends(BookService),
-    cache: RedisService = Depends(RedisService),
-    user: UserModel = Depends(get_user_from_access_token),
+    cache: RedisService = Depends(get_redis_service),
+    user: AuthUser = Depends(get_user_from_access_token),
 ) -> dict:
-    """Retrieves books details based on the search query"""
+    """Retrieves a page of books details based on the search query"""
+
+    cache_key = await cache.make_key(
+        SEARCH_NAMESPACE,
+        search.model_dump(exclude_none=True),
+        pagination.limit,
+        pagination.cursor,
+        *restriction_params(user.unavailable_categories),
+    )
 
-    cached_books = await cache.get_by_key(f"book:{search}")
+    cached_books = await cache.get_bytes(cache_key)
     if cached_books:
-        books = Books(
-            books=[Book(**json.loads(book)) for book in json.loads(cached_books)]
-        )
-        return books
+        return CachedJSONResponse(cached_books, request)
 
-    books_db = await book_service.search_books(db, search)
+    tag_versions = await cache.get_tag_versions(BOOKS_TAG)
+    books_db, next_cursor = await book_service.search_books(
+        db, search, pagination, user.unavailable_categories
+    )
     if not books_db:
         raise BookNotFound()
 
-    books = Books(books=[Book.model_validate(book) for book in books_db])
+    books = Books(
+        books=[Book.model_validate(book) for book in books_db],
+        next_cursor=next_cursor,
+    )
 
+    body = encode_response_body(books)
     cache_data = RedisData(
-        key=f"book:{search}",
-        value=json.dumps([book.model_dump_json() for book in books.books]),
-        ttl=1200,
+        key=cache_key,
+        value=body,
+        ttl=settings.BOOK_LIST_CACHE_TTL,
+        tags=[BOOKS_TAG],
     )
-    worker.add_task(cache.set_key, cache_data)
+    worker.add_task(cache.set_key, cache_data, tag_versions=tag_versions)
 
-    return books
+    return CachedJSONResponse(body, request)
 
 
 @router.get(
@@ -211,7 +358,7 @@ async def search_books(
 )
 async def get_user_unavailable_categories(
     user_id: int = Path(..., title="User ID in URL"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user_service: UserService = Depends(UserService),
     admin: UserModel = Depends(get_admin_from_refresh_token),
 ) -> dict:
@@ -235,12 +382,13 @@ async def add_user_unavailable_categories(
     data: UserUnavailableCategoriesChangeRequest,
     db: AsyncSession = Depends(get_db),
     user_service: UserService = Depends(UserService),
+    cache: RedisService = Depends(get_redis_service),
     admin: UserModel = Depends(get_admin_from_refresh_token),
 ) -> dict:
     """Only for admins. Adds unavailable book categories to user"""
 
     user = await user_service.add_unavailable_categories(
-        db, data.user_id, data.categories_id
+        db, data.user_id, data.categories_id, cache
     )
 
     return UserUnavailableCategoriesResponse(
@@ -260,12 +408,13 @@ async def remove_user_unavailable_categories(
     data: UserUnavailableCategoriesChangeRequest,
     db: AsyncSession = Depends(get_db),
     user_service: UserService = Depends(UserService),
+    cache: RedisService = Depends(get_redis_service),
     admin: UserModel = Depends(get_admin_from_refresh_token),
 ) -> dict:
     """Only for admins. Removes unavailable book categories from user"""
 
     user = await user_service.remove_unavailable_categories(
-        db, data.user_id, data.categories_id
+        db, data.user_id, data.categories_id, cache
     )
 
     return UserUnavailableCategoriesResponse(
@@ -275,3 +424,47 @@ async def remove_user_unavailable_categories(
             for category in user.unavailable_book_categories
         ],
     )
+
+
+@router.post(
+    "/unavailable_categories/users/add",
+    response_model=UsersUnavailableCategoriesChangeResponse,
+)
+async def add_users_unavailable_categories(
+    data: UsersUnavailableCategoriesChangeRequest,
+    db: AsyncSession = Depends(get_db),
+    user_service: UserService = Depends(UserService),
+    cache: RedisService = Depends(get_redis_service),
+    admin: UserModel = Depends(get_admin_from_refresh_token),
+) -> dict:
+    """Only for admins. Adds unavailable book categories to many users at once"""
+
+    changed = await user_service.change_users_unavailable_categories(
+        db, data.users_id, data.categories_id, unavailable=True, cache=cache
+    )
+
+    return UsersUnavailableCategoriesChangeResponse(
+        users_id=data.users_id, categories_id=data.categories_id, changed=changed
+    )
+
+
+@router.post(
+    "/unavailable_categories/users/remove",
+    response_model=UsersUnavailableCategoriesChangeResponse,
+)
+async def remove_users_unavailable_categories(
+    data: UsersUnavailableCategoriesChangeRequest,
+    db: AsyncSession = Depends(get_db),
+    user_service: UserService = Depends(UserService),
+    cache: RedisService = Depends(get_redis_service),
+    admin: UserModel = Depends(get_admin_from_refresh_token),
+) -> dict:
+    """Only for admins. Removes unavailable book categories from many users at once"""
+
+    changed = await user_service.change_users_unavailable_categories(
+        db, data.users_id, data.categories_id, unavailable=False, cache=cache
+    )
+
+    return UsersUnavailableCategoriesChangeResponse(
+        users_id=data.users_id, categories_id=data.categories_id, changed=changed
+    )
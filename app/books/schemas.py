@@ -1,9 +1,11 @@
+import re
 from typing import List
 
 from pydantic import BaseModel as BaseSchema, field_validator, model_validator
 
-from app.books.exceptions import SearchQueryEmpty
+from app.books.exceptions import ISBNBatchTooLarge, NotValidISBN, SearchQueryEmpty
 from app.books.models import BookModel
+from app.config import settings
 
 
 class Author(BaseSchema):
@@ -31,6 +33,7 @@ class CategoryResponse(Category):
 
 class CategoriesResponse(BaseSchema):
     categories: List[CategoryResponse] = []
+    next_cursor: str | None = None
 
 
 class Book(BaseSchema):
@@ -47,12 +50,45 @@ class Book(BaseSchema):
 
 class Books(BaseSchema):
     books: List[Book] = []
+    next_cursor: str | None = None
 
     class Config:
         from_attributes = True
 
 
+class ISBNBatchRequest(BaseSchema):
+    isbns: List[str]
+
+    @field_validator("isbns")
+    @classmethod
+    def validate_isbns(cls, isbns: List[str]) -> List[str]:
+        if len(isbns) > settings.ISBN_BATCH_MAX_SIZE:
+            raise ISBNBatchTooLarge()
+
+        isbns = [isbn.strip() for isbn in isbns]
+        if not all(re.match(r"^\d{10}$", isbn) for isbn in isbns):
+            raise NotValidISBN()
+
+        return isbns
+
+
+class BookLookup(BaseSchema):
+    isbn: str
+    book: Book | None = None  # None if the book is not found
+
+
+class BookLookups(BaseSchema):
+    books: List[BookLookup] = []  # in the order of the requested ISBNs
+
+
+class PaginationParams(BaseSchema):
+    limit: int
+    cursor: str | None = None
+
+
 class BookSearchRequest(BaseSchema):
+    # free text matched by prefix and similarity against titles, authors, categories
+    query: str | None = None
     title: str | None = None
     author: str | None = None
     publication_date: str | None = None
@@ -61,6 +97,15 @@ class BookSearchRequest(BaseSchema):
     class Config:
         from_attributes = True
 
+    @field_validator("query")
+    @classmethod
+    def normalize_query(cls, query: str | None) -> str | None:
+        # the matching ignores case and spacing, so equal queries share a cache key
+        if query is None:
+            return None
+
+        return " ".join(query.lower().split()) or None
+
     @model_validator(mode="after")
     def at_least_one_field_not_none(cls, values):
         if all((not field[1] for field in values)):
@@ -77,3 +122,24 @@ class UserUnavailableCategoriesChangeRequest(BaseSchema):
 class UserUnavailableCategoriesResponse(BaseSchema):
     user_id: int
     unavailable_categories: list[CategoryResponse] = []
+
+
+class UsersUnavailableCategoriesChangeRequest(BaseSchema):
+    users_id: list[int]
+    categories_id: list[int]
+
+
+class UsersUnavailableCategoriesChangeResponse(BaseSchema):
+    users_id: list[int]
+    categories_id: list[int]
+    changed: int  # user categories actually added or removed
+
+
+class BookWriterStats(BaseSchema):
+    pending: int  # books waiting in the worker's memory
+    written: int  # books created, without the ones already present
+    dropped: int  # books not saved: too many were pending or the write failed
+    flushes: int
+    failed_flushes: int
+    last_flush_seconds: float
+    avg_flush_seconds: float
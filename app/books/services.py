@@ -1,130 +1,475 @@
+import re
+
+from sqlalchemy import (
+    REAL,
+    Column,
+    Integer,
+    String,
+    and_,
+    any_,
+    bindparam,
+    cast,
+    exists,
+    func,
+    literal_column,
+    or_,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-
-from app.books.models import AuthorModel, BookModel, CategoryModel
-from app.books.schemas import Author, Book, BookSearchRequest, Category
+from sqlalchemy.sql import Insert, Select
+
+from app.books.exceptions import CursorNotValid
+from app.books.models import (
+    AuthorModel,
+    BookModel,
+    CategoryModel,
+    book_author,
+    book_category,
+)
+from app.books.schemas import (
+    Author,
+    Book,
+    BookSearchRequest,
+    Category,
+    PaginationParams,
+)
+from app.books.utils import (
+    CATEGORIES_TAG,
+    decode_cursor,
+    encode_cursor,
+    get_book_tags,
+    get_page,
+    is_cursor_id,
+    is_cursor_rank,
+)
+from app.external.redis_db.services import RedisService
+
+# maximum number of bind parameters in one PostgreSQL statement
+MAX_BIND_PARAMS = 32767
 
 
 class BookService:
 
-    async def create_book(self, db: AsyncSession, book: Book) -> BookModel:
+    async def create_book(
+        self, db: AsyncSession, book: Book, cache: RedisService | None = None
+    ) -> BookModel:
         """
         Creates a book in the database.
 
+        The authors and categories are shared between books,
+        so only the missing ones are created.
+
         Args:
             db (AsyncSession): The async session to interact with the database.
             book (Book): The book object containing the book details.
+            cache (RedisService, optional): The cache of the lists the book changes.
 
         Returns:
             BookModel: The newly created book model.
         """
 
+        author_ids = await self.upsert_authors(
+            db, [author.name for author in book.authors]
+        )
+        category_ids = await self.upsert_categories(
+            db, [category.name for category in book.categories]
+        )
+
         new_book = BookModel(
             isbn=book.isbn,
             title=book.title,
             language=book.language,
             publication_date=book.publication_date,
         )
-
-        for author in book.authors:
-            db_author = AuthorModel(name=author.name)
-            new_book.authors.append(db_author)
-
-        for category in book.categories:
-            db_category = CategoryModel(name=category.name)
-            new_book.categories.append(db_category)
-
         db.add(new_book)
+        await db.flush()
+
+        if author_ids:
+            await db.execute(
+                insert(book_author).values(
+                    [
+                        {"book_id": new_book.id, "author_id": author_id}
+                        for author_id in author_ids.values()
+                    ]
+                )
+            )
+        if category_ids:
+            await db.execute(
+                insert(book_category).values(
+                    [
+                        {"book_id": new_book.id, "category_id": category_id}
+                        for category_id in category_ids.values()
+                    ]
+                )
+            )
+
         await db.commit()
         await db.refresh(new_book)
 
+        if cache is not None:
+            await cache.invalidate_tags(*get_book_tags([book]))
+
         return new_book
 
+    async def create_books(
+        self, db: AsyncSession, books: list[Book], cache: RedisService | None = None
+    ) -> int:
+        """
+        Creates many books in the database in one transaction.
+
+        The books with an ISBN already present in the database or earlier
+        in the list, or created concurrently, are skipped. The authors and
+        categories of all the books are created with one statement each,
+        the books and the links with multi-row inserts.
+
+        Args:
+            db (AsyncSession): The async session to interact with the database.
+            books (list[Book]): The books to create.
+            cache (RedisService, optional): The cache of the lists the books change.
+
+        Returns:
+            int: The number of created books.
+        """
+
+        unique_books: dict[str, Book] = {}
+        for book in books:
+            unique_books.setdefault(book.isbn, book)
+
+        existing_isbns = await self.get_existing_isbns(db, list(unique_books))
+        books = [
+            book for isbn, book in unique_books.items() if isbn not in existing_isbns
+        ]
+        if not books:
+            return 0
+
+        author_ids = await self.upsert_authors(
+            db, [author.name for book in books for author in book.authors]
+        )
+        category_ids = await self.upsert_categories(
+            db, [category.name for book in books for category in book.categories]
+        )
+
+        # a concurrent writer may create the same books after the check
+        book_rows = await self._insert_rows(
+            db,
+            insert(BookModel)
+            .on_conflict_do_nothing(index_elements=[BookModel.isbn])
+            .returning(BookModel.id, BookModel.isbn),
+            [
+                {
+                    "isbn": book.isbn,
+                    "title": book.title,
+                    "language": book.language,
+                    "publication_date": book.publication_date,
+                }
+                for book in books
+            ],
+        )
+        book_ids = {isbn: id for id, isbn in book_rows}
+        books = [book for book in books if book.isbn in book_ids]
+
+        await self._insert_rows(
+            db,
+            insert(book_author).on_conflict_do_nothing(),
+            [
+                {"book_id": book_ids[book.isbn], "author_id": author_ids[name]}
+                for book in books
+                for name in dict.fromkeys(author.name for author in book.authors)
+            ],
+        )
+        await self._insert_rows(
+            db,
+            insert(book_category).on_conflict_do_nothing(),
+            [
+                {"book_id": book_ids[book.isbn], "category_id": category_ids[name]}
+                for book in books
+                for name in dict.fromkeys(c.name for c in book.categories)
+            ],
+        )
+
+        await db.commit()
+
+        if cache is not None:
+            await cache.invalidate_tags(*get_book_tags(books))
+
+        return len(books)
+
     async def create_author(self, db: AsyncSession, author: Author) -> AuthorModel:
         """
-        Create an author in the database.
+        Create an author in the database, if it does not exist yet.
 
         Args:
             db (AsyncSession): The database session.
             author (Author): The author data to be created.
 
         Returns:
-            AuthorModel: The newly created author.
+            AuthorModel: The new or existing author.
         """
 
-        new_author = AuthorModel(name=author.name)
-        db.add(new_author)
+        author_ids = await self.upsert_authors(db, [author.name])
         await db.commit()
-        await db.refresh(new_author)
 
-        return new_author
+        return await db.get(AuthorModel, author_ids[author.name])
 
     async def create_category(
-        self, db: AsyncSession, category: Category
+        self,
+        db: AsyncSession,
+        category: Category,
+        cache: RedisService | None = None,
     ) -> CategoryModel:
         """
-        Creates a new book category in the database.
+        Creates a new book category in the database, if it does not exist yet.
 
         Args:
             db (AsyncSession): The async database session.
             category (Category): The category data to be created.
+            cache (RedisService, optional): The cache of the lists of categories.
 
         Returns:
-            CategoryModel: The newly created category model.
+            CategoryModel: The new or existing category model.
         """
 
-        new_category = CategoryModel(name=category.name)
-        db.add(new_category)
+        category_ids = await self.upsert_categories(db, [category.name])
         await db.commit()
-        await db.refresh(new_category)
 
-        return new_category
+        if cache is not None:
+            await cache.invalidate_tags(CATEGORIES_TAG)
+
+        return await db.get(CategoryModel, category_ids[category.name])
+
+    async def upsert_authors(self, db: AsyncSession, names: list[str]) -> dict[str, int]:
+        """
+        Gets or creates the authors with the given names.
+
+        Args:
+            db (AsyncSession): The async database session.
+            names (list[str]): The names of the authors.
+
+        Returns:
+            dict[str, int]: The IDs of the authors by name.
+        """
+
+        return await self._upsert_names(db, AuthorModel, names)
+
+    async def upsert_categories(
+        self, db: AsyncSession, names: list[str]
+    ) -> dict[str, int]:
+        """
+        Gets or creates the categories with the given names.
+
+        Args:
+            db (AsyncSession): The async database session.
+            names (list[str]): The names of the categories.
 
-    async def get_book_by_isbn(self, db: AsyncSession, isbn: int) -> BookModel | None:
+        Returns:
+            dict[str, int]: The IDs of the categories by name.
+        """
+
+        return await self._upsert_names(db, CategoryModel, names)
+
+    async def _upsert_names(
+        self,
+        db: AsyncSession,
+        model: type[AuthorModel] | type[CategoryModel],
+        names: list[str],
+    ) -> dict[str, int]:
+        """
+        Gets or creates the rows with the given unique names.
+
+        The new rows are inserted with ON CONFLICT DO NOTHING, so the existing
+        rows are not locked, and then the existing rows are selected. The names
+        are sorted, so that concurrent writers insert them in the same order
+        and wait for each other instead of deadlocking.
+
+        Args:
+            db (AsyncSession): The async database session.
+            model (type[AuthorModel] | type[CategoryModel]): The model with
+                the unique name column.
+            names (list[str]): The names, possibly repeated.
+
+        Returns:
+            dict[str, int]: The IDs of the rows by name.
+        """
+
+        names = sorted(set(names))
+
+        query = (
+            insert(model)
+            .on_conflict_do_nothing(index_elements=[model.name])
+            .returning(model.id, model.name)
+        )
+        rows = await self._insert_rows(db, query, [{"name": name} for name in names])
+        ids = {name: id for id, name in rows}
+
+        existing_names = [name for name in names if name not in ids]
+        if existing_names:
+            names_param = bindparam("names", existing_names, type_=ARRAY(String))
+            result = await db.execute(
+                select(model.id, model.name).filter(model.name == any_(names_param))
+            )
+            ids.update({name: id for id, name in result.all()})
+
+        return ids
+
+    async def _insert_rows(
+        self, db: AsyncSession, query: Insert, rows: list[dict]
+    ) -> list[Row]:
+        """
+        Inserts the rows with multi-row statements.
+
+        The rows are split into chunks so that every statement stays
+        within the limit of bind parameters of PostgreSQL.
+
+        Args:
+            db (AsyncSession): The async database session.
+            query (Insert): The insert statement without values.
+            rows (list[dict]): The rows to insert, all with the same keys.
+
+        Returns:
+            list[Row]: The rows returned by the statement, if it has RETURNING.
+        """
+
+        if not rows:
+            return []
+
+        chunk_size = MAX_BIND_PARAMS // len(rows[0])
+        returned_rows = []
+
+        for start in range(0, len(rows), chunk_size):
+            result = await db.execute(query.values(rows[start : start + chunk_size]))
+            if result.returns_rows:
+                returned_rows.extend(result.all())
+
+        return returned_rows
+
+    async def get_book_by_isbn(
+        self,
+        db: AsyncSession,
+        isbn: int,
+        unavailable_categories: list[int] | None = None,
+    ) -> BookModel | None:
         """
         Gets a book by its ISBN from the database.
 
         Args:
             db (AsyncSession): The asynchronous database session.
             isbn (int): The ISBN of the book to retrieve.
+            unavailable_categories (list[int], optional): The IDs of the categories
+                whose books are excluded.
 
         Returns:
             BookModel | None: The book with the specified ISBN, or None if not found.
         """
 
-        result = await db.execute(select(BookModel).filter(BookModel.isbn == isbn))
+        query = select(BookModel).filter(BookModel.isbn == isbn)
+        result = await db.execute(
+            self._exclude_categories(query, unavailable_categories)
+        )
         book = result.scalars().first()
 
         return book
 
-    async def get_books_by_category(
-        self, db: AsyncSession, category: str
+    async def get_books_by_isbns(
+        self,
+        db: AsyncSession,
+        isbns: list[str],
+        unavailable_categories: list[int] | None = None,
     ) -> list[BookModel]:
         """
-        Retrieves a list of books by category from the database.
+        Gets the books with any of the ISBNs from the database in one query.
 
         Args:
             db (AsyncSession): The asynchronous database session.
-            category (str): The category of the books to retrieve.
+            isbns (list[str]): The ISBNs of the books to retrieve.
+            unavailable_categories (list[int], optional): The IDs of the categories
+                whose books are excluded.
 
         Returns:
-            list[BookModel]: A list of BookModel objects corresponding to the given category.
+            list[BookModel]: The found books, in no particular order.
         """
 
+        isbns_param = bindparam("isbns", isbns, type_=ARRAY(String))
+        query = select(BookModel).filter(BookModel.isbn == any_(isbns_param))
         result = await db.execute(
-            select(BookModel).filter(BookModel.categories.any(name=category.lower()))
+            self._exclude_categories(query, unavailable_categories)
         )
-        books = result.scalars().all()
 
-        return books
+        return result.scalars().all()
+
+    async def get_existing_isbns(self, db: AsyncSession, isbns: list[str]) -> set[str]:
+        """
+        Gets which of the ISBNs belong to books in the database.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            isbns (list[str]): The ISBNs to check.
+
+        Returns:
+            set[str]: The ISBNs of the existing books.
+        """
+
+        isbns_param = bindparam("isbns", isbns, type_=ARRAY(String))
+        result = await db.execute(
+            select(BookModel.isbn).filter(BookModel.isbn == any_(isbns_param))
+        )
+
+        return set(result.scalars().all())
+
+    async def get_books_by_category(
+        self,
+        db: AsyncSession,
+        category: str,
+        pagination: PaginationParams,
+        unavailable_categories: list[int] | None = None,
+    ) -> tuple[list[BookModel], str | None]:
+        """
+        Retrieves a page of books by category from the database.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            category (str): The category of the books to retrieve.
+            pagination (PaginationParams): The page size and cursor.
+            unavailable_categories (list[int], optional): The IDs of the categories
+                whose books are excluded.
+
+        Returns:
+            tuple[list[BookModel], str | None]: The books of the page ordered by ID
+                and the cursor of the next page.
+        """
+
+        query = select(BookModel).filter(BookModel.categories.any(name=category.lower()))
+        query = self._exclude_categories(query, unavailable_categories)
+
+        return await self._get_page(db, query, BookModel.id, pagination)
 
     async def search_books(
         self,
         db: AsyncSession,
         search: BookSearchRequest,
-    ) -> list[BookModel]:
+        pagination: PaginationParams,
+        unavailable_categories: list[int] | None = None,
+    ) -> tuple[list[BookModel], str | None]:
+        """
+        Retrieves a page of books matching the search query.
 
-        query = select(BookModel)
+        Without the free text query, the books are ordered by ID.
+        With it, the books are ordered by relevance.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            search (BookSearchRequest): The search query.
+            pagination (PaginationParams): The page size and cursor.
+            unavailable_categories (list[int], optional): The IDs of the categories
+                whose books are excluded.
+
+        Returns:
+            tuple[list[BookModel], str | None]: The books of the page
+                and the cursor of the next page.
+        """
+
+        query = self._exclude_categories(select(BookModel), unavailable_categories)
         if search.title:
             query = query.filter(BookModel.title == search.title)
         if search.author:
@@ -136,10 +481,10 @@ class BookService:
         if search.isbn:
             query = query.filter(BookModel.isbn == search.isbn)
 
-        result = await db.execute(query)
-        books = result.scalars().all()
+        if search.query:
+            return await self._get_ranked_page(db, query, search.query, pagination)
 
-        return books
+        return await self._get_page(db, query, BookModel.id, pagination)
 
     async def get_author_by_name(
         self, db: AsyncSession, name: str
@@ -179,18 +524,169 @@ class BookService:
 
         return category
 
-    async def get_all_categories(self, db: AsyncSession) -> list[CategoryModel]:
+    async def get_category_names(self, db: AsyncSession, ids: list[int]) -> set[str]:
+        """
+        Retrieves the names of the categories with the given IDs.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            ids (list[int]): The IDs of the categories.
+
+        Returns:
+            set[str]: The names of the existing categories.
+        """
+
+        ids_param = bindparam("ids", ids, type_=ARRAY(Integer))
+        result = await db.execute(
+            select(CategoryModel.name).filter(CategoryModel.id == any_(ids_param))
+        )
+
+        return set(result.scalars().all())
+
+    async def get_all_categories(
+        self, db: AsyncSession, pagination: PaginationParams
+    ) -> tuple[list[CategoryModel], str | None]:
         """
-        Retrieves all book categories from the database.
+        Retrieves a page of book categories from the database.
 
         Args:
             db (AsyncSession): The asynchronous database session.
+            pagination (PaginationParams): The page size and cursor.
 
         Returns:
-            list[CategoryModel]: A list of CategoryModel objects.
+            tuple[list[CategoryModel], str | None]: The categories of the page
+                ordered by ID and the cursor of the next page.
+        """
+
+        return await self._get_page(
+            db, select(CategoryModel), CategoryModel.id, pagination
+        )
+
+    def _exclude_categories(
+        self, query: Select, unavailable_categories: list[int] | None
+    ) -> Select:
         """
+        Excludes the books in any of the categories from the query.
+
+        The condition is a NOT EXISTS on the links of the book, which the
+        planner runs as an anti-join in the same statement.
+
+        Args:
+            query (Select): The query of the books.
+            unavailable_categories (list[int] | None): The IDs of the categories.
+
+        Returns:
+            Select: The query without the books of the categories.
+        """
+
+        if not unavailable_categories:
+            return query
+
+        categories = bindparam(
+            "unavailable_categories", unavailable_categories, type_=ARRAY(Integer)
+        )
+
+        return query.filter(
+            ~exists().where(
+                book_category.c.book_id == BookModel.id,
+                book_category.c.category_id == any_(categories),
+            )
+        )
+
+    async def _get_page(
+        self,
+        db: AsyncSession,
+        query: Select,
+        id_column: Column,
+        pagination: PaginationParams,
+    ) -> tuple[list, str | None]:
+        """
+        Retrieves a page of the query results using keyset pagination by ID.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            query (Select): The query of the items.
+            id_column (Column): The ID column the items are ordered by.
+            pagination (PaginationParams): The page size and cursor.
+
+        Returns:
+            tuple[list, str | None]: The items of the page and the cursor
+                of the next page.
+        """
+
+        if pagination.cursor:
+            (last_id,) = decode_cursor(pagination.cursor)
+            if not is_cursor_id(last_id):
+                raise CursorNotValid()
+            query = query.filter(id_column > last_id)
+
+        query = query.order_by(id_column).limit(pagination.limit + 1)
+
+        result = await db.execute(query)
+
+        return get_page(result.scalars().all(), pagination.limit)
+
+    async def _get_ranked_page(
+        self,
+        db: AsyncSession,
+        query: Select,
+        text: str,
+        pagination: PaginationParams,
+    ) -> tuple[list[BookModel], str | None]:
+        """
+        Retrieves a page of books matching the free text, ordered by relevance.
+
+        Every word of the text is matched as a prefix against the search vector
+        of the book (title, author names and categories). Titles similar
+        to the text are matched as well, to tolerate typos.
+
+        Args:
+            db (AsyncSession): The asynchronous database session.
+            query (Select): The query of the books.
+            text (str): The free text to search for.
+            pagination (PaginationParams): The page size and cursor.
+
+        Returns:
+            tuple[list[BookModel], str | None]: The books of the page
+                and the cursor of the next page.
+        """
+
+        words = re.findall(r"\w+", text.lower())
+        ts_query = func.to_tsquery(
+            literal_column("'simple'"), " & ".join(f"{word}:*" for word in words)
+        )
+
+        rank = cast(
+            func.coalesce(func.ts_rank_cd(BookModel.search_vector, ts_query), 0)
+            + func.word_similarity(text, BookModel.title),
+            REAL,
+        )
+
+        condition = BookModel.title.op("%>")(text)
+        if words:
+            condition = or_(BookModel.search_vector.op("@@")(ts_query), condition)
+
+        query = query.add_columns(rank).filter(condition)
+
+        if pagination.cursor:
+            last_rank, last_id = decode_cursor(pagination.cursor, length=2)
+            if not is_cursor_rank(last_rank) or not is_cursor_id(last_id):
+                raise CursorNotValid()
+
+            last_rank = cast(last_rank, REAL)
+            query = query.filter(
+                or_(rank < last_rank, and_(rank == last_rank, BookModel.id > last_id))
+            )
+
+        query = query.order_by(rank.desc(), BookModel.id).limit(pagination.limit + 1)
+
+        result = await db.execute(query)
+        rows = result.all()
 
-        result = await db.execute(select(CategoryModel))
-        categories = result.scalars().all()
+        next_cursor = None
+        if len(rows) > pagination.limit:
+            rows = rows[: pagination.limit]
+            last_book, last_rank = rows[-1]
+            next_cursor = encode_cursor(last_rank, last_book.id)
 
-        return categories
+        return [book for book, _ in rows], next_cursor
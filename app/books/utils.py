@@ -0,0 +1,219 @@
+import base64
+import json
+import math
+from typing import Any
+
+from app.books.exceptions import CursorNotValid
+from app.books.schemas import Book
+from app.external.redis_db.keys import hash_params
+from app.responses import decompress_response_body
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encodes the keyset values of the last item of a page into an opaque cursor.
+
+    Args:
+        *values: The JSON serializable values the items are ordered by.
+
+    Returns:
+        str: The URL safe cursor.
+    """
+
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, length: int = 1) -> list:
+    """
+    Decodes the cursor into the keyset values.
+
+    Args:
+        cursor (str): The cursor received from the client.
+        length (int, optional): The expected number of values. Defaults to 1.
+
+    Raises:
+        CursorNotValid: If the cursor can not be decoded.
+
+    Returns:
+        list: The keyset values.
+    """
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise CursorNotValid()
+
+    if not isinstance(values, list) or len(values) != length:
+        raise CursorNotValid()
+
+    return values
+
+
+# the bounds of the PostgreSQL INTEGER and REAL columns the cursors are compared to
+INT32_MIN, INT32_MAX = -(2**31), 2**31 - 1
+REAL_MAX = 3.4e38
+
+
+def is_cursor_id(value: Any) -> bool:
+    """
+    Checks that the cursor value is an ID, an integer within INTEGER.
+
+    Args:
+        value (Any): The decoded value.
+
+    Returns:
+        bool: True if the value can be compared to an ID column.
+    """
+
+    return (
+        isinstance(value, int)
+        and not isinstance(value, bool)
+        and INT32_MIN <= value <= INT32_MAX
+    )
+
+
+def is_cursor_rank(value: Any) -> bool:
+    """
+    Checks that the cursor value is a search rank, a finite number within REAL.
+
+    Args:
+        value (Any): The decoded value.
+
+    Returns:
+        bool: True if the value can be compared to a rank.
+    """
+
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+
+    if isinstance(value, int):
+        return INT32_MIN <= value <= INT32_MAX
+
+    return math.isfinite(value) and abs(value) <= REAL_MAX
+
+
+def get_page(items: list, limit: int) -> tuple[list, str | None]:
+    """
+    Splits the items fetched with one extra item into the page and the next cursor.
+
+    Args:
+        items (list): The items ordered by ID, at most limit + 1 of them.
+        limit (int): The page size.
+
+    Returns:
+        tuple[list, str | None]: The page items and the cursor of the next page,
+            or None if this is the last page.
+    """
+
+    if len(items) <= limit:
+        return items, None
+
+    page = items[:limit]
+
+    return page, encode_cursor(page[-1].id)
+
+
+# namespaces of the cache keys
+ISBN_NAMESPACE = "isbn"  # a book by ISBN
+CATEGORY_NAMESPACE = "category"  # a category by ID
+CATEGORY_BOOKS_NAMESPACE = "cat"  # pages of the books in a category
+CATEGORIES_NAMESPACE = "categories"  # pages of all the categories
+SEARCH_NAMESPACE = "search"  # pages of the search results
+
+BOOKS_TAG = "books"  # cached lists that any new book may change
+CATEGORIES_TAG = "categories"  # cached lists of all the categories
+
+
+def category_tag(name: str) -> str:
+    """
+    Returns the tag of the cached lists of the books in the category.
+
+    Args:
+        name (str): The name of the category.
+
+    Returns:
+        str: The cache tag.
+    """
+
+    return f"category:{name.lower()}"
+
+
+def get_book_tags(books: list[Book]) -> list[str]:
+    """
+    Returns the tags of the cached lists that the new books change.
+
+    Args:
+        books (list[Book]): The new books.
+
+    Returns:
+        list[str]: The cache tags to invalidate.
+    """
+
+    category_tags = {
+        category_tag(category.name) for book in books for category in book.categories
+    }
+    if not category_tags:
+        return [BOOKS_TAG]
+
+    return [BOOKS_TAG, CATEGORIES_TAG, *sorted(category_tags)]
+
+
+def restriction_params(unavailable_categories: list[int]) -> tuple[str, ...]:
+    """
+    Returns the cache key parameters of the user's unavailable categories.
+
+    The users with the same set of unavailable categories share the cached
+    values, and the unrestricted users keep the keys without restrictions.
+
+    Args:
+        unavailable_categories (list[int]): The IDs of the unavailable categories.
+
+    Returns:
+        tuple[str, ...]: The hash of the set, or nothing if it is empty.
+    """
+
+    if not unavailable_categories:
+        return ()
+
+    return (hash_params(sorted(set(unavailable_categories))),)
+
+
+def is_book_available(book: Book, unavailable_names: set[str]) -> bool:
+    """
+    Checks that the book is in none of the unavailable categories.
+
+    Args:
+        book (Book): The book.
+        unavailable_names (set[str]): The names of the unavailable categories.
+
+    Returns:
+        bool: True if the book is available.
+    """
+
+    return not any(category.name in unavailable_names for category in book.categories)
+
+
+def encode_book_lookups(isbns: list[str], books: dict[str, bytes]) -> bytes:
+    """
+    Builds the JSON of the batch lookup from the cached bodies of the books.
+
+    The bodies are inserted as they are, without parsing them.
+
+    Args:
+        isbns (list[str]): The requested ISBNs.
+        books (dict[str, bytes]): The cached bodies of the found books by ISBN.
+
+    Returns:
+        bytes: The JSON of BookLookups.
+    """
+
+    lookups = [
+        b'{"isbn":%s,"book":%s}'
+        % (
+            json.dumps(isbn).encode(),
+            decompress_response_body(books[isbn]) if isbn in books else b"null",
+        )
+        for isbn in isbns
+    ]
+
+    return b'{"books":[' + b",".join(lookups) + b"]}"
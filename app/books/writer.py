@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import time
+
+import redis.asyncio as aioredis
+from pydantic import ValidationError
+
+from app.books.schemas import Book, BookWriterStats
+from app.books.services import BookService
+from app.config import settings
+from app.database import async_session
+from app.external.redis_db.cache import local_cache
+from app.external.redis_db.services import RedisService
+from app.metrics import (
+    book_writer_dropped,
+    book_writer_flush_duration,
+    book_writer_pending,
+)
+
+# adds the books to the stream while it has room, returns the number of dropped books
+ADD_BOOKS_SCRIPT = """
+local free = tonumber(ARGV[1]) - redis.call('XLEN', KEYS[1])
+local dropped = 0
+for i = 2, #ARGV do
+    if free > 0 then
+        redis.call('XADD', KEYS[1], '*', 'book', ARGV[i])
+        free = free - 1
+    else
+        dropped = dropped + 1
+    end
+end
+return dropped
+"""
+
+
+class BookWriter:
+    """
+    Saves the books found in Google Books in the background.
+
+    The books are collected by ISBN and created in batches, with a session
+    of the writer, when `batch_size` books are pending or every
+    `flush_interval` seconds. When durable, the books are queued in a Redis
+    stream and removed only once saved, so the books of a stopped worker
+    are saved by another one.
+    """
+
+    group = "book-writers"
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+        max_pending: int,
+        durable: bool,
+        stream: str,
+        claim_idle: int,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.durable = durable
+        self.stream = stream
+        self.claim_idle = claim_idle
+        self.consumer = local_cache.worker_id
+        self.pending: dict[str, Book] = {}
+        self.cache: RedisService | None = None
+        self.task: asyncio.Task | None = None
+        self.is_running = False
+        self.is_full: asyncio.Event | None = None
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flush_seconds = 0.0
+        self.last_flush_seconds = 0.0
+
+    def start(self, cache: RedisService) -> None:
+        """
+        Starts writing the submitted books.
+
+        Args:
+            cache (RedisService): The cache of the lists the books change.
+        """
+
+        self.cache = cache
+        self.is_running = True
+        self.is_full = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stops the writer after the pending books are saved"""
+
+        if self.task is None:
+            return
+
+        self.is_running = False
+        self.is_full.set()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    async def submit(self, *books: Book) -> None:
+        """
+        Queues the books to be saved.
+
+        When too many books are pending, the new ones are dropped: they
+        are looked up in Google Books again on the next cache miss.
+
+        Args:
+            *books (Book): The books to save.
+        """
+
+        if self.durable and self.cache is not None:
+            # checked and added in one script, the stream is never trimmed
+            dropped = await self.cache.client.register_script(ADD_BOOKS_SCRIPT)(
+                keys=[self.stream],
+                args=[self.max_pending, *(book.model_dump_json() for book in books)],
+            )
+            self._drop(dropped, "full")
+            return
+
+        dropped = 0
+        for book in books:
+            if book.isbn not in self.pending and len(self.pending) >= self.max_pending:
+                dropped += 1
+                continue
+            self.pending[book.isbn] = book
+        self._drop(dropped, "full")
+
+        book_writer_pending.set(len(self.pending))
+        if self.is_full is not None and len(self.pending) >= self.batch_size:
+            self.is_full.set()
+
+    async def run(self) -> None:
+        """Saves the books in batches until stopped"""
+
+        if self.durable:
+            await self._create_group()
+
+        while self.is_running or (self.pending and not self.durable):
+            try:
+                if self.durable:
+                    entries = await self._read_stream()
+                else:
+                    entries = await self._read_pending()
+
+                if entries:
+                    await self.flush(entries)
+            except Exception as error:
+                logging.warning(f"Book writer failed: {error}")
+                await asyncio.sleep(self.flush_interval)
+
+    async def flush(self, entries: list[tuple[bytes | None, Book]]) -> None:
+        """
+        Creates the books in one transaction.
+
+        Args:
+            entries (list[tuple[bytes | None, Book]]): The stream IDs and the books.
+        """
+
+        books = list({book.isbn: book for _, book in entries}.values())
+
+        started_at = time.perf_counter()
+        try:
+            async with async_session() as db:
+                self.written += await BookService().create_books(db, books, self.cache)
+        except Exception as error:
+            self.failed_flushes += 1
+            logging.warning(f"Failed to save {len(books)} books: {error}")
+            # the stream entries are not acknowledged, so they are retried,
+            # the books taken from memory are lost
+            if not self.durable:
+                self._drop(len(books), "failed")
+            return
+        finally:
+            self.last_flush_seconds = time.perf_counter() - started_at
+            self.flush_seconds += self.last_flush_seconds
+            self.flushes += 1
+            book_writer_flush_duration.observe(self.last_flush_seconds)
+
+        ids = [id for id, _ in entries if id is not None]
+        if ids:
+            await self._remove(*ids)
+
+    async def _read_pending(self) -> list[tuple[None, Book]]:
+        """Waits for a full batch or the flush interval and takes the pending books"""
+
+        if self.is_running and len(self.pending) < self.batch_size:
+            self.is_full.clear()
+            try:
+                await asyncio.wait_for(self.is_full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+        isbns = list(self.pending)[: self.batch_size]
+        entries = [(None, self.pending.pop(isbn)) for isbn in isbns]
+        book_writer_pending.set(len(self.pending))
+
+        return entries
+
+    async def _create_group(self) -> None:
+        """Creates the consumer group of the stream if it does not exist"""
+
+        try:
+            await self.cache.client.xgroup_create(
+                self.stream, self.group, id="0", mkstream=True
+            )
+        except aioredis.ResponseError as error:
+            if "BUSYGROUP" not in str(error):
+                raise
+
+    async def _read_stream(self) -> list[tuple[bytes, Book]]:
+        """Takes over the books of stopped workers, or waits for new ones"""
+
+        _, messages, *_ = await self.cache.client.xautoclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            min_idle_time=self.claim_idle * 1000,
+            count=self.batch_size,
+        )
+        if not messages:
+            streams = await self.cache.client.xreadgroup(
+                self.group,
+                self.consumer,
+                {self.stream: ">"},
+                count=self.batch_size,
+                block=int(self.flush_interval * 1000),
+            )
+            messages = streams[0][1] if streams else []
+
+        entries, invalid_ids = [], []
+        for id, fields in messages:
+            try:
+                entries.append((id, Book.model_validate_json(fields[b"book"])))
+            except (ValidationError, KeyError, TypeError):
+                invalid_ids.append(id)
+
+        if invalid_ids:
+            logging.warning(f"Dropped {len(invalid_ids)} invalid book writer entries")
+            await self._remove(*invalid_ids)
+
+        return entries
+
+    async def _remove(self, *ids: bytes) -> None:
+        """Acknowledges and deletes the stream entries"""
+
+        async with self.cache.client.pipeline(transaction=False) as pipe:
+            pipe.xack(self.stream, self.group, *ids)
+            pipe.xdel(self.stream, *ids)
+            await pipe.execute()
+
+    def _drop(self, count: int, reason: str) -> None:
+        """Counts and logs the books which are not saved"""
+
+        if not count:
+            return
+
+        self.dropped += count
+        book_writer_dropped.inc(reason, amount=count)
+        logging.warning(f"Book writer dropped {count} books: {reason}")
+
+    def stats(self) -> BookWriterStats:
+        """Returns the current usage statistics of the writer"""
+
+        return BookWriterStats(
+            pending=len(self.pending),
+            written=self.written,
+            dropped=self.dropped,
+            flushes=self.flushes,
+            failed_flushes=self.failed_flushes,
+            last_flush_seconds=self.last_flush_seconds,
+            avg_flush_seconds=self.flush_seconds / self.flushes if self.flushes else 0.0,
+        )
+
+
+book_writer = BookWriter(
+    batch_size=settings.BOOK_WRITER_BATCH_SIZE,
+    flush_interval=settings.BOOK_WRITER_FLUSH_INTERVAL,
+    max_pending=settings.BOOK_WRITER_MAX_PENDING,
+    durable=settings.BOOK_WRITER_DURABLE,
+    stream=settings.BOOK_WRITER_STREAM,
+    claim_idle=settings.BOOK_WRITER_CLAIM_IDLE,
+)
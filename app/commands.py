@@ -1,6 +1,26 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+from typing import Iterator
+
 import click
+from pydantic import ValidationError
 
+from app.auth.services import TokenService
+from app.books.schemas import Book
+from app.books.services import BookService
+from app.books.utils import (
+    CATEGORIES_NAMESPACE,
+    CATEGORY_BOOKS_NAMESPACE,
+    CATEGORY_NAMESPACE,
+    ISBN_NAMESPACE,
+    SEARCH_NAMESPACE,
+)
+from app.config import settings
 from app.database import async_session
+from app.external.redis_db.services import RedisService
 from app.users.exceptions import EmailTaken, UsernameTaken
 from app.users.schemas import User, UserRole
 from app.users.services import UserService
@@ -51,3 +71,221 @@ def createadmin(username, email, password):
                 click.echo(f"Error creating admin: {e}")
 
     asyncio.run(create_admin())
+
+
+def read_book_rows(path: str, file_format: str) -> Iterator[dict]:
+    """
+    Streams the book rows from a JSONL or CSV file.
+
+    In CSV files the authors and categories are separated by "|".
+
+    Args:
+        path (str): The path of the file.
+        file_format (str): The format of the file, "jsonl" or "csv".
+
+    Yields:
+        dict: The raw book data.
+    """
+
+    with open(path, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            for row in csv.DictReader(file):
+                for field in ("authors", "categories"):
+                    names = (row.get(field) or "").split("|")
+                    row[field] = [name.strip() for name in names if name.strip()]
+                yield row
+            return
+
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # keeps the row numbering, the empty row fails the validation
+                yield {}
+
+
+def parse_book(row: dict) -> Book:
+    """
+    Validates the raw book data.
+
+    The authors and categories may be given as names or as objects with a name.
+
+    Args:
+        row (dict): The raw book data.
+
+    Raises:
+        TypeError: If the row is not an object, or the authors or the
+            categories are not a list.
+        ValidationError: If the data is not a valid book.
+
+    Returns:
+        Book: The validated book.
+    """
+
+    if not isinstance(row, dict):
+        raise TypeError("The book must be an object")
+
+    for field in ("authors", "categories"):
+        if not isinstance(row.get(field) or [], list):
+            raise TypeError(f"The {field} must be a list")
+        row[field] = [
+            {"name": item} if isinstance(item, str) else item
+            for item in row.get(field) or []
+        ]
+
+    return Book(**row)
+
+
+@click.command()
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["jsonl", "csv"]),
+    help="Format of the file. Detected by the file extension by default.",
+)
+@click.option(
+    "--batch-size",
+    default=1000,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of books written in one transaction",
+)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False),
+    help="File storing the number of processed rows. Defaults to <path>.checkpoint",
+)
+def importbooks(path, file_format, batch_size, checkpoint):
+    """
+    Import books from a JSONL or CSV dump.
+
+    The file is streamed and written in batches, one transaction per batch.
+    After every batch the number of processed rows is saved to the checkpoint
+    file, so an interrupted import resumes from the last written batch.
+
+    Args:
+        path (str): The path of the file.
+        file_format (str): The format of the file, "jsonl" or "csv".
+        batch_size (int): The number of books written in one transaction.
+        checkpoint (str): The path of the checkpoint file.
+    """
+
+    import asyncio
+
+    file_format = file_format or ("csv" if path.endswith(".csv") else "jsonl")
+    checkpoint = checkpoint or f"{path}.checkpoint"
+
+    processed = 0
+    if os.path.exists(checkpoint):
+        with open(checkpoint) as file:
+            processed = int(file.read().strip() or 0)
+        click.echo(f"Resuming after {processed} rows...")
+
+    async def import_books():
+        nonlocal processed
+
+        book_service = BookService()
+        cache = RedisService()
+        imported = invalid = 0
+        started_at = time.perf_counter()
+
+        async def write_batch(batch: list[Book], rows_count: int):
+            nonlocal processed, imported
+
+            async with async_session() as db:
+                imported += await book_service.create_books(db, batch, cache)
+
+            processed += rows_count
+            with open(checkpoint, "w") as file:
+                file.write(str(processed))
+
+            rate = (processed - skipped) / (time.perf_counter() - started_at)
+            click.echo(
+                f"Processed {processed} rows: {imported} imported, "
+                f"{invalid} invalid ({rate:.0f} rows/sec)"
+            )
+
+        skipped = processed
+        rows = islice(read_book_rows(path, file_format), processed, None)
+        batch, rows_count = [], 0
+
+        for row in rows:
+            rows_count += 1
+            try:
+                batch.append(parse_book(row))
+            except (ValidationError, TypeError):
+                invalid += 1
+
+            if rows_count == batch_size:
+                await write_batch(batch, rows_count)
+                batch, rows_count = [], 0
+
+        if rows_count:
+            await write_batch(batch, rows_count)
+
+        await cache.disconnect()
+
+        click.echo("Import finished!")
+
+    asyncio.run(import_books())
+
+
+@click.command()
+@click.argument(
+    "namespace",
+    type=click.Choice(
+        [
+            ISBN_NAMESPACE,
+            CATEGORY_NAMESPACE,
+            CATEGORY_BOOKS_NAMESPACE,
+            CATEGORIES_NAMESPACE,
+            SEARCH_NAMESPACE,
+        ]
+    ),
+)
+def bumpcache(namespace):
+    """
+    Invalidate all the cached values of the namespace by bumping its version.
+
+    Args:
+        namespace (str): The namespace of the cache keys.
+    """
+
+    import asyncio
+
+    async def bump_namespace():
+        cache = RedisService()
+        version = await cache.bump_namespace(namespace)
+        await cache.disconnect()
+        click.echo(f"Namespace {namespace} is at version {version}")
+
+    asyncio.run(bump_namespace())
+
+
+@click.command()
+@click.option(
+    "--batch-size",
+    default=settings.TOKEN_PURGE_BATCH_SIZE,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of tokens deleted in one transaction",
+)
+def purgetokens(batch_size):
+    """
+    Delete the expired refresh tokens.
+
+    Args:
+        batch_size (int): The number of tokens deleted in one transaction.
+    """
+
+    import asyncio
+
+    async def purge_tokens():
+        async with async_session() as db:
+            purged = await TokenService().purge_expired_tokens(db, batch_size)
+        click.echo(f"Purged {purged} expired refresh tokens")
+
+    asyncio.run(purge_tokens())
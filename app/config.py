@@ -36,8 +36,23 @@ class Config(BaseSettings):
     """Класс основных настроек приложения"""
 
     DATABASE_URL: str
+    DATABASE_REPLICA_URL: str | None = None  # read-only queries, the primary if not set
     SITE_DOMAIN: str
 
+    DB_POOL_SIZE: int = 10  # connections kept open by a worker
+    DB_MAX_OVERFLOW: int = 10  # connections opened beyond the pool size under load
+    DB_POOL_TIMEOUT: float = 10.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is reopened, -1 never
+    DB_POOL_PRE_PING: bool = False  # check the connections on checkout
+    DB_STATEMENT_CACHE_SIZE: int = 100  # prepared statements cached per connection
+    DB_STATEMENT_TIMEOUT: int = 30_000  # milliseconds, 0 disables
+    # behind PgBouncer in transaction pooling mode: no prepared statement caches,
+    # and the statement timeout must be set on the database role instead
+    DB_PGBOUNCER: bool = False
+    # seconds a client reads from the primary after its own write, with a replica
+    READ_YOUR_WRITES_WINDOW: int = 5
+    LAST_WRITE_COOKIE_KEY: str = "lastWrite"
+
     ENVIRONMENT: Environment = Environment.PRODUCTION
 
     CORS_ORIGINS: list[str]
@@ -49,21 +64,81 @@ class Config(BaseSettings):
     MIN_PASSWORD_LENGTH: int = 6
     MAX_PASSWORD_LENGTH: int = 128
 
+    PASSWORD_HASH_ROUNDS: int = 12  # bcrypt cost factor
+    PASSWORD_HASH_MAX_WORKERS: int = 4  # threads hashing in parallel
+    PASSWORD_HASH_MAX_PENDING: int = 64  # calls beyond it are rejected with 503
+
     JWT_ALG: str
     JWT_SECRET: str
     JWT_EXP: int = 10  # minutes
 
+    # trust the user claims of the access token instead of loading the user,
+    # unless the user was changed after the token was issued
+    ACCESS_TOKEN_STATELESS: bool = True
+    USER_CACHE_TTL: int = 30  # seconds
+    USER_CACHE_MAX_SIZE: int = 10_000
+
     REFRESH_TOKEN_KEY: str = "refreshToken"
     REFRESH_TOKEN_EXP: int = 60 * 60 * 24 * 21  # 21 days
+    SESSION_STORE_ENABLED: bool = True  # refresh token lookups served from Redis
+    SESSION_TOMBSTONE_TTL: int = 60  # seconds a revoked session can not be stored again
+    MAX_SESSIONS_PER_USER: int = 10  # active refresh tokens, the oldest are revoked
+    TOKEN_PURGE_ENABLED: bool = False  # delete the expired tokens in the workers
+    TOKEN_PURGE_INTERVAL: int = 3600  # seconds between purges
+    TOKEN_PURGE_BATCH_SIZE: int = 1000  # tokens deleted in one transaction
 
     SECURE_COOKIES: bool = True
 
+    PAGE_DEFAULT_LIMIT: int = 50
+    PAGE_MAX_LIMIT: int = 200
+    ISBN_BATCH_MAX_SIZE: int = 200  # ISBNs in one batch lookup
+
     REDIS_URL: str = "redis://redis:6379"
     REDIS_HOST: str = "redis"
     REDIS_PORT: int = 6379
     API_REDIS_HOST: str = "api-redis"
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: int = 5  # seconds to wait for a free connection
+    REDIS_SOCKET_TIMEOUT: float = 5.0  # seconds
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 5.0  # seconds
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30  # seconds
+    REDIS_DRAIN_TIMEOUT: float = 10.0  # seconds to wait for busy connections on shutdown
+
+    CACHE_LOCK_TIMEOUT: int = 10  # seconds after which a load lock is released anyway
+    CACHE_LOCK_WAIT_TIMEOUT: float = 5.0  # seconds to wait for another worker's load
+    CACHE_LOCK_POLL_INTERVAL: float = 0.05  # seconds between cache checks while waiting
+    CACHE_STALE_TTL: int = 300  # seconds an expired value is served while refreshed
+    BOOK_CACHE_TTL: int = 86400  # seconds, a book by ISBN
+    BOOK_LIST_CACHE_TTL: int = 21600  # seconds, pages of books, invalidated on writes
+    CATEGORY_CACHE_TTL: int = 86400  # seconds, categories, invalidated on writes
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidation"
+    CACHE_NAMESPACE_VERSION_TTL: int = 5  # seconds a namespace version is kept in memory
+    CACHE_COMPRESSION_MIN_SIZE: int = 1024  # bytes, larger cached responses are gzipped
+    CACHE_COMPRESSION_LEVEL: int = 5
+
+    LOCAL_CACHE_ENABLED: bool = True  # in-process cache in front of Redis
+    LOCAL_CACHE_MAX_SIZE: int = 1000  # number of values
+    LOCAL_CACHE_TTL: int = 30  # seconds
+
+    METRICS_ENABLED: bool = True  # request metrics middleware and /metrics
+    SQL_SLOW_QUERY_THRESHOLD: float = 0.5  # seconds, slower queries are logged
+    SQL_N_PLUS_ONE_THRESHOLD: int = 10  # repeats of a query in a request logged in debug
+
+    BOOK_WRITER_BATCH_SIZE: int = 100  # books created in one transaction
+    BOOK_WRITER_FLUSH_INTERVAL: float = 1.0  # seconds between writes of smaller batches
+    BOOK_WRITER_MAX_PENDING: int = 10000  # books waiting to be written, more are dropped
+    BOOK_WRITER_DURABLE: bool = False  # queue the books in a Redis stream
+    BOOK_WRITER_STREAM: str = "books:new"
+    BOOK_WRITER_CLAIM_IDLE: int = 60  # seconds before a stopped worker's books are taken
 
     GOOGLE_BOOKS_API: str = "https://www.googleapis.com/books/v1"
+    GOOGLE_BOOKS_HTTP2: bool = True  # used only if the "h2" package is installed
+    GOOGLE_BOOKS_TIMEOUT: float = 10.0  # seconds
+    GOOGLE_BOOKS_CONNECT_TIMEOUT: float = 5.0  # seconds
+    GOOGLE_BOOKS_MAX_CONNECTIONS: int = 20
+    GOOGLE_BOOKS_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    GOOGLE_BOOKS_KEEPALIVE_EXPIRY: float = 60.0  # seconds
+    GOOGLE_BOOKS_BATCH_CONCURRENCY: int = 10  # parallel requests of a batch lookup
 
     model_config = SettingsConfigDict(case_sensitive=True)
 
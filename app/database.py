@@ -1,9 +1,23 @@
-from sqlalchemy import MetaData
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from fastapi import Request, Response
+from sqlalchemy import MetaData, event, exc as sa_exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.orm.decl_api import DeclarativeMeta
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
+from app.metrics import (
+    db_pool_checkout_duration,
+    db_pool_checkout_timeouts,
+    db_query_duration,
+    request_stats,
+)
 
 DB_NAMING_CONVENTION = {
     "ix": "%(column_0_label)s_idx",  # Индекс
@@ -13,19 +27,197 @@ DB_NAMING_CONVENTION = {
     "pk": "%(table_name)s_pkey",  # Первичный ключ
 }
 
-# add echo=True for sqlalchemy logs
-async_engine = create_async_engine(settings.DATABASE_URL)
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Connection pool recording the time the checkouts wait for a connection"""
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            db_pool_checkout_timeouts.inc()
+            raise
+        finally:
+            db_pool_checkout_duration.observe(time.perf_counter() - started_at)
+
+
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    """Records the latency of the query, and counts it for the current request"""
+
+    duration = time.perf_counter() - conn.info["query_started_at"].pop()
+    db_query_duration.observe(duration)
+
+    if duration >= settings.SQL_SLOW_QUERY_THRESHOLD:
+        logging.warning(
+            f"Slow query ({duration:.3f}s): {statement} "
+            f"with parameters {str(parameters)[:1000]}"
+        )
+
+    stats = request_stats.get()
+    if stats is None:
+        return
+
+    stats.db_queries += 1
+    stats.db_seconds += duration
+
+    if stats.statements is not None:
+        executions = stats.statements.get(statement, 0) + 1
+        stats.statements[statement] = executions
+        if executions == settings.SQL_N_PLUS_ONE_THRESHOLD:
+            logging.warning(
+                f"Possible N+1 queries: executed {executions} times "
+                f"while handling {stats.path}: {statement}"
+            )
+
+
+def create_db_engine(url: str) -> AsyncEngine:
+    """
+    Creates an engine with the pool and connection settings of the config.
+
+    Args:
+        url (str): The database URL.
+
+    Returns:
+        AsyncEngine: The engine.
+    """
+
+    connect_args = {}
+    # the other drivers do not know the asyncpg arguments
+    if make_url(url).get_driver_name() == "asyncpg":
+        statement_cache_size = (
+            0 if settings.DB_PGBOUNCER else settings.DB_STATEMENT_CACHE_SIZE
+        )
+        # the statements prepared by SQLAlchemy and by asyncpg itself
+        connect_args["prepared_statement_cache_size"] = statement_cache_size
+        connect_args["statement_cache_size"] = statement_cache_size
+        # PgBouncer rejects the connections with unknown startup parameters
+        if settings.DB_STATEMENT_TIMEOUT and not settings.DB_PGBOUNCER:
+            connect_args["server_settings"] = {
+                "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT)
+            }
+
+    # add echo=True for sqlalchemy logs
+    engine = create_async_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+    event.listen(engine.sync_engine, "before_cursor_execute", start_query_timer)
+    event.listen(engine.sync_engine, "after_cursor_execute", record_query)
+
+    return engine
+
+
+async_engine = create_db_engine(settings.DATABASE_URL)
+replica_engine = (
+    create_db_engine(settings.DATABASE_REPLICA_URL)
+    if settings.DATABASE_REPLICA_URL
+    else None
+)
 
 async_session = sessionmaker(
     bind=async_engine,
     expire_on_commit=False,
     class_=AsyncSession,
 )
+replica_session = sessionmaker(
+    bind=replica_engine or async_engine,
+    expire_on_commit=False,
+    class_=AsyncSession,
+)
+
+
+@contextmanager
+def capture_queries() -> Iterator[list[str]]:
+    """
+    Collects the statements executed by all the engines within the block.
+
+    Yields:
+        list[str]: The executed statements, filled as they are executed.
+    """
+
+    statements: list[str] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "after_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "after_cursor_execute", capture)
+
 
 metadata = MetaData(naming_convention=DB_NAMING_CONVENTION)
 Base: DeclarativeMeta = declarative_base(metadata=metadata)
 
 
-async def get_db() -> AsyncSession:
+async def get_db(request: Request, response: Response) -> AsyncSession:
+    """
+    Yields a session of the primary database.
+
+    With a replica, the client of a request which may write is sent a cookie
+    so its next reads are served by the primary, see `get_read_db`.
+
+    Args:
+        request (Request): The current request.
+        response (Response): The response of the request.
+
+    Yields:
+        AsyncSession: The session.
+    """
+
+    if (
+        replica_engine is not None
+        and settings.READ_YOUR_WRITES_WINDOW
+        and request.method not in ("GET", "HEAD", "OPTIONS")
+    ):
+        response.set_cookie(
+            key=settings.LAST_WRITE_COOKIE_KEY,
+            value=str(time.time()),
+            max_age=settings.READ_YOUR_WRITES_WINDOW,
+            httponly=True,
+            samesite="none",
+            secure=settings.SECURE_COOKIES,
+            domain=settings.SITE_DOMAIN,
+        )
+
     async with async_session() as db:
         yield db
+
+
+async def get_read_db(request: Request) -> AsyncSession:
+    """
+    Yields a session for read-only queries.
+
+    The reads are served by the replica, unless the client wrote within
+    the last `READ_YOUR_WRITES_WINDOW` seconds and the replica may lag behind.
+
+    Args:
+        request (Request): The current request.
+
+    Yields:
+        AsyncSession: The session.
+    """
+
+    session = replica_session
+    last_write = request.cookies.get(settings.LAST_WRITE_COOKIE_KEY)
+    if last_write:
+        try:
+            if time.time() - float(last_write) < settings.READ_YOUR_WRITES_WINDOW:
+                session = async_session
+        except ValueError:
+            pass
+
+    async with session() as db:
+        yield db
@@ -0,0 +1,17 @@
+from fastapi import Request
+
+from app.external.google_books_api.services import GoogleBooksService
+
+
+def get_google_books_service(request: Request) -> GoogleBooksService:
+    """
+    Returns a Google Books service bound to the application-wide HTTP client.
+
+    Args:
+        request (Request): The current request.
+
+    Returns:
+        GoogleBooksService: The Google Books service using the shared client.
+    """
+
+    return GoogleBooksService(request.app.state.google_books_client)
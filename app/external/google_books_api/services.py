@@ -1,41 +1,91 @@
 import asyncio
+import importlib.util
 import logging
+import time
 
 import httpx
 
 from app.books.schemas import Author, Book, Category
 from app.config import settings
+from app.metrics import google_books_request_duration, google_books_requests
+
+# HTTP/2 support in httpx requires the optional "h2" package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def create_google_books_client(
+    base_url: str = settings.GOOGLE_BOOKS_API,
+) -> httpx.AsyncClient:
+    """
+    Creates a long-lived HTTP client for the Google Books API.
+
+    The client keeps idle connections alive so that the lookups reuse them
+    instead of paying DNS, TCP and TLS setup on every request.
+
+    Args:
+        base_url (str, optional): The base URL of the API.
+            Defaults to settings.GOOGLE_BOOKS_API.
+
+    Returns:
+        httpx.AsyncClient: The configured HTTP client.
+    """
+
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=settings.GOOGLE_BOOKS_HTTP2 and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=settings.GOOGLE_BOOKS_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GOOGLE_BOOKS_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.GOOGLE_BOOKS_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            settings.GOOGLE_BOOKS_TIMEOUT,
+            connect=settings.GOOGLE_BOOKS_CONNECT_TIMEOUT,
+        ),
+    )
 
 
 class GoogleBooksService:
 
     BASE_URL: str = settings.GOOGLE_BOOKS_API
 
-    @property
-    def session(self):
-        return httpx.AsyncClient(base_url=self.BASE_URL, timeout=10.0)
+    def __init__(self, client: httpx.AsyncClient | None = None):
+        """
+        Initializing the class with an HTTP client.
+
+        Args:
+            client (httpx.AsyncClient, optional): The shared HTTP client.
+                A new client is created if it is not provided.
+        """
+        self.client = client or create_google_books_client(self.BASE_URL)
 
-    async def fetch_data(self, url: str) -> dict | None:
+    async def fetch_data(self, url: str, params: dict | None = None) -> dict | None:
         """
         Fetches data from the given URL using an HTTP GET request.
 
         Args:
-            url (str): The URL to fetch data from.
+            url (str): The URL to fetch data from, relative to the API base URL.
+            params (dict, optional): The query parameters of the request.
 
         Returns:
             dict | None: The JSON response from the URL, or None if an error occurs.
         """
 
+        started_at = time.perf_counter()
         try:
-            async with self.session as session:
-                response = await session.get(url)
-                response.raise_for_status()
-                return response.json()
+            response = await self.client.get(url, params=params)
+            response.raise_for_status()
+            google_books_requests.inc("ok")
+            return response.json()
 
         except httpx.HTTPError as e:
+            google_books_requests.inc("error")
             logging.error(f"Error fetching data from Google Books API: {e}")
             return None
 
+        finally:
+            google_books_request_duration.observe(time.perf_counter() - started_at)
+
     async def get_book_by_isbn(self, isbn: str) -> Book | None:
         """
         Retrieves a book by its ISBN.
@@ -47,9 +97,7 @@ class GoogleBooksService:
             Book | None: The retrieved book if found, otherwise None.
         """
 
-        url = f"{self.BASE_URL}/volumes?q=isbn:{isbn}"
-
-        response_json = await self.fetch_data(url)
+        response_json = await self.fetch_data("/volumes", params={"q": f"isbn:{isbn}"})
         if not response_json or response_json["totalItems"] == 0:
             return None
 
@@ -60,6 +108,27 @@ class GoogleBooksService:
 
         return book
 
+    async def get_books_by_isbns(self, isbns: list[str]) -> dict[str, Book | None]:
+        """
+        Retrieves many books by ISBN with a bounded number of concurrent requests.
+
+        Args:
+            isbns (list[str]): The ISBNs of the books to retrieve.
+
+        Returns:
+            dict[str, Book | None]: The retrieved books by ISBN, None for the books not found.
+        """
+
+        semaphore = asyncio.Semaphore(settings.GOOGLE_BOOKS_BATCH_CONCURRENCY)
+
+        async def get_book(isbn: str) -> Book | None:
+            async with semaphore:
+                return await self.get_book_by_isbn(isbn)
+
+        books = await asyncio.gather(*[get_book(isbn) for isbn in isbns])
+
+        return dict(zip(isbns, books))
+
     def _parse_book_from_response(self, isbn: str, response_json: dict) -> Book:
         """
         Parses book information from the response JSON and returns a Book object.
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+from uuid import uuid4
+
+import redis.asyncio as aioredis
+from cachetools import TLRUCache
+
+from app.config import settings
+from app.external.redis_db.schemas import LocalCacheStats
+
+
+class LocalCache:
+    """
+    Bounded in-process cache in front of Redis.
+
+    The least recently used values are evicted first, and a value expires
+    after `ttl` seconds or with its Redis key, whichever comes first.
+    The workers notify each other of changed keys through Redis pub/sub.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.ttl = ttl
+        self.values: TLRUCache = TLRUCache(maxsize=max_size, ttu=self._expires_at)
+        self.worker_id = uuid4().hex
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.listener: asyncio.Task | None = None
+
+    def _expires_at(self, key: str, item: tuple[bytes, int | None], now: float) -> float:
+        """Returns the expiration time of the value cached at the moment `now`"""
+
+        _, ttl = item
+        return now + min(ttl or self.ttl, self.ttl)
+
+    def get(self, key: str) -> bytes | None:
+        """
+        Retrieves a cached value by key.
+
+        Args:
+            key (str): The key of the value.
+
+        Returns:
+            bytes | None: The cached value, or None if not found or expired.
+        """
+
+        item = self.values.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return item[0]
+
+    def set(self, key: str, value: bytes, ttl: int | None = None) -> None:
+        """
+        Caches the value.
+
+        Args:
+            key (str): The key of the value.
+            value (bytes): The value.
+            ttl (int, optional): Seconds of life of the Redis key.
+        """
+
+        self.values[key] = (value, ttl)
+
+    def invalidate(self, *keys: str) -> None:
+        """
+        Removes the values from the cache.
+
+        Args:
+            *keys (str): The keys of the values.
+        """
+
+        for key in keys:
+            self.values.pop(key, None)
+
+    def invalidation_message(self, *keys: str) -> str:
+        """
+        Builds the message notifying the other workers of changed keys.
+
+        Args:
+            *keys (str): The changed keys.
+
+        Returns:
+            str: The message to publish.
+        """
+
+        return json.dumps({"worker_id": self.worker_id, "keys": keys})
+
+    def start(self) -> None:
+        """Starts listening to the invalidations of the other workers"""
+
+        self.listener = asyncio.create_task(self.listen())
+        self.listener.add_done_callback(self._log_exit)
+
+    async def stop(self) -> None:
+        """Stops listening to the invalidations"""
+
+        if self.listener is None:
+            return
+
+        listener, self.listener = self.listener, None
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+    def _log_exit(self, listener: asyncio.Task) -> None:
+        """Logs the listener stopping without being cancelled"""
+
+        if listener.cancelled():
+            return
+
+        logging.error(f"Cache invalidation listener stopped: {listener.exception()}")
+
+    async def listen(self) -> None:
+        """
+        Invalidates the keys changed by the other workers until cancelled.
+
+        The subscriber uses its own connection, so it is not taken from the
+        shared pool for the lifetime of the worker.
+        """
+
+        client = aioredis.Redis.from_url(
+            str(settings.REDIS_URL),
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            decode_responses=True,
+        )
+
+        try:
+            while True:
+                try:
+                    async with client.pubsub() as pubsub:
+                        await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                        # the changes made while not subscribed are unknown
+                        self.values.clear()
+
+                        async for message in pubsub.listen():
+                            if message["type"] != "message":
+                                continue
+                            try:
+                                self._handle_invalidation(message["data"])
+                            except Exception as error:
+                                # the changed keys are unknown
+                                logging.warning(
+                                    f"Invalid cache invalidation message: {error}"
+                                )
+                                self.values.clear()
+
+                except Exception as error:
+                    # disconnected, or an unexpected failure: subscribe again
+                    logging.warning(f"Cache invalidation listener failed: {error}")
+                    await asyncio.sleep(1)
+        finally:
+            await client.aclose()
+
+    def _handle_invalidation(self, data: str) -> None:
+        """Invalidates the keys from a message of another worker"""
+
+        message = json.loads(data)
+        if message["worker_id"] == self.worker_id:
+            return
+
+        for key in message["keys"]:
+            if self.values.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> LocalCacheStats:
+        """Returns the current usage statistics of the cache"""
+
+        return LocalCacheStats(
+            max_size=int(self.values.maxsize),
+            size=len(self.values),
+            hits=self.hits,
+            misses=self.misses,
+            invalidations=self.invalidations,
+        )
+
+
+local_cache = LocalCache(
+    max_size=settings.LOCAL_CACHE_MAX_SIZE,
+    ttl=settings.LOCAL_CACHE_TTL,
+)
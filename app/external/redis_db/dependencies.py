@@ -0,0 +1,24 @@
+from fastapi import Request
+
+from app.config import settings
+from app.external.redis_db.cache import local_cache
+from app.external.redis_db.services import RedisService
+
+
+def get_redis_service(request: Request) -> RedisService:
+    """
+    Returns a Redis service bound to the application-wide connection pool.
+
+    The values are also cached in the process if the local cache is enabled.
+
+    Args:
+        request (Request): The current request.
+
+    Returns:
+        RedisService: The Redis service using the shared pool.
+    """
+
+    return RedisService(
+        request.app.state.redis_pool,
+        local_cache if settings.LOCAL_CACHE_ENABLED else None,
+    )
@@ -0,0 +1,104 @@
+import hashlib
+import json
+from typing import Any
+
+import redis.asyncio as aioredis
+from cachetools import TTLCache
+
+from app.config import settings
+
+
+def hash_params(*params: Any) -> str:
+    """
+    Hashes the parameters into a fixed-length key part.
+
+    Args:
+        *params: The JSON serializable parameters.
+
+    Returns:
+        str: The hex digest of the canonical JSON of the parameters.
+    """
+
+    payload = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def key_namespace(key: str | bytes) -> str:
+    """
+    Returns the namespace of a key, used to label the cache metrics.
+
+    Args:
+        key (str | bytes): A key built by `make_key`, or any colon-separated key.
+
+    Returns:
+        str: The namespace, or "other" for the keys without one.
+    """
+
+    if isinstance(key, bytes):
+        key = key.decode()
+
+    parts = key.split(":", 2)
+    if len(parts) == 1:
+        return "other"
+    if len(parts) == 3 and parts[0][:1] == "v" and parts[0][1:].isdigit():
+        return parts[1]
+
+    return parts[0]
+
+
+class CacheNamespaces:
+    """
+    Versions of the cache key namespaces.
+
+    Bumping the version of a namespace makes all its keys unreachable at once,
+    the old values are left to expire. The versions are stored in Redis and
+    cached in the process for `ttl` seconds.
+    """
+
+    def __init__(self, ttl: int):
+        self.versions: TTLCache = TTLCache(maxsize=256, ttl=ttl)
+
+    async def get_version(self, client: aioredis.Redis, namespace: str) -> int:
+        """
+        Retrieves the current version of the namespace.
+
+        Args:
+            client (Redis): The Redis client.
+            namespace (str): The namespace.
+
+        Returns:
+            int: The version, 1 if it was never bumped.
+        """
+
+        version = self.versions.get(namespace)
+        if version is None:
+            version = int(await client.get(f"namespace:{namespace}") or 1)
+            self.versions[namespace] = version
+
+        return version
+
+    async def bump(self, client: aioredis.Redis, namespace: str) -> int:
+        """
+        Increments the version of the namespace.
+
+        Args:
+            client (Redis): The Redis client.
+            namespace (str): The namespace.
+
+        Returns:
+            int: The new version.
+        """
+
+        # a missing version is 1, so the first bump makes it 2
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.setnx(f"namespace:{namespace}", 1)
+            pipe.incr(f"namespace:{namespace}")
+            _, version = await pipe.execute()
+
+        self.versions[namespace] = version
+
+        return version
+
+
+cache_namespaces = CacheNamespaces(ttl=settings.CACHE_NAMESPACE_VERSION_TTL)
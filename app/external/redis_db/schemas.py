@@ -8,3 +8,23 @@ class RedisData(BaseSchema):
     key: bytes | str
     value: bytes | str
     ttl: Optional[int | timedelta] = None  # seconds of life
+    tags: list[str] = []  # groups of keys invalidated together
+
+
+class RedisPoolStats(BaseSchema):
+    max_connections: int
+    created: int  # connections held by the pool
+    in_use: int
+    idle: int
+    waits: int  # times a caller had to wait for a free connection
+    wait_timeouts: int  # times a caller gave up waiting
+    hits: int  # lookups of the keys found in Redis
+    misses: int  # lookups of the missing keys
+
+
+class LocalCacheStats(BaseSchema):
+    max_size: int
+    size: int
+    hits: int
+    misses: int
+    invalidations: int  # values dropped after changes by other workers
@@ -1,21 +1,247 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable
+
 import redis.asyncio as aioredis
+from fastapi import BackgroundTasks
+from redis.asyncio.client import Pipeline
+from redis.asyncio.lock import Lock
+from redis.exceptions import LockError
 
 from app.config import settings
-from app.external.redis_db.schemas import RedisData
+from app.external.redis_db.cache import LocalCache
+from app.external.redis_db.keys import cache_namespaces, hash_params, key_namespace
+from app.external.redis_db.schemas import RedisData, RedisPoolStats
+from app.metrics import cache_lookup_duration, cache_lookups
+
+# adds the key to the tag sets, which live as long as their longest-living key
+TAG_KEY_SCRIPT = """
+local ttl = tonumber(ARGV[2])
+for _, tag in ipairs(KEYS) do
+    local tag_ttl = redis.call('TTL', tag)
+    redis.call('SADD', tag, ARGV[1])
+    if ttl < 0 then
+        redis.call('PERSIST', tag)
+    elseif tag_ttl == -2 or (tag_ttl >= 0 and tag_ttl < ttl) then
+        redis.call('EXPIRE', tag, ttl)
+    end
+end
+"""
+
+# deletes the tag sets with all their keys, increments the versions of the tags
+# and returns the deleted keys
+INVALIDATE_TAGS_SCRIPT = """
+local keys = {}
+for _, tag in ipairs(KEYS) do
+    for _, key in ipairs(redis.call('SMEMBERS', tag)) do
+        table.insert(keys, key)
+    end
+    redis.call('DEL', tag)
+    redis.call('INCR', 'version:' .. tag)
+end
+for i = 1, #keys, 1000 do
+    redis.call('DEL', unpack(keys, i, math.min(i + 999, #keys)))
+end
+return keys
+"""
+
+# sets the key and adds it to the tag sets, unless any of the tags was invalidated
+# since its version was read, returns 1 if the key was set
+SET_IF_TAGS_UNCHANGED_SCRIPT = """
+for i = 2, #KEYS do
+    local version = tonumber(redis.call('GET', 'version:' .. KEYS[i]) or '0')
+    if version ~= tonumber(ARGV[i + 1]) then
+        return 0
+    end
+end
+local ttl = tonumber(ARGV[2])
+if ttl > 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ttl)
+else
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+for i = 2, #KEYS do
+    local tag_ttl = redis.call('TTL', KEYS[i])
+    redis.call('SADD', KEYS[i], KEYS[1])
+    if ttl <= 0 then
+        redis.call('PERSIST', KEYS[i])
+    elseif tag_ttl == -2 or (tag_ttl >= 0 and tag_ttl < ttl) then
+        redis.call('EXPIRE', KEYS[i], ttl)
+    end
+end
+return 1
+"""
+
+
+class RedisConnectionPool(aioredis.BlockingConnectionPool):
+    """
+    Blocking connection pool that keeps usage statistics.
+
+    Instead of failing when all connections are busy, callers wait up to
+    `timeout` seconds for one of them to be released.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = 0
+        self.wait_timeouts = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get_connection(self, command_name, *keys, **options):
+        """Gets a connection from the pool, counting the waits for a free one"""
+
+        must_wait = self._condition.locked() or not self.can_get_connection()
+        if must_wait:
+            self.waits += 1
+
+        try:
+            return await super().get_connection(command_name, *keys, **options)
+        except aioredis.ConnectionError:
+            if must_wait:
+                self.wait_timeouts += 1
+            raise
+
+    async def drain(self, timeout: float) -> None:
+        """
+        Waits for the connections in use to be released and closes all connections.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait for busy connections.
+        """
+
+        try:
+            async with self._condition:
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: not self._in_use_connections),
+                    timeout,
+                )
+        except asyncio.TimeoutError:
+            pass
+
+        await self.disconnect()
+
+    def count_lookup(self, value: bytes | None) -> None:
+        """
+        Counts a lookup of a cached value.
+
+        Args:
+            value (bytes | None): The found value, or None if the key is missing.
+        """
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def stats(self) -> RedisPoolStats:
+        """Returns the current usage statistics of the pool"""
+
+        return RedisPoolStats(
+            max_connections=self.max_connections,
+            created=len(self._in_use_connections) + len(self._available_connections),
+            in_use=len(self._in_use_connections),
+            idle=len(self._available_connections),
+            waits=self.waits,
+            wait_timeouts=self.wait_timeouts,
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+
+def create_redis_pool() -> RedisConnectionPool:
+    """
+    Creates a Redis connection pool configured from the application settings.
+
+    Returns:
+        RedisConnectionPool: The new connection pool.
+    """
+
+    return RedisConnectionPool.from_url(
+        str(settings.REDIS_URL),
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        # values are kept as bytes, so that compressed responses can be cached
+        decode_responses=False,
+    )
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent loads of the same key within the process.
+
+    The first caller runs the load, the others await its result.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+
+    async def run(self, key: str, load: Callable[[], Awaitable]):
+        """
+        Runs the load for the key unless it is already in flight.
+
+        Args:
+            key (str): The key identifying the load.
+            load (Callable[[], Awaitable]): The function loading the value.
+
+        Returns:
+            The result of the load.
+        """
+
+        call = self._calls.get(key)
+        if call is not None:
+            try:
+                return await asyncio.shield(call)
+            except asyncio.CancelledError:
+                if not call.cancelled():
+                    raise
+                # the caller running the load was cancelled, so load it anew
+                return await self.run(key, load)
+
+        call = asyncio.get_running_loop().create_future()
+        call.add_done_callback(lambda call: call.cancelled() or call.exception())
+        self._calls[key] = call
+
+        try:
+            result = await load()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except Exception as error:
+            call.set_exception(error)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+single_flight = SingleFlight()
 
 
 class RedisService:
 
-    def __init__(self, max_connections: int = 5):
+    def __init__(
+        self,
+        pool: RedisConnectionPool | None = None,
+        local_cache: LocalCache | None = None,
+    ):
         """
         Initializing the class with a connection pool and a Redis client.
+
+        Args:
+            pool (RedisConnectionPool, optional): The shared connection pool.
+                A new pool is created if it is not provided.
+            local_cache (LocalCache, optional): The in-process cache in front of Redis.
         """
-        self.pool = aioredis.ConnectionPool.from_url(
-            str(settings.REDIS_URL),
-            max_connections=max_connections,
-            decode_responses=True,
-        )
+        self.pool = pool or create_redis_pool()
         self.client = aioredis.Redis(connection_pool=self.pool)
+        self.local_cache = local_cache
 
     async def disconnect(self):
         """Disconnects from the Redis connection pool"""
@@ -23,7 +249,11 @@ class RedisService:
         await self.pool.disconnect()
 
     async def set_key(
-        self, redis_data: RedisData, *, is_transaction: bool = False
+        self,
+        redis_data: RedisData,
+        *,
+        is_transaction: bool = False,
+        tag_versions: list[int] | None = None,
     ) -> None:
         """
         Sets the key in the Redis database with the provided RedisData object.
@@ -32,13 +262,40 @@ class RedisService:
             redis_data (RedisData): The RedisData object containing the key and value to be set.
             is_transaction (bool, optional): Indicates if the operation should be performed within a transaction.
                 Defaults to False.
+            tag_versions (list[int], optional): The versions of the tags read by
+                `get_tag_versions` before the value was loaded. The key is not set
+                if any of the tags was invalidated since then. Defaults to None.
         """
 
-        async with self.client.pipeline(transaction=is_transaction) as pipe:
-            await pipe.set(redis_data.key, redis_data.value)
-            if redis_data.ttl:
-                await pipe.expire(redis_data.key, redis_data.ttl)
-            await pipe.execute()
+        ttl = self._get_ttl(redis_data)
+
+        if tag_versions is not None:
+            is_set = await self.client.register_script(SET_IF_TAGS_UNCHANGED_SCRIPT)(
+                keys=[redis_data.key, *(f"tag:{tag}" for tag in redis_data.tags)],
+                args=[redis_data.value, ttl or -1, *tag_versions],
+            )
+            if not is_set:
+                return
+
+            if self.local_cache is not None:
+                async with self.client.pipeline(transaction=False) as pipe:
+                    self._publish_invalidation(pipe, redis_data.key)
+                    await pipe.execute()
+        else:
+            async with self.client.pipeline(transaction=is_transaction) as pipe:
+                await pipe.set(redis_data.key, redis_data.value)
+                if redis_data.ttl:
+                    await pipe.expire(redis_data.key, redis_data.ttl)
+                if redis_data.tags:
+                    await self.client.register_script(TAG_KEY_SCRIPT)(
+                        keys=[f"tag:{tag}" for tag in redis_data.tags],
+                        args=[redis_data.key, ttl or -1],
+                        client=pipe,
+                    )
+                self._publish_invalidation(pipe, redis_data.key)
+                await pipe.execute()
+
+        self._cache_locally(redis_data.key, self._get_bytes_value(redis_data), ttl)
 
     async def get_by_key(self, key: str) -> str | None:
         """
@@ -51,10 +308,98 @@ class RedisService:
             str | None: The value associated with the specified key, or None if not found.
         """
 
+        value = await self.get_bytes(key)
+
+        return value.decode() if value is not None else None
+
+    async def get_bytes(self, key: str) -> bytes | None:
+        """
+        Retrieves a raw value from the database using the specified key.
+
+        Args:
+            key (str): The key to retrieve the value for.
+
+        Returns:
+            bytes | None: The value associated with the specified key, or None if not found.
+        """
+
+        value = self._get_locally(key)
+        if value is not None:
+            return value
+
+        started_at = time.perf_counter()
         value = await self.client.get(key)
+        self._observe_lookup(key, started_at)
+        self._count_lookup(key, value)
+        self._cache_locally(key, value)
 
         return value
 
+    async def get_many_bytes(self, keys: list[str]) -> list[bytes | None]:
+        """
+        Retrieves many raw values at once, with one MGET for the ones not cached locally.
+
+        Args:
+            keys (list[str]): The keys to retrieve the values for.
+
+        Returns:
+            list[bytes | None]: The values in the order of the keys, None for the missing ones.
+        """
+
+        values = {key: self._get_locally(key) for key in keys}
+
+        missing_keys = [key for key in keys if values[key] is None]
+        if missing_keys:
+            started_at = time.perf_counter()
+            missing_values = await self.client.mget(missing_keys)
+            self._observe_lookup(missing_keys[0], started_at)
+            for key, value in zip(missing_keys, missing_values):
+                self._count_lookup(key, value)
+                self._cache_locally(key, value)
+                values[key] = value
+
+        return [values[key] for key in keys]
+
+    async def set_many(self, data: list[RedisData], *, stale_ttl: int = 0) -> None:
+        """
+        Sets many keys with one pipeline.
+
+        Args:
+            data (list[RedisData]): The keys and values to set.
+            stale_ttl (int, optional): Seconds the values may still be served by
+                `get_or_load` after their TTL. Defaults to 0.
+        """
+
+        if not data:
+            return
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for redis_data in data:
+                ttl = self._get_ttl(redis_data)
+                pipe.set(
+                    redis_data.key,
+                    redis_data.value,
+                    ex=ttl + stale_ttl if ttl else None,
+                )
+                if ttl and stale_ttl:
+                    pipe.set(f"fresh:{redis_data.key}", 1, ex=ttl)
+                if redis_data.tags:
+                    await self.client.register_script(TAG_KEY_SCRIPT)(
+                        keys=[f"tag:{tag}" for tag in redis_data.tags],
+                        args=[redis_data.key, ttl or -1],
+                        client=pipe,
+                    )
+
+            self._publish_invalidation(pipe, *(redis_data.key for redis_data in data))
+            await pipe.execute()
+
+        for redis_data in data:
+            self._cache_locally(
+                redis_data.key,
+                self._get_bytes_value(redis_data),
+                self._get_ttl(redis_data),
+            )
+
     async def delete_by_key(self, key: str) -> None:
         """
         Deletes an item by key.
@@ -63,7 +408,297 @@ class RedisService:
             key (str): The key of the item to delete.
         """
 
-        await self.client.delete(key)
-    
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(key)
+            self._publish_invalidation(pipe, key)
+            await pipe.execute()
+
+        if self.local_cache is not None:
+            self.local_cache.invalidate(key)
+
+    async def make_key(self, namespace: str, *params: Any, hashed: bool = True) -> str:
+        """
+        Builds a key in the current version of the namespace.
+
+        Args:
+            namespace (str): The namespace of the key.
+            *params: The parameters identifying the value.
+            hashed (bool, optional): Whether the parameters are hashed into
+                a fixed-length key. Otherwise they are joined with colons,
+                which suits the short, already canonical ones. Defaults to True.
+
+        Returns:
+            str: The key, like "v1:search:<hash>".
+        """
+
+        version = await cache_namespaces.get_version(self.client, namespace)
+        suffix = hash_params(*params) if hashed else ":".join(map(str, params))
+
+        return f"v{version}:{namespace}:{suffix}"
+
+    async def bump_namespace(self, namespace: str) -> int:
+        """
+        Invalidates all the keys of the namespace by bumping its version.
+
+        The other workers switch to the new version within
+        CACHE_NAMESPACE_VERSION_TTL seconds.
+
+        Args:
+            namespace (str): The namespace.
+
+        Returns:
+            int: The new version of the namespace.
+        """
+
+        return await cache_namespaces.bump(self.client, namespace)
+
+    async def get_tag_versions(self, *tags: str) -> list[int]:
+        """
+        Retrieves the versions of the tags, incremented on every invalidation.
+
+        Read before loading a value, they let `set_key` skip the value
+        if it was invalidated while being loaded.
+
+        Args:
+            *tags (str): The tags.
+
+        Returns:
+            list[int]: The versions, 0 for the tags never invalidated.
+        """
+
+        versions = await self.client.mget([f"version:tag:{tag}" for tag in tags])
+
+        return [int(version or 0) for version in versions]
+
+    async def invalidate_tags(self, *tags: str) -> None:
+        """
+        Deletes all the keys tagged with any of the tags.
+
+        Args:
+            *tags (str): The tags of the keys to delete.
+        """
+
+        if not tags:
+            return
+
+        invalidate = self.client.register_script(INVALIDATE_TAGS_SCRIPT)
+        keys = await invalidate(keys=[f"tag:{tag}" for tag in tags])
+        if not keys:
+            return
+
+        keys = [key.decode() for key in keys]
+        if self.local_cache is not None:
+            self.local_cache.invalidate(*keys)
+            await self.client.publish(
+                settings.CACHE_INVALIDATION_CHANNEL,
+                self.local_cache.invalidation_message(*keys),
+            )
+
+    async def get_or_load(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[bytes | None]],
+        ttl: int,
+        *,
+        stale_ttl: int = 0,
+        worker: BackgroundTasks | None = None,
+        background_load: Callable[[], Awaitable[bytes | None]] | None = None,
+    ) -> bytes | None:
+        """
+        Retrieves a value by key, loading and caching it on a miss.
+
+        Concurrent misses are coalesced: within the process they await a single
+        load, across workers the load is guarded by a Redis lock and the other
+        workers wait for the value to appear in the cache.
+
+        With `stale_ttl` an expired value is kept for that many seconds longer
+        and is returned while it is refreshed in the background.
+
+        Args:
+            key (str): The key of the value.
+            load (Callable[[], Awaitable[bytes | None]]): Loads the value.
+                None means there is nothing to cache.
+            ttl (int): Seconds the value stays fresh.
+            stale_ttl (int, optional): Seconds an expired value may still be served.
+                Defaults to 0.
+            worker (BackgroundTasks, optional): Runs the refresh of a stale value.
+                Without it the value is refreshed before returning.
+            background_load (Callable[[], Awaitable[bytes | None]], optional): Loads
+                the value in the background refresh. It must not use the resources
+                of the request, such as its database session, which are released
+                before the background tasks run. Required with `worker`.
+
+        Returns:
+            bytes | None: The cached or loaded value.
+        """
+
+        if worker is not None and background_load is None:
+            raise ValueError("A background refresh requires background_load")
+
+        value = self._get_locally(key)
+        if value is not None:
+            return value
+
+        started_at = time.perf_counter()
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.exists(f"fresh:{key}")
+            value, is_fresh = await pipe.execute()
+        self._observe_lookup(key, started_at)
+        self._count_lookup(key, value)
+
+        if value is None:
+            return await single_flight.run(
+                key, lambda: self._load(key, load, ttl, stale_ttl)
+            )
+
+        if stale_ttl and not is_fresh:
+            if worker is None:
+                return await self._refresh(key, load, ttl, stale_ttl) or value
+            worker.add_task(self._refresh, key, background_load, ttl, stale_ttl)
+        else:
+            self._cache_locally(key, value)
+
+        return value
+
+    async def _load(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[bytes | None]],
+        ttl: int,
+        stale_ttl: int,
+    ) -> bytes | None:
+        """Loads a missing value, waiting for another worker if it loads it already"""
+
+        lock = self.client.lock(f"lock:{key}", timeout=settings.CACHE_LOCK_TIMEOUT)
+        if await lock.acquire(blocking=False):
+            value = await self.client.get(key)  # may be cached since the first check
+            if value is not None:
+                await self._release(lock)
+                return value
+            return await self._load_and_set(key, load, ttl, stale_ttl, lock)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.CACHE_LOCK_WAIT_TIMEOUT
+
+        while loop.time() < deadline:
+            await asyncio.sleep(settings.CACHE_LOCK_POLL_INTERVAL)
+
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.exists(f"lock:{key}")
+                value, is_locked = await pipe.execute()
+
+            if value is not None:
+                return value
+            if not is_locked:
+                break  # the load failed or there was nothing to cache
+
+        return await load()
+
+    async def _refresh(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[bytes | None]],
+        ttl: int,
+        stale_ttl: int,
+    ) -> bytes | None:
+        """Reloads a stale value unless another worker refreshes it already"""
+
+        async def refresh():
+            lock = self.client.lock(f"lock:{key}", timeout=settings.CACHE_LOCK_TIMEOUT)
+            if await lock.acquire(blocking=False):
+                return await self._load_and_set(key, load, ttl, stale_ttl, lock)
+
+        return await single_flight.run(f"refresh:{key}", refresh)
+
+    async def _load_and_set(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[bytes | None]],
+        ttl: int,
+        stale_ttl: int,
+        lock: Lock,
+    ) -> bytes | None:
+        """Loads and caches the value, then releases the acquired lock"""
+
+        try:
+            value = await load()
+            if value is not None:
+                async with self.client.pipeline(transaction=True) as pipe:
+                    pipe.set(key, value, ex=ttl + stale_ttl)
+                    if stale_ttl:
+                        pipe.set(f"fresh:{key}", 1, ex=ttl)
+                    self._publish_invalidation(pipe, key)
+                    await pipe.execute()
+                self._cache_locally(key, value, ttl)
+            return value
+        finally:
+            await self._release(lock)
+
+    async def _release(self, lock: Lock) -> None:
+        """Releases the lock unless it has already expired"""
+
+        try:
+            await lock.release()
+        except LockError:
+            pass
+
+    def _get_ttl(self, redis_data: RedisData) -> int | None:
+        """Returns the TTL of the data in seconds"""
+
+        if isinstance(redis_data.ttl, timedelta):
+            return int(redis_data.ttl.total_seconds())
+
+        return redis_data.ttl
+
+    def _get_bytes_value(self, redis_data: RedisData) -> bytes:
+        """Returns the value of the data as bytes, the way it is read from Redis"""
+
+        if isinstance(redis_data.value, str):
+            return redis_data.value.encode()
+
+        return redis_data.value
+
+    def _get_locally(self, key: str) -> bytes | None:
+        """Returns the value from the local cache if it is enabled, and counts the hit"""
+
+        if self.local_cache is None:
+            return None
+
+        value = self.local_cache.get(key)
+        if value is not None:
+            cache_lookups.inc(key_namespace(key), "local_hit")
+
+        return value
+
+    def _observe_lookup(self, key: str, started_at: float) -> None:
+        """Records the latency of a lookup in the namespace of the key"""
+
+        cache_lookup_duration.observe(
+            time.perf_counter() - started_at, key_namespace(key)
+        )
+
+    def _count_lookup(self, key: str, value: bytes | None) -> None:
+        """Counts a lookup which reached Redis"""
+
+        self.pool.count_lookup(value)
+        cache_lookups.inc(key_namespace(key), "miss" if value is None else "hit")
+
+    def _cache_locally(self, key: str, value: bytes | None, ttl: int | None = None):
+        """Puts the value to the local cache if it is enabled"""
+
+        if self.local_cache is not None and value is not None:
+            self.local_cache.set(key, value, ttl)
+
+    def _publish_invalidation(self, pipe: Pipeline, *keys: str) -> None:
+        """Adds the notification of the other workers of changed keys to the pipeline"""
+
+        if self.local_cache is not None:
+            pipe.publish(
+                settings.CACHE_INVALIDATION_CHANNEL,
+                self.local_cache.invalidation_message(*keys),
+            )
+
     async def clear_data(self) -> None:
         await self.client.flushall()
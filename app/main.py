@@ -1,16 +1,57 @@
+from contextlib import asynccontextmanager
+
 import click
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from starlette.middleware.cors import CORSMiddleware
 
+from app.auth.hashing import password_hasher
+from app.auth.purger import token_purger
 from app.auth.routers import router as auth_routers
 from app.books.models import Base  # -> migrations/env.py
 from app.books.routers import router as books_routers
-from app.commands import createadmin
+from app.books.writer import book_writer
+from app.commands import bumpcache, createadmin, importbooks, purgetokens
 from app.config import app_configs, settings
+from app.database import async_engine, replica_engine
+from app.external.google_books_api.services import create_google_books_client
+from app.external.redis_db.cache import local_cache
+from app.external.redis_db.services import RedisService, create_redis_pool
+from app.metrics import MetricsMiddleware, registry
 from app.users.routers import router as users_routers
 
 
-app = FastAPI(**app_configs)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Creates the shared resources on startup and releases them on shutdown"""
+
+    app.state.redis_pool = create_redis_pool()
+    app.state.google_books_client = create_google_books_client()
+    if settings.LOCAL_CACHE_ENABLED:
+        local_cache.start()
+    book_writer.start(
+        RedisService(
+            app.state.redis_pool, local_cache if settings.LOCAL_CACHE_ENABLED else None
+        )
+    )
+    if settings.TOKEN_PURGE_ENABLED:
+        token_purger.start()
+
+    yield
+
+    await token_purger.stop()
+    await book_writer.stop()
+
+    await local_cache.stop()
+    await password_hasher.shutdown()
+    await app.state.google_books_client.aclose()
+    await app.state.redis_pool.drain(settings.REDIS_DRAIN_TIMEOUT)
+    await async_engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+
+
+app = FastAPI(**app_configs, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,6 +61,8 @@ app.add_middleware(
     allow_methods=("GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"),
     allow_headers=settings.CORS_HEADERS,
 )
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, track_statements=settings.ENVIRONMENT.is_debug)
 
 
 @app.get("/healthcheck", include_in_schema=False)
@@ -29,12 +72,36 @@ async def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/monitoring", include_in_schema=False)
+async def monitoring(request: Request) -> dict:
+    """Usage statistics of the shared connection pools and caches"""
+
+    return {
+        "redis_pool": request.app.state.redis_pool.stats(),
+        "local_cache": local_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "book_writer": book_writer.stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """Metrics of the worker in the Prometheus text format"""
+
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @click.group()
 def cli():
     pass
 
 
 cli.add_command(createadmin)
+cli.add_command(importbooks)
+cli.add_command(bumpcache)
+cli.add_command(purgetokens)
 
 
 app.include_router(auth_routers, prefix="/auth", tags=["Authentication"])
@@ -0,0 +1,354 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# seconds, from a local cache hit to a slow external call
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    """
+    Formats the labels of a sample in the Prometheus text format.
+
+    Args:
+        names (tuple[str, ...]): The label names.
+        values (tuple[str, ...]): The label values.
+
+    Returns:
+        str: The labels in braces, or an empty string without labels.
+    """
+
+    if not names:
+        return ""
+
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+        pairs.append(f'{name}="{value}"')
+
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric:
+    """Base of the metrics, a series of values per combination of label values"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.series: dict[tuple[str, ...], float] = {}
+
+    def samples(self) -> list[str]:
+        """Returns the lines of the current values"""
+
+        return [
+            f"{self.name}{format_labels(self.labels, values)} {value}"
+            for values, value in self.series.items()
+        ]
+
+    def render(self) -> str:
+        """Returns the metric in the Prometheus text format"""
+
+        return "\n".join(
+            [
+                f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.type}",
+                *self.samples(),
+            ]
+        )
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        """
+        Increments the counter.
+
+        Args:
+            *values (str): The label values.
+            amount (float, optional): The increment. Defaults to 1.
+        """
+
+        self.series[values] = self.series.get(values, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, *values: str) -> None:
+        """
+        Sets the current value.
+
+        Args:
+            value (float): The value.
+            *values (str): The label values.
+        """
+
+        self.series[values] = value
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        """
+        Increments the value, or decrements it with a negative amount.
+
+        Args:
+            *values (str): The label values.
+            amount (float, optional): The increment. Defaults to 1.
+        """
+
+        self.series[values] = self.series.get(values, 0) + amount
+
+
+class Histogram(Metric):
+    """
+    Counts the observed values in buckets.
+
+    The counts are kept per bucket and only made cumulative when rendered,
+    so an observation is one bisect and three additions.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.counts: dict[tuple[str, ...], list[int]] = {}
+        self.sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *values: str) -> None:
+        """
+        Records an observed value.
+
+        Args:
+            value (float): The observed value.
+            *values (str): The label values.
+        """
+
+        counts = self.counts.get(values)
+        if counts is None:
+            counts = self.counts[values] = [0] * (len(self.buckets) + 1)
+            self.sums[values] = 0.0
+
+        counts[bisect_left(self.buckets, value)] += 1
+        self.sums[values] += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        bounds = [*map(str, self.buckets), "+Inf"]
+        for values, counts in self.counts.items():
+            labels = format_labels(self.labels, values)
+            total = 0
+            for bound, count in zip(bounds, counts):
+                total += count
+                bucket_labels = format_labels((*self.labels, "le"), (*values, bound))
+                lines.append(f"{self.name}_bucket{bucket_labels} {total}")
+            lines.append(f"{self.name}_sum{labels} {self.sums[values]}")
+            lines.append(f"{self.name}_count{labels} {total}")
+
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics exposed by the worker on /metrics"""
+
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Adds the metric to the registry.
+
+        Args:
+            metric (Metric): The metric.
+
+        Raises:
+            ValueError: If a metric with the same name is already registered.
+
+        Returns:
+            Metric: The registered metric.
+        """
+
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+
+        self.metrics[metric.name] = metric
+
+        return metric
+
+    def render(self) -> str:
+        """Returns all the metrics in the Prometheus text format"""
+
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+class RequestStats:
+    """Work done while handling the current request"""
+
+    __slots__ = ("path", "db_queries", "db_seconds", "statements")
+
+    def __init__(self, path: str, track_statements: bool = False):
+        self.path = path
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        # executions by statement, to detect N+1 queries
+        self.statements: dict[str, int] | None = {} if track_statements else None
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+registry = MetricsRegistry()
+
+http_requests_in_progress = registry.register(
+    Gauge("http_requests_in_progress", "Requests being handled", ("method",))
+)
+http_request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Latency of the requests",
+        ("method", "route", "status"),
+    )
+)
+db_queries_per_request = registry.register(
+    Histogram(
+        "db_queries_per_request",
+        "Database queries made while handling a request",
+        ("route",),
+        buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+    )
+)
+db_time_per_request = registry.register(
+    Histogram(
+        "db_time_per_request_seconds",
+        "Time spent in database queries while handling a request",
+        ("route",),
+    )
+)
+db_query_duration = registry.register(
+    Histogram("db_query_duration_seconds", "Latency of the database queries")
+)
+db_pool_checkout_duration = registry.register(
+    Histogram(
+        "db_pool_checkout_duration_seconds",
+        "Time to get a database connection from the pool, waits included",
+    )
+)
+db_pool_checkout_timeouts = registry.register(
+    Counter(
+        "db_pool_checkout_timeouts_total",
+        "Times no database connection was free within the pool timeout",
+    )
+)
+cache_lookups = registry.register(
+    Counter(
+        "cache_lookups_total",
+        "Lookups of cached values by result: local_hit, hit or miss",
+        ("namespace", "result"),
+    )
+)
+cache_lookup_duration = registry.register(
+    Histogram(
+        "cache_lookup_duration_seconds",
+        "Latency of the lookups reaching Redis",
+        ("namespace",),
+    )
+)
+google_books_requests = registry.register(
+    Counter(
+        "google_books_requests_total",
+        "Requests to the Google Books API by outcome: ok or error",
+        ("outcome",),
+    )
+)
+google_books_request_duration = registry.register(
+    Histogram(
+        "google_books_request_duration_seconds",
+        "Latency of the requests to the Google Books API",
+    )
+)
+password_hash_wait = registry.register(
+    Histogram(
+        "password_hash_wait_seconds",
+        "Time the password hashing calls wait for a free worker thread",
+    )
+)
+book_writer_pending = registry.register(
+    Gauge("book_writer_pending", "Books waiting in memory to be written")
+)
+book_writer_flush_duration = registry.register(
+    Histogram(
+        "book_writer_flush_duration_seconds",
+        "Latency of the writes of the discovered books",
+    )
+)
+book_writer_dropped = registry.register(
+    Counter(
+        "book_writer_dropped_total",
+        "Discovered books not written by reason: full or failed",
+        ("reason",),
+    )
+)
+refresh_tokens_purged = registry.register(
+    Counter(
+        "refresh_tokens_purged_total", "Expired refresh tokens deleted by the worker"
+    )
+)
+
+
+class MetricsMiddleware:
+    """
+    Measures the latency of the requests by route template.
+
+    With `track_statements` the executions of every SQL statement are
+    counted in the request, which costs a dict update per query.
+
+    It is a plain ASGI middleware, so the request body and the response
+    are passed through as they are.
+    """
+
+    def __init__(self, app: ASGIApp, track_statements: bool = False):
+        self.app = app
+        self.track_statements = track_statements
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        method = scope["method"]
+        stats = RequestStats(scope["path"], self.track_statements)
+        token = request_stats.set(stats)
+        http_requests_in_progress.inc(method)
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started_at
+            http_requests_in_progress.inc(method, amount=-1)
+            request_stats.reset(token)
+
+            # unmatched paths are not recorded one by one, they are unbounded
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            http_request_duration.observe(duration, method, path, str(status))
+            db_queries_per_request.observe(stats.db_queries, path)
+            db_time_per_request.observe(stats.db_seconds, path)
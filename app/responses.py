@@ -0,0 +1,98 @@
+import gzip
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from app.config import settings
+
+GZIP_MAGIC = b"\x1f\x8b"  # JSON never starts with these bytes
+
+
+def encode_response_body(content: BaseModel) -> bytes:
+    """
+    Serializes the response content to be cached.
+
+    Large bodies are gzipped, so that less is stored and sent over the network.
+
+    Args:
+        content (BaseModel): The response content.
+
+    Returns:
+        bytes: The JSON body, gzipped if it is large enough.
+    """
+
+    body = content.model_dump_json().encode()
+    if len(body) < settings.CACHE_COMPRESSION_MIN_SIZE:
+        return body
+
+    return gzip.compress(body, compresslevel=settings.CACHE_COMPRESSION_LEVEL, mtime=0)
+
+
+def decompress_response_body(body: bytes) -> bytes:
+    """
+    Returns the JSON of a cached response body.
+
+    Args:
+        body (bytes): The cached body, possibly gzipped.
+
+    Returns:
+        bytes: The JSON body.
+    """
+
+    if body.startswith(GZIP_MAGIC):
+        return gzip.decompress(body)
+
+    return body
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Checks if the Accept-Encoding header of a request accepts gzip.
+
+    Args:
+        accept_encoding (str): The value of the header.
+
+    Returns:
+        bool: True if gzip, or any coding with "*", has a non-zero q-value.
+    """
+
+    qualities = {}
+    for coding in accept_encoding.lower().split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+
+    for name in ("gzip", "x-gzip", "*"):
+        if name in qualities:
+            return qualities[name] > 0
+
+    return False
+
+
+class CachedJSONResponse(Response):
+    """
+    JSON response sent as it is cached, without validating and serializing it again.
+
+    A gzipped body is sent compressed to the clients accepting it.
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, body: bytes, request: Request, status_code: int = 200):
+        headers = {}
+
+        if body.startswith(GZIP_MAGIC):
+            headers["Vary"] = "Accept-Encoding"
+            if accepts_gzip(request.headers.get("Accept-Encoding", "")):
+                headers["Content-Encoding"] = "gzip"
+            else:
+                body = gzip.decompress(body)
+
+        super().__init__(content=body, status_code=status_code, headers=headers)
@@ -0,0 +1,125 @@
+import time
+
+from cachetools import TTLCache
+
+from app.auth.schemas import AuthUser
+from app.config import settings
+from app.external.redis_db.services import RedisService
+
+
+class UserCache:
+    """
+    Short-lived in-process cache of the authenticated users.
+
+    The moments the users were last changed are kept in Redis, shared by all
+    the workers, so that the claims of the access tokens issued before a change
+    and the users cached before it are no longer trusted by any worker.
+    """
+
+    def __init__(self, max_size: int, ttl: int, changes_ttl: int):
+        self.users: TTLCache = TTLCache(maxsize=max_size, ttl=ttl)
+        self.changes_ttl = changes_ttl
+
+    def get(self, user_id: int, changed_at: float | None = None) -> AuthUser | None:
+        """
+        Retrieves a cached user by ID.
+
+        Args:
+            user_id (int): The ID of the user.
+            changed_at (float | None): When the user was last changed,
+                the user cached before it is dropped.
+
+        Returns:
+            AuthUser | None: The cached user, or None if not found or expired.
+        """
+
+        item = self.users.get(user_id)
+        if item is None:
+            return None
+
+        user, loaded_at = item
+        if changed_at is not None and loaded_at <= changed_at:
+            self.users.pop(user_id, None)
+            return None
+
+        return user
+
+    def set(self, user: AuthUser, loaded_at: float) -> None:
+        """
+        Caches the user.
+
+        Args:
+            user (AuthUser): The user to cache.
+            loaded_at (float): When the user was loaded, as a UNIX timestamp.
+        """
+
+        self.users[user.id] = (user, loaded_at)
+
+    async def get_changed_at(self, cache: RedisService, user_id: int) -> float | None:
+        """
+        Retrieves when the user was last changed.
+
+        Args:
+            cache (RedisService): The Redis service.
+            user_id (int): The ID of the user.
+
+        Returns:
+            float | None: The moment as a UNIX timestamp, or None if the user
+                was not changed within the lifetime of the access tokens.
+        """
+
+        changed_at = await cache.client.get(self._changed_key(user_id))
+
+        return None if changed_at is None else float(changed_at)
+
+    async def invalidate(self, cache: RedisService | None, *user_ids: int) -> None:
+        """
+        Removes the users from the cache and marks them as changed for all the workers.
+
+        Args:
+            cache (RedisService | None): The Redis service. Without it,
+                only the users cached by this process are removed.
+            *user_ids (int): The IDs of the changed users.
+        """
+
+        for user_id in user_ids:
+            self.users.pop(user_id, None)
+
+        if cache is None or not user_ids:
+            return
+
+        changed_at = time.time()
+        async with cache.client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.set(self._changed_key(user_id), changed_at, ex=self.changes_ttl)
+            await pipe.execute()
+
+    @staticmethod
+    def is_changed_since(changed_at: float | None, timestamp: int | None) -> bool:
+        """
+        Checks if the user was changed after the given moment.
+
+        Args:
+            changed_at (float | None): When the user was last changed.
+            timestamp (int | None): The moment as a UNIX timestamp.
+                None is considered to be older than any change.
+
+        Returns:
+            bool: True if the user was changed after the given moment.
+        """
+
+        if changed_at is None:
+            return False
+
+        return timestamp is None or timestamp <= changed_at
+
+    @staticmethod
+    def _changed_key(user_id: int) -> str:
+        return f"user:changed:{user_id}"
+
+
+user_cache = UserCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL,
+    changes_ttl=settings.JWT_EXP * 60,
+)
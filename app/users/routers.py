@@ -6,6 +6,8 @@ from app.auth.dependencies import (
     get_user_from_refresh_token,
 )
 from app.database import get_db
+from app.external.redis_db.dependencies import get_redis_service
+from app.external.redis_db.services import RedisService
 from app.users.exceptions import EmailTaken, UsernameTaken
 from app.users.models import UserModel
 from app.users.schemas import (
@@ -55,6 +57,7 @@ async def activate_membership(
     data: ChangeMembershipRequest,
     db: AsyncSession = Depends(get_db),
     user_service: UserService = Depends(UserService),
+    cache: RedisService = Depends(get_redis_service),
     admin: UserModel = Depends(get_admin_from_refresh_token),
 ) -> dict:
     """
@@ -62,7 +65,9 @@ async def activate_membership(
     Activate library membership of a certain user.
     """
 
-    await user_service.activate_membership(db, data.user_id, data.contact_information)
+    await user_service.activate_membership(
+        db, data.user_id, data.contact_information, cache
+    )
 
     return ChangeMembershipResponse(
         user_id=data.user_id, current_membership_status=MembershipStatus.ACTIVE
@@ -74,6 +79,7 @@ async def block_membership(
     data: ChangeMembershipRequest,
     db: AsyncSession = Depends(get_db),
     user_service: UserService = Depends(UserService),
+    cache: RedisService = Depends(get_redis_service),
     admin: UserModel = Depends(get_admin_from_refresh_token),
 ) -> dict:
     """
@@ -81,7 +87,7 @@ async def block_membership(
     Blocks library membership of a certain user.
     """
 
-    await user_service.block_membership(db, data.user_id)
+    await user_service.block_membership(db, data.user_id, cache)
 
     return ChangeMembershipResponse(
         user_id=data.user_id, current_membership_status=MembershipStatus.BLOCKED
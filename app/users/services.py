@@ -1,12 +1,18 @@
 from datetime import datetime
 
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import Integer, any_, bindparam, delete, func, true
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.sql import Delete, Insert
+from sqlalchemy.sql.elements import BindParameter
 
 from app.auth.utils import check_password, hash_password
-from app.books.services import BookService
+from app.books.models import CategoryModel, user_unavailable_book_category
+from app.external.redis_db.services import RedisService
 from app.users import schemas
+from app.users.cache import user_cache
 from app.users.exceptions import (
     ContactInformationNotProvided,
     UserIsNotLibraryMember,
@@ -14,8 +20,6 @@ from app.users.exceptions import (
 )
 from app.users.models import LibraryMemberModel, UserModel
 
-book_service = BookService()
-
 
 class UserService:
 
@@ -38,7 +42,7 @@ class UserService:
         new_user = UserModel(
             username=user.username,
             email=user.email,
-            password=hash_password(user.password),
+            password=await hash_password(user.password),
             created_at=datetime.utcnow(),
             role=user.role,
         )
@@ -120,7 +124,7 @@ class UserService:
 
         user = await self.get_by_username(db, form_data.username)
 
-        if not user or not check_password(form_data.password, user.password):
+        if not user or not await check_password(form_data.password, user.password):
             return None
 
         return user
@@ -130,6 +134,7 @@ class UserService:
         db: AsyncSession,
         user_id: int,
         contact_information: str | None = None,
+        cache: RedisService | None = None,
     ):
         """
         Activate a user's library membership.
@@ -138,6 +143,7 @@ class UserService:
             db: An AsyncSession representing the database session.
             user_id: An integer representing the user's ID.
             contact_information: A string representing the user's contact information, default is None.
+            cache: The Redis service marking the user as changed for all the workers.
         """
 
         user = await self.get_by_id(db, user_id)
@@ -156,18 +162,21 @@ class UserService:
                 membership_status=schemas.MembershipStatus.ACTIVE,
             )
             await db.commit()
+            await user_cache.invalidate(cache, user_id)
             return
 
         if user_membership:
             if user_membership.membership_status == schemas.MembershipStatus.BLOCKED:
                 user.library_member.membership_status = schemas.MembershipStatus.ACTIVE
                 await db.commit()
+                await user_cache.invalidate(cache, user_id)
                 return
 
     async def block_membership(
         self,
         db: AsyncSession,
         user_id: int,
+        cache: RedisService | None = None,
     ):
         """
         Blocks a user's library membership.
@@ -175,6 +184,8 @@ class UserService:
         Args:
             db (AsyncSession): The asynchronous database session.
             user_id (int): The ID of the user whose membership is to be blocked.
+            cache (RedisService | None): The Redis service marking the user
+                as changed for all the workers.
         """
 
         user = await self.get_by_id(db, user_id)
@@ -189,6 +200,7 @@ class UserService:
         if user_membership.membership_status == schemas.MembershipStatus.ACTIVE:
             user.library_member.membership_status = schemas.MembershipStatus.BLOCKED
             await db.commit()
+            await user_cache.invalidate(cache, user_id)
             return
 
     async def add_unavailable_categories(
@@ -196,6 +208,7 @@ class UserService:
         db: AsyncSession,
         user_id: int,
         categories_id: list[int],
+        cache: RedisService | None = None,
     ) -> UserModel:
         """
         Adds unavailable book categories for a user in the database.
@@ -204,6 +217,8 @@ class UserService:
             db (AsyncSession): The async database session.
             user_id (int): The ID of the user.
             categories_id (list[int]): The IDs of the categories to be marked as unavailable for the user.
+            cache (RedisService | None): The Redis service marking the user
+                as changed for all the workers.
 
         Returns:
             UserModel: The updated user object after adding the unavailable categories.
@@ -213,12 +228,11 @@ class UserService:
         if not user:
             raise UserNotFound()
 
-        for category_id in categories_id:
-            category = await book_service.get_category_by_id(db, category_id)
-            if category:
-                user.unavailable_book_categories.append(category)
-
+        await db.execute(
+            self._add_unavailable_categories_query([user_id], categories_id)
+        )
         await db.commit()
+        await user_cache.invalidate(cache, user_id)
         await db.refresh(user)
 
         return user
@@ -228,6 +242,7 @@ class UserService:
         db: AsyncSession,
         user_id: int,
         categories_id: list[int],
+        cache: RedisService | None = None,
     ) -> UserModel:
         """
         Removes unavailable book categories for a user in the database.
@@ -236,6 +251,8 @@ class UserService:
             db (AsyncSession): The async database session.
             user_id (int): The ID of the user.
             categories_id (list[int]): The IDs of the categories to be removed from the unavailable list.
+            cache (RedisService | None): The Redis service marking the user
+                as changed for all the workers.
 
         Returns:
             UserModel: The updated user object after removing the categories.
@@ -245,12 +262,95 @@ class UserService:
         if not user:
             raise UserNotFound()
 
-        for category_id in categories_id:
-            category = await book_service.get_category_by_id(db, category_id)
-            if category and category in user.unavailable_book_categories:
-                user.unavailable_book_categories.remove(category)
-
+        await db.execute(
+            self._remove_unavailable_categories_query([user_id], categories_id)
+        )
         await db.commit()
+        await user_cache.invalidate(cache, user_id)
         await db.refresh(user)
 
         return user
+
+    async def change_users_unavailable_categories(
+        self,
+        db: AsyncSession,
+        users_id: list[int],
+        categories_id: list[int],
+        unavailable: bool,
+        cache: RedisService | None = None,
+    ) -> int:
+        """
+        Adds or removes unavailable book categories for many users in one transaction.
+
+        Args:
+            db (AsyncSession): The async database session.
+            users_id (list[int]): The IDs of the users.
+            categories_id (list[int]): The IDs of the categories.
+            unavailable (bool): Whether the categories are made unavailable
+                or available again.
+            cache (RedisService | None): The Redis service marking the users
+                as changed for all the workers.
+
+        Raises:
+            UserNotFound: If any of the users does not exist.
+
+        Returns:
+            int: The number of the added or removed user categories.
+        """
+
+        users_id = list(dict.fromkeys(users_id))
+        result = await db.execute(
+            select(func.count())
+            .select_from(UserModel)
+            .filter(UserModel.id == any_(self._ids_param("users_id", users_id)))
+        )
+        if result.scalar_one() != len(users_id):
+            raise UserNotFound()
+
+        if unavailable:
+            query = self._add_unavailable_categories_query(users_id, categories_id)
+        else:
+            query = self._remove_unavailable_categories_query(users_id, categories_id)
+
+        result = await db.execute(query)
+        await db.commit()
+        await user_cache.invalidate(cache, *users_id)
+
+        return result.rowcount
+
+    def _add_unavailable_categories_query(
+        self, users_id: list[int], categories_id: list[int]
+    ) -> Insert:
+        """Builds the insert of the existing categories for each of the users"""
+
+        users = self._ids_param("users_id", users_id)
+        categories = self._ids_param("categories_id", categories_id)
+        pairs = (
+            select(UserModel.id, CategoryModel.id)
+            .join(CategoryModel, true())
+            .filter(UserModel.id == any_(users), CategoryModel.id == any_(categories))
+        )
+
+        return (
+            insert(user_unavailable_book_category)
+            .from_select(["user_id", "category_id"], pairs)
+            .on_conflict_do_nothing()
+        )
+
+    def _remove_unavailable_categories_query(
+        self, users_id: list[int], categories_id: list[int]
+    ) -> Delete:
+        """Builds the delete of the categories of the users"""
+
+        users = self._ids_param("users_id", users_id)
+        categories = self._ids_param("categories_id", categories_id)
+        table = user_unavailable_book_category
+
+        return delete(table).filter(
+            table.c.user_id == any_(users), table.c.category_id == any_(categories)
+        )
+
+    def _ids_param(self, name: str, ids: list[int]) -> BindParameter:
+        """Binds the IDs as one array parameter"""
+
+        return bindparam(name, ids, type_=ARRAY(Integer))
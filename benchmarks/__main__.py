@@ -0,0 +1,365 @@
+"""
+Load benchmarks of the books API.
+
+    python -m benchmarks seed
+    python -m benchmarks run --concurrency 32 --duration 30
+    python -m benchmarks compare baseline.json candidate.json
+    python -m benchmarks responses
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import click
+import httpx
+
+from app.books.services import BookService
+from app.database import async_session
+from app.external.redis_db.services import RedisService
+from app.users.schemas import User, UserRole
+from app.users.services import UserService
+from benchmarks import responses
+from benchmarks.catalog import Catalog
+from benchmarks.runner import (
+    BENCHMARK_PASSWORD,
+    Workload,
+    benchmark_username,
+    get_access_tokens,
+    run_scenario,
+)
+
+SCENARIOS = ("by_isbn", "by_category", "search", "login")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option("--books", default=100_000, show_default=True, help="Size of the catalog")
+@click.option("--users", default=20, show_default=True, help="Benchmark users")
+@click.option("--seed", default=1, show_default=True, help="Seed of the catalog")
+@click.option(
+    "--batch-size",
+    default=1000,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of books written in one transaction",
+)
+def seed(books, users, seed, batch_size):
+    """
+    Seed the database with the synthetic catalog and the benchmark users.
+
+    The seeding is idempotent, the existing books and users are kept.
+    """
+
+    async def seed_database():
+        catalog = Catalog(books, seed)
+        book_service, user_service = BookService(), UserService()
+        cache = RedisService()
+
+        created = 0
+        for start in range(0, books, batch_size):
+            async with async_session() as db:
+                created += await book_service.create_books(
+                    db, catalog.books(start, start + batch_size), cache
+                )
+            click.echo(f"Seeded {min(start + batch_size, books)} books, {created} new")
+
+        async with async_session() as db:
+            for index in range(users):
+                username = benchmark_username(index)
+                if await user_service.get_by_username(db, username):
+                    continue
+                user = User(
+                    username=username,
+                    email=f"{username}@example.com",
+                    password=BENCHMARK_PASSWORD,
+                    role=UserRole.USER,
+                )
+                await user_service.create_user(db, user)
+        click.echo(f"Seeded {users} users")
+
+        await cache.disconnect()
+
+    asyncio.run(seed_database())
+
+
+def start_servers(port: int, google_port: int, workers: int, google_latency: float):
+    """Starts the fake Google Books and the API in subprocesses"""
+
+    env = {
+        **os.environ,
+        "GOOGLE_BOOKS_API": f"http://127.0.0.1:{google_port}",
+        "FAKE_GOOGLE_BOOKS_LATENCY": str(google_latency),
+    }
+    uvicorn = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "--host",
+        "127.0.0.1",
+        "--log-level",
+        "warning",
+    ]
+
+    return [
+        subprocess.Popen(
+            [*uvicorn, "--port", str(google_port), "benchmarks.fake_google_books:app"],
+            env=env,
+        ),
+        subprocess.Popen(
+            [*uvicorn, "--port", str(port), "--workers", str(workers), "app.main:app"],
+            env=env,
+        ),
+    ]
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 30.0) -> None:
+    """Waits for the healthcheck of the API to answer"""
+
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            if (await client.get("/healthcheck")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            if time.perf_counter() > deadline:
+                raise
+        await asyncio.sleep(0.2)
+
+
+def get_commit() -> str | None:
+    """Returns the current git commit, marked when the tree has changes"""
+
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+        changes = subprocess.check_output(["git", "status", "--porcelain"], text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return f"{commit}-dirty" if changes.strip() else commit
+
+
+@cli.command()
+@click.option(
+    "--base-url",
+    help="URL of a running API. By default the API and a fake Google Books are started.",
+)
+@click.option(
+    "--scenario",
+    "scenarios",
+    multiple=True,
+    type=click.Choice(SCENARIOS),
+    help="Scenario to run, may be repeated. All by default.",
+)
+@click.option("--concurrency", default=32, show_default=True, type=click.IntRange(min=1))
+@click.option("--duration", default=30.0, show_default=True, help="Seconds per scenario")
+@click.option(
+    "--warmup", default=5.0, show_default=True, help="Unmeasured seconds before"
+)
+@click.option(
+    "--books", default=100_000, show_default=True, help="Size of the seeded catalog"
+)
+@click.option("--users", default=20, show_default=True, help="Seeded benchmark users")
+@click.option(
+    "--seed", default=1, show_default=True, help="Seed of the catalog and requests"
+)
+@click.option(
+    "--miss-ratio",
+    default=0.1,
+    show_default=True,
+    help="Share of the ISBN lookups of books not in the catalog",
+)
+@click.option(
+    "--workers", default=1, show_default=True, help="Workers of the started API"
+)
+@click.option("--port", default=8000, show_default=True, help="Port of the started API")
+@click.option("--google-port", default=8100, show_default=True)
+@click.option(
+    "--google-latency",
+    default=0.05,
+    show_default=True,
+    help="Seconds the fake Google Books takes to answer",
+)
+@click.option(
+    "--output", type=click.Path(dir_okay=False), help="Path of the JSON results"
+)
+def run(
+    base_url,
+    scenarios,
+    concurrency,
+    duration,
+    warmup,
+    books,
+    users,
+    seed,
+    miss_ratio,
+    workers,
+    port,
+    google_port,
+    google_latency,
+    output,
+):
+    """
+    Run the scenarios one after another and save the latency percentiles as JSON.
+
+    The database must be seeded with the same --books, --users and --seed.
+    """
+
+    scenarios = scenarios or SCENARIOS
+    workload = Workload(Catalog(books, seed), users, miss_ratio)
+    make_requests = workload.scenarios()
+
+    servers = []
+    if not base_url:
+        servers = start_servers(port, google_port, workers, google_latency)
+        base_url = f"http://127.0.0.1:{port}"
+
+    async def run_scenarios() -> dict:
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(
+            base_url=base_url, limits=limits, timeout=60
+        ) as client:
+            await wait_until_up(client)
+            access_tokens = await get_access_tokens(client, users)
+
+            summaries = {}
+            for name in scenarios:
+                click.echo(f"Running {name}...")
+                if warmup:
+                    await run_scenario(
+                        client,
+                        make_requests[name],
+                        access_tokens,
+                        concurrency,
+                        warmup,
+                        seed,
+                    )
+                result = await run_scenario(
+                    client,
+                    make_requests[name],
+                    access_tokens,
+                    concurrency,
+                    duration,
+                    seed,
+                )
+                summaries[name] = result.summary()
+
+                latency = summaries[name]["latency_ms"]
+                click.echo(
+                    f"  {summaries[name]['throughput']:.1f} req/s, "
+                    f"p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+                    f"p99 {latency['p99']:.1f} ms, {summaries[name]['errors']} errors"
+                )
+
+            return summaries
+
+    try:
+        summaries = asyncio.run(run_scenarios())
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    commit = get_commit()
+    results = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "concurrency": concurrency,
+            "duration": duration,
+            "warmup": warmup,
+            "books": books,
+            "users": users,
+            "seed": seed,
+            "miss_ratio": miss_ratio,
+            "workers": workers if servers else None,
+            "google_latency": google_latency if servers else None,
+        },
+        "scenarios": summaries,
+    }
+
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = f"{datetime.now():%Y%m%d_%H%M%S}_{(commit or 'unknown')[:8]}.json"
+        output = os.path.join(RESULTS_DIR, name)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    click.echo(f"Results saved to {output}")
+
+
+@cli.command()
+@click.argument("baseline", type=click.Path(exists=True, dir_okay=False))
+@click.argument("candidate", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--threshold",
+    default=0.1,
+    show_default=True,
+    help="Allowed relative growth of p95 and drop of the throughput",
+)
+def compare(baseline, candidate, threshold):
+    """
+    Compare two results, failing if the candidate regressed beyond the threshold.
+    """
+
+    with open(baseline) as file:
+        baseline_results = json.load(file)
+    with open(candidate) as file:
+        candidate_results = json.load(file)
+
+    def change(old: float, new: float) -> float:
+        return (new - old) / old if old else 0.0
+
+    regressions = []
+    for name, new in candidate_results["scenarios"].items():
+        old = baseline_results["scenarios"].get(name)
+        if old is None:
+            continue
+
+        click.echo(name)
+        for metric in ("p50", "p95", "p99"):
+            old_value, new_value = old["latency_ms"][metric], new["latency_ms"][metric]
+            click.echo(
+                f"  {metric:<10} {old_value:9.1f} ms -> {new_value:9.1f} ms "
+                f"({change(old_value, new_value):+.1%})"
+            )
+        click.echo(
+            f"  {'throughput':<10} {old['throughput']:9.1f}    -> "
+            f"{new['throughput']:9.1f}    ({change(old['throughput'], new['throughput']):+.1%})"
+        )
+
+        if change(old["latency_ms"]["p95"], new["latency_ms"]["p95"]) > threshold:
+            regressions.append(f"{name} p95")
+        if change(old["throughput"], new["throughput"]) < -threshold:
+            regressions.append(f"{name} throughput")
+
+    if regressions:
+        raise click.ClickException(f"Regressions: {', '.join(regressions)}")
+
+
+@cli.command("responses")
+@click.option("--books", default=500, show_default=True, help="Books on the page")
+@click.option("--rounds", default=5, show_default=True, type=click.IntRange(min=1))
+@click.option("--requests", default=100, show_default=True, type=click.IntRange(min=1))
+def measure_responses(books, rounds, requests):
+    """
+    Measure the CPU time of answering a cached page with CachedJSONResponse.
+
+    Compared to parsing the page and serializing it again through response_model.
+    """
+
+    for name, milliseconds in responses.measure(books, rounds, requests).items():
+        click.echo(f"{name:<25} {milliseconds:6.1f} ms median")
+
+
+if __name__ == "__main__":
+    cli()
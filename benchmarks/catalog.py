@@ -0,0 +1,164 @@
+import random
+from bisect import bisect_left
+from itertools import accumulate
+
+from app.books.schemas import Author, Book, Category
+
+GENRES = (
+    "fiction",
+    "mystery",
+    "romance",
+    "fantasy",
+    "science fiction",
+    "history",
+    "biography",
+    "poetry",
+    "philosophy",
+    "psychology",
+    "economics",
+    "computers",
+    "mathematics",
+    "physics",
+    "biology",
+    "medicine",
+    "cooking",
+    "travel",
+    "art",
+    "music",
+    "religion",
+    "education",
+    "law",
+    "politics",
+    "sports",
+    "nature",
+    "children",
+    "comics",
+    "drama",
+    "humor",
+)
+TOPICS = ("", "general", "modern", "classic", "juvenile", "reference", "essays")
+
+TITLE_WORDS = (
+    "the lost city shadow river night garden winter empire secret house light "
+    "stone world journey silent dream letters storm island war road king heart "
+    "fire memory ocean machine mind code history ghost forest queen star summer "
+    "glass song return last first iron north hidden golden broken wild empty"
+).split()
+FIRST_NAMES = (
+    "anna james maria john elena david sofia peter olga thomas clara ivan lucy "
+    "mark irina paul nina george emma victor"
+).split()
+LAST_NAMES = (
+    "smith ivanova brown garcia petrov miller novak wilson kowalski martin "
+    "rossi schmidt dubois tanaka silva jensen murphy cohen larsen moreau"
+).split()
+LANGUAGES = ("en", "en", "en", "en", "ru", "de", "fr", "es")
+
+
+def zipf_weights(size: int, exponent: float = 1.1) -> list[float]:
+    """
+    Returns the cumulative weights of a Zipf distribution over `size` items.
+
+    A few items are very popular and most are rarely picked, as the
+    categories, authors and lookups of a real catalog.
+
+    Args:
+        size (int): The number of items.
+        exponent (float, optional): The skew of the distribution. Defaults to 1.1.
+
+    Returns:
+        list[float]: The cumulative weights, for `pick`.
+    """
+
+    return list(accumulate(1 / rank**exponent for rank in range(1, size + 1)))
+
+
+def pick(rng: random.Random, cum_weights: list[float]) -> int:
+    """Returns the index of an item picked with the cumulative weights"""
+
+    return bisect_left(cum_weights, rng.random() * cum_weights[-1])
+
+
+def catalog_isbn(index: int) -> str:
+    """Returns the ISBN of the seeded book with the index"""
+
+    return f"1{index:09d}"
+
+
+def unknown_isbn(index: int) -> str:
+    """Returns an ISBN which is not seeded, found only in the fake Google Books"""
+
+    return f"9{index:09d}"
+
+
+class Catalog:
+    """
+    Synthetic catalog of the benchmarks.
+
+    The same size and seed always give the same books, so the seeded
+    database and the load runner agree on the ISBNs and categories.
+    """
+
+    def __init__(self, size: int, seed: int = 1):
+        self.size = size
+        self.seed = seed
+        self.categories = [
+            f"{genre} {topic}".strip() for topic in TOPICS for genre in GENRES
+        ]
+        self.authors = [self.author_name(index) for index in range(max(size // 5, 1))]
+        self.category_weights = zipf_weights(len(self.categories))
+        # flatter than the categories, the most prolific authors have hundreds of books
+        self.author_weights = zipf_weights(len(self.authors), exponent=0.6)
+        self.word_weights = zipf_weights(len(TITLE_WORDS), exponent=0.8)
+
+    @staticmethod
+    def author_name(index: int) -> str:
+        """Returns a unique author name, "Anna B. C. Smith" """
+
+        index, first = divmod(index, len(FIRST_NAMES))
+        index, last = divmod(index, len(LAST_NAMES))
+        index, initial = divmod(index, 26)
+        middle = f"{chr(65 + index % 26)}. {chr(65 + initial)}."
+
+        return f"{FIRST_NAMES[first]} {middle} {LAST_NAMES[last]}".title()
+
+    def book(self, isbn: str, index: int) -> Book:
+        """
+        Returns the book with the index.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            index (int): The index of the book, seeds its data.
+
+        Returns:
+            Book: The book.
+        """
+
+        rng = random.Random(f"{self.seed}:{index}")
+        words = [
+            TITLE_WORDS[pick(rng, self.word_weights)] for _ in range(rng.randint(2, 5))
+        ]
+        categories = {
+            self.categories[pick(rng, self.category_weights)]
+            for _ in range(rng.randint(1, 3))
+        }
+        authors = {
+            self.authors[pick(rng, self.author_weights)]
+            for _ in range(rng.choice((1, 1, 1, 2)))
+        }
+
+        return Book(
+            isbn=isbn,
+            title=" ".join(words).capitalize(),
+            language=rng.choice(LANGUAGES),
+            publication_date=str(rng.randint(1950, 2024)),
+            authors=[Author(name=name) for name in sorted(authors)],
+            categories=[Category(name=name) for name in sorted(categories)],
+        )
+
+    def books(self, start: int = 0, stop: int | None = None) -> list[Book]:
+        """Returns the seeded books with the indexes in the range"""
+
+        stop = self.size if stop is None else min(stop, self.size)
+
+        return [self.book(catalog_isbn(index), index) for index in range(start, stop)]
@@ -0,0 +1,53 @@
+"""
+Local stand-in of the Google Books API for the benchmarks.
+
+    uvicorn benchmarks.fake_google_books:app --port 8100
+
+Every ISBN lookup answers after FAKE_GOOGLE_BOOKS_LATENCY seconds with
+a synthetic book, except the ISBNs ending with 0, which are not found.
+"""
+
+import asyncio
+import os
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from benchmarks.catalog import Catalog
+
+LATENCY = float(os.environ.get("FAKE_GOOGLE_BOOKS_LATENCY", "0.05"))
+
+catalog = Catalog(size=1000, seed=int(os.environ.get("BENCHMARK_SEED", "1")))
+
+
+async def volumes(request: Request) -> JSONResponse:
+    """Answers the `isbn:<isbn>` queries as the Google Books volumes search"""
+
+    await asyncio.sleep(LATENCY)
+
+    isbn = request.query_params.get("q", "").removeprefix("isbn:")
+    if not isbn.isdigit() or isbn.endswith("0"):
+        return JSONResponse({"kind": "books#volumes", "totalItems": 0})
+
+    book = catalog.book(isbn, int(isbn))
+    volume_info = {
+        "title": book.title,
+        "authors": [author.name for author in book.authors],
+        "publishedDate": book.publication_date,
+        "language": book.language,
+        "categories": [category.name for category in book.categories],
+        "industryIdentifiers": [{"type": "ISBN_10", "identifier": isbn}],
+    }
+
+    return JSONResponse(
+        {
+            "kind": "books#volumes",
+            "totalItems": 1,
+            "items": [{"kind": "books#volume", "volumeInfo": volume_info}],
+        }
+    )
+
+
+app = Starlette(routes=[Route("/volumes", volumes)])
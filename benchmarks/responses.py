@@ -0,0 +1,76 @@
+"""
+CPU time of answering from the cache, with and without CachedJSONResponse.
+
+Both routes answer the same cached page of books. The "validated" route
+parses it back into the models and lets FastAPI validate and serialize
+them again through response_model, as before CachedJSONResponse.
+No database or Redis is involved.
+"""
+
+import statistics
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.books.schemas import Books
+from app.responses import CachedJSONResponse, encode_response_body
+from benchmarks.catalog import Catalog
+
+
+def make_app(books: int) -> FastAPI:
+    """Returns an app answering the cached page of `books` books"""
+
+    page = Books(books=Catalog(books).books())
+    cached_json = page.model_dump_json().encode()
+    cached_body = encode_response_body(page)
+
+    app = FastAPI()
+
+    @app.get("/validated", response_model=Books)
+    async def validated() -> Books:
+        return Books.model_validate_json(cached_json)
+
+    @app.get("/cached", response_model=Books)
+    async def cached(request: Request) -> CachedJSONResponse:
+        return CachedJSONResponse(cached_body, request)
+
+    return app
+
+
+def measure(books: int, rounds: int, requests: int) -> dict[str, float]:
+    """
+    Measures the median process CPU time of a request of each route.
+
+    The TestClient overhead is included in every number.
+
+    Args:
+        books (int): The number of books on the page.
+        rounds (int): The number of measured rounds, the median is taken.
+        requests (int): The number of requests of a round.
+
+    Returns:
+        dict[str, float]: The milliseconds per request by route and client.
+    """
+
+    client = TestClient(make_app(books))
+    cases = {
+        "validated": ("/validated", "gzip"),
+        "cached, gzip client": ("/cached", "gzip"),
+        "cached, identity client": ("/cached", "identity"),
+    }
+
+    results = {}
+    for name, (url, accept_encoding) in cases.items():
+        headers = {"Accept-Encoding": accept_encoding}
+        client.get(url, headers=headers).raise_for_status()  # warm up
+
+        timings = []
+        for _ in range(rounds):
+            started_at = time.process_time()
+            for _ in range(requests):
+                client.get(url, headers=headers)
+            timings.append((time.process_time() - started_at) / requests * 1000)
+        results[name] = statistics.median(timings)
+
+    return results
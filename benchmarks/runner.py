@@ -0,0 +1,219 @@
+import asyncio
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable
+
+import httpx
+
+from app.config import settings
+from benchmarks.catalog import TITLE_WORDS, Catalog, catalog_isbn, pick, unknown_isbn
+
+BENCHMARK_PASSWORD = "Benchmark!42"
+
+
+def benchmark_username(index: int) -> str:
+    return f"benchmark{index}"
+
+
+@dataclass
+class Request:
+    method: str
+    url: str
+    kwargs: dict = field(default_factory=dict)
+    authorized: bool = True  # sent with the access token of a benchmark user
+
+
+@dataclass
+class ScenarioResult:
+    latencies: list[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    errors: int = 0  # failed requests and unexpected statuses
+    seconds: float = 0.0
+
+    def summary(self) -> dict:
+        """Returns the latency percentiles in milliseconds and the throughput"""
+
+        latencies = sorted(self.latencies)
+
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "statuses": {str(status): count for status, count in self.statuses.items()},
+            "throughput": len(latencies) / self.seconds if self.seconds else 0.0,
+            "latency_ms": {
+                "mean": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+                "p50": percentile(latencies, 50) * 1000,
+                "p95": percentile(latencies, 95) * 1000,
+                "p99": percentile(latencies, 99) * 1000,
+                "max": latencies[-1] * 1000 if latencies else 0.0,
+            },
+        }
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """
+    Returns the nearest-rank percentile of the sorted values.
+
+    Args:
+        values (list[float]): The sorted values.
+        percent (float): The percentile, from 0 to 100.
+
+    Returns:
+        float: The value, 0 without values.
+    """
+
+    if not values:
+        return 0.0
+
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+class Workload:
+    """
+    The requests of the scenarios, picked with the popularity of a real catalog.
+
+    Args:
+        catalog (Catalog): The seeded catalog.
+        users (int): The number of seeded benchmark users.
+        miss_ratio (float): The share of ISBN lookups of books not in the catalog,
+            which are fetched from the fake Google Books.
+    """
+
+    def __init__(self, catalog: Catalog, users: int, miss_ratio: float):
+        self.catalog = catalog
+        self.users = users
+        self.miss_ratio = miss_ratio
+
+    def by_isbn(self, rng: random.Random) -> Request:
+        if rng.random() < self.miss_ratio:
+            isbn = unknown_isbn(rng.randrange(10**9))
+        else:
+            # the lookups of the first ISBNs are the most frequent
+            isbn = catalog_isbn(int(rng.paretovariate(1.2) - 1) % self.catalog.size)
+
+        return Request("GET", f"/books/by-isbn/{isbn}")
+
+    def by_category(self, rng: random.Random) -> Request:
+        category = self.catalog.categories[pick(rng, self.catalog.category_weights)]
+
+        return Request(
+            "GET", f"/books/by-category/{category}", {"params": {"limit": 20}}
+        )
+
+    def search(self, rng: random.Random) -> Request:
+        word = TITLE_WORDS[pick(rng, self.catalog.word_weights)]
+
+        return Request("POST", "/books/search", {"json": {"query": word}})
+
+    def login(self, rng: random.Random) -> Request:
+        form = {
+            "username": benchmark_username(rng.randrange(self.users)),
+            "password": BENCHMARK_PASSWORD,
+        }
+
+        return Request("POST", "/auth/login", {"data": form}, authorized=False)
+
+    def scenarios(self) -> dict[str, Callable[[random.Random], Request]]:
+        return {
+            "by_isbn": self.by_isbn,
+            "by_category": self.by_category,
+            "search": self.search,
+            "login": self.login,
+        }
+
+
+# the statuses of the correct responses, a missing book is not an error
+EXPECTED_STATUSES = {200, 404}
+
+
+async def get_access_tokens(client: httpx.AsyncClient, users: int) -> list[str]:
+    """
+    Logs in the benchmark users and returns their access tokens.
+
+    Args:
+        client (httpx.AsyncClient): The client of the API.
+        users (int): The number of benchmark users.
+
+    Returns:
+        list[str]: The access tokens.
+    """
+
+    tokens = []
+    for index in range(users):
+        response = await client.post(
+            "/auth/login",
+            data={"username": benchmark_username(index), "password": BENCHMARK_PASSWORD},
+        )
+        response.raise_for_status()
+        # sent explicitly, the cookie is bound to the configured site domain
+        refresh_token = next(
+            cookie.split(";")[0]
+            for cookie in response.headers.get_list("set-cookie")
+            if cookie.startswith(f"{settings.REFRESH_TOKEN_KEY}=")
+        )
+        response = await client.post("/auth/token", headers={"Cookie": refresh_token})
+        response.raise_for_status()
+        tokens.append(response.json()["access_token"])
+
+    return tokens
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    make_request: Callable[[random.Random], Request],
+    access_tokens: list[str],
+    concurrency: int,
+    duration: float,
+    seed: int,
+) -> ScenarioResult:
+    """
+    Sends the requests of the scenario from `concurrency` clients for `duration` seconds.
+
+    Every client sends its next request as soon as the previous one is answered.
+
+    Args:
+        client (httpx.AsyncClient): The client of the API.
+        make_request (Callable): Makes the next request of the scenario.
+        access_tokens (list[str]): The access tokens of the benchmark users.
+        concurrency (int): The number of concurrent clients.
+        duration (float): The seconds of the run.
+        seed (int): The seed of the picked requests.
+
+    Returns:
+        ScenarioResult: The latencies and statuses of the responses.
+    """
+
+    result = ScenarioResult()
+    deadline = time.perf_counter() + duration
+
+    async def send_requests(rng: random.Random):
+        headers = {"Authorization": f"Bearer {rng.choice(access_tokens)}"}
+        while time.perf_counter() < deadline:
+            request = make_request(rng)
+            kwargs = request.kwargs
+            if request.authorized:
+                kwargs = {**kwargs, "headers": headers}
+
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(request.method, request.url, **kwargs)
+            except httpx.HTTPError:
+                result.errors += 1
+                result.statuses["failed"] += 1
+                continue
+            result.latencies.append(time.perf_counter() - started_at)
+
+            result.statuses[response.status_code] += 1
+            if response.status_code not in EXPECTED_STATUSES:
+                result.errors += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(
+        *[send_requests(random.Random(seed * 1000 + i)) for i in range(concurrency)]
+    )
+    result.seconds = time.perf_counter() - started_at
+
+    return result
@@ -0,0 +1,156 @@
+"""book search vector
+
+Revision ID: 55ece917c8d1
+Revises: 81f7678b7bd3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '55ece917c8d1'
+down_revision: Union[str, None] = '81f7678b7bd3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.add_column('book', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Weighted vector of the title (A), author names (B) and categories (C)
+    op.execute("""
+        CREATE FUNCTION book_search_vector_refresh(book_ids integer[]) RETURNS void AS $$
+            UPDATE book SET search_vector =
+                setweight(to_tsvector('simple', coalesce(book.title, '')), 'A')
+                || setweight(to_tsvector('simple', coalesce((
+                    SELECT string_agg(author.name, ' ')
+                    FROM book_author JOIN author ON author.id = book_author.author_id
+                    WHERE book_author.book_id = book.id
+                ), '')), 'B')
+                || setweight(to_tsvector('simple', coalesce((
+                    SELECT string_agg(category.name, ' ')
+                    FROM book_category JOIN category ON category.id = book_category.category_id
+                    WHERE book_category.book_id = book.id
+                ), '')), 'C')
+            WHERE book.id = ANY(book_ids)
+        $$ LANGUAGE sql
+    """)
+
+    # Statement level triggers refresh all the books touched by a bulk insert at once
+    op.execute("""
+        CREATE FUNCTION book_search_vector_on_book_insert() RETURNS trigger AS $$
+        BEGIN
+            PERFORM book_search_vector_refresh(ARRAY(SELECT id FROM new_rows));
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION book_search_vector_on_book_update() RETURNS trigger AS $$
+        BEGIN
+            PERFORM book_search_vector_refresh(ARRAY[NEW.id]);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION book_search_vector_on_link_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM book_search_vector_refresh(
+                    ARRAY(SELECT DISTINCT book_id FROM new_rows)
+                );
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM book_search_vector_refresh(
+                    ARRAY(SELECT DISTINCT book_id FROM old_rows)
+                );
+            ELSE
+                PERFORM book_search_vector_refresh(
+                    ARRAY(SELECT book_id FROM new_rows UNION SELECT book_id FROM old_rows)
+                );
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION book_search_vector_on_name_update() RETURNS trigger AS $$
+        BEGIN
+            IF TG_TABLE_NAME = 'author' THEN
+                PERFORM book_search_vector_refresh(
+                    ARRAY(SELECT book_id FROM book_author WHERE author_id = NEW.id)
+                );
+            ELSE
+                PERFORM book_search_vector_refresh(
+                    ARRAY(SELECT book_id FROM book_category WHERE category_id = NEW.id)
+                );
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+
+    op.execute("""
+        CREATE TRIGGER book_search_vector_insert AFTER INSERT ON book
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION book_search_vector_on_book_insert()
+    """)
+    op.execute("""
+        CREATE TRIGGER book_search_vector_update AFTER UPDATE OF title ON book
+        FOR EACH ROW WHEN (OLD.title IS DISTINCT FROM NEW.title)
+        EXECUTE FUNCTION book_search_vector_on_book_update()
+    """)
+    for table in ('book_author', 'book_category'):
+        op.execute(f"""
+            CREATE TRIGGER {table}_search_vector_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION book_search_vector_on_link_change()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_search_vector_update AFTER UPDATE ON {table}
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION book_search_vector_on_link_change()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_search_vector_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION book_search_vector_on_link_change()
+        """)
+    for table in ('author', 'category'):
+        op.execute(f"""
+            CREATE TRIGGER {table}_search_vector_update AFTER UPDATE OF name ON {table}
+            FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+            EXECUTE FUNCTION book_search_vector_on_name_update()
+        """)
+
+    op.execute("SELECT book_search_vector_refresh(ARRAY(SELECT id FROM book))")
+
+    op.create_index('book_search_vector_idx', 'book', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('book_title_trgm_idx', 'book', ['title'], unique=False, postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('book_title_trgm_idx', table_name='book', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+    op.drop_index('book_search_vector_idx', table_name='book', postgresql_using='gin')
+
+    for table in ('author', 'category'):
+        op.execute(f"DROP TRIGGER {table}_search_vector_update ON {table}")
+    for table in ('book_author', 'book_category'):
+        for event in ('insert', 'update', 'delete'):
+            op.execute(f"DROP TRIGGER {table}_search_vector_{event} ON {table}")
+    op.execute("DROP TRIGGER book_search_vector_update ON book")
+    op.execute("DROP TRIGGER book_search_vector_insert ON book")
+
+    op.execute("DROP FUNCTION book_search_vector_on_name_update()")
+    op.execute("DROP FUNCTION book_search_vector_on_link_change()")
+    op.execute("DROP FUNCTION book_search_vector_on_book_update()")
+    op.execute("DROP FUNCTION book_search_vector_on_book_insert()")
+    op.execute("DROP FUNCTION book_search_vector_refresh(integer[])")
+
+    op.drop_column('book', 'search_vector')
@@ -0,0 +1,64 @@
+"""unique author and category names
+
+Revision ID: 2ffa2521af8f
+Revises: 55ece917c8d1
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '2ffa2521af8f'
+down_revision: Union[str, None] = '55ece917c8d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table with duplicated names -> links to it (link table, column, owner column)
+NAMED_TABLES = {
+    'author': [('book_author', 'author_id', 'book_id')],
+    'category': [
+        ('book_category', 'category_id', 'book_id'),
+        ('user_unavailable_book_category', 'category_id', 'user_id'),
+    ],
+}
+
+
+def upgrade() -> None:
+    for table, links in NAMED_TABLES.items():
+        # point the links of every duplicate to the oldest row with the same name
+        for link_table, column, owner_column in links:
+            op.execute(f"""
+                WITH duplicate AS (
+                    SELECT id, min(id) OVER (PARTITION BY name) AS original_id
+                    FROM {table}
+                    WHERE name IS NOT NULL
+                )
+                UPDATE {link_table} SET {column} = duplicate.original_id
+                FROM duplicate
+                WHERE {link_table}.{column} = duplicate.id
+                    AND duplicate.id <> duplicate.original_id
+            """)
+            # the same owner may have been linked to several duplicates
+            op.execute(f"""
+                DELETE FROM {link_table} a USING {link_table} b
+                WHERE a.ctid > b.ctid
+                    AND a.{column} = b.{column}
+                    AND a.{owner_column} = b.{owner_column}
+            """)
+
+        op.execute(f"""
+            DELETE FROM {table}
+            WHERE name IS NOT NULL
+                AND id NOT IN (SELECT min(id) FROM {table} GROUP BY name)
+        """)
+
+        op.drop_index(op.f(f'{table}_name_idx'), table_name=table)
+        op.create_index(op.f(f'{table}_name_idx'), table, ['name'], unique=True)
+
+
+def downgrade() -> None:
+    for table in NAMED_TABLES:
+        op.drop_index(op.f(f'{table}_name_idx'), table_name=table)
+        op.create_index(op.f(f'{table}_name_idx'), table, ['name'], unique=False)
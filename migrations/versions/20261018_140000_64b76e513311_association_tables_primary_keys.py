@@ -0,0 +1,49 @@
+"""association tables primary keys
+
+Revision ID: 64b76e513311
+Revises: 2ffa2521af8f
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '64b76e513311'
+down_revision: Union[str, None] = '2ffa2521af8f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# association table -> (owner column, linked column)
+ASSOCIATION_TABLES = {
+    'book_author': ('book_id', 'author_id'),
+    'book_category': ('book_id', 'category_id'),
+    'user_unavailable_book_category': ('user_id', 'category_id'),
+}
+
+
+def upgrade() -> None:
+    for table, (owner_column, column) in ASSOCIATION_TABLES.items():
+        # links without one of the sides point nowhere
+        op.execute(f"""
+            DELETE FROM {table}
+            WHERE {owner_column} IS NULL OR {column} IS NULL
+        """)
+        op.execute(f"""
+            DELETE FROM {table} a USING {table} b
+            WHERE a.ctid > b.ctid
+                AND a.{owner_column} = b.{owner_column}
+                AND a.{column} = b.{column}
+        """)
+
+        op.create_primary_key(op.f(f'{table}_pkey'), table, [owner_column, column])
+        op.create_index(op.f(f'{table}_{column}_idx'), table, [column])
+
+
+def downgrade() -> None:
+    for table, (owner_column, column) in ASSOCIATION_TABLES.items():
+        op.drop_index(op.f(f'{table}_{column}_idx'), table_name=table)
+        op.drop_constraint(op.f(f'{table}_pkey'), table, type_='primary')
+        op.alter_column(table, owner_column, nullable=True)
+        op.alter_column(table, column, nullable=True)
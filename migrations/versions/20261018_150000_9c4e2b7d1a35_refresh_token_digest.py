@@ -0,0 +1,43 @@
+"""refresh token digest
+
+Revision ID: 9c4e2b7d1a35
+Revises: 64b76e513311
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e2b7d1a35'
+down_revision: Union[str, None] = '64b76e513311'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('refresh_token', sa.Column('token_digest', sa.String(64), nullable=True))
+    # the issued tokens stay valid: their values are replaced by the digests
+    op.execute("""
+        UPDATE refresh_token
+        SET token_digest = encode(sha256(convert_to(refresh_token, 'UTF8')), 'hex')
+        WHERE refresh_token IS NOT NULL
+    """)
+    op.execute("""
+        DELETE FROM refresh_token a USING refresh_token b
+        WHERE a.token_digest = b.token_digest AND a.ctid > b.ctid
+    """)
+    op.create_index(
+        op.f('refresh_token_token_digest_idx'), 'refresh_token', ['token_digest'], unique=True
+    )
+    op.drop_column('refresh_token', 'refresh_token')
+
+
+def downgrade() -> None:
+    # the token values cannot be recovered from the digests, the users log in again
+    op.add_column('refresh_token', sa.Column('refresh_token', sa.String(), nullable=True))
+    op.drop_index(op.f('refresh_token_token_digest_idx'), table_name='refresh_token')
+    op.drop_column('refresh_token', 'token_digest')
+    op.execute("DELETE FROM refresh_token")
@@ -0,0 +1,33 @@
+"""refresh token expiry indexes
+
+Revision ID: e3a7f0c2b914
+Revises: 9c4e2b7d1a35
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7f0c2b914'
+down_revision: Union[str, None] = '9c4e2b7d1a35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        op.f('refresh_token_expires_at_idx'), 'refresh_token', ['expires_at'], unique=False
+    )
+    op.create_index(
+        'refresh_token_user_id_expires_at_idx',
+        'refresh_token',
+        ['user_id', 'expires_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('refresh_token_user_id_expires_at_idx', table_name='refresh_token')
+    op.drop_index(op.f('refresh_token_expires_at_idx'), table_name='refresh_token')
@@ -0,0 +1,38 @@
+"""unique book isbn
+
+Revision ID: b5d2e8a4c017
+Revises: e3a7f0c2b914
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d2e8a4c017'
+down_revision: Union[str, None] = 'e3a7f0c2b914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DUPLICATE_BOOKS = """
+    SELECT id FROM book
+    WHERE isbn IS NOT NULL
+        AND id NOT IN (SELECT min(id) FROM book GROUP BY isbn)
+"""
+
+
+def upgrade() -> None:
+    # the duplicates were saved by concurrent lookups of the same ISBN,
+    # the oldest book is kept with its authors and categories
+    for link_table in ('book_author', 'book_category'):
+        op.execute(f'DELETE FROM {link_table} WHERE book_id IN ({DUPLICATE_BOOKS})')
+    op.execute(f'DELETE FROM book WHERE id IN ({DUPLICATE_BOOKS})')
+
+    op.drop_index(op.f('book_isbn_idx'), table_name='book')
+    op.create_index(op.f('book_isbn_idx'), 'book', ['isbn'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('book_isbn_idx'), table_name='book')
+    op.create_index(op.f('book_isbn_idx'), 'book', ['isbn'], unique=False)
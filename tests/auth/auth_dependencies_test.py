@@ -0,0 +1,80 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.auth.dependencies import get_user_from_access_token
+from app.auth.utils import generate_access_token, get_auth_user
+from app.external.redis_db.services import RedisService
+from app.users.cache import UserCache, user_cache
+from app.users.schemas import MembershipStatus, UserRole
+
+
+@pytest.fixture
+async def cache():
+    cache = RedisService()
+    yield cache
+    user_cache.users.clear()
+    await cache.client.delete(user_cache._changed_key(1))
+    await cache.disconnect()
+
+
+@pytest.fixture
+def user():
+    return SimpleNamespace(
+        id=1,
+        role=UserRole.USER,
+        library_member=SimpleNamespace(membership_status=MembershipStatus.ACTIVE),
+        unavailable_book_categories=[SimpleNamespace(id=3), SimpleNamespace(id=5)],
+    )
+
+
+class TestGetUserFromAccessToken:
+
+    async def test_claims_without_database(self, user, cache, mocker):
+        user_service = mocker.AsyncMock()
+        access_token = generate_access_token(user)
+
+        auth_user = await get_user_from_access_token(
+            db=None, access_token=access_token, user_service=user_service, cache=cache
+        )
+
+        user_service.get_by_id.assert_not_called()
+        assert auth_user.id == user.id
+        assert auth_user.role == UserRole.USER
+        assert auth_user.membership_status == MembershipStatus.ACTIVE
+        assert auth_user.unavailable_categories == [3, 5]
+
+    async def test_changed_user_is_loaded(self, user, cache, mocker):
+        user_service = mocker.AsyncMock()
+        access_token = generate_access_token(user)
+
+        user.unavailable_book_categories = []
+        user_service.get_by_id.return_value = user
+        await user_cache.invalidate(cache, user.id)
+
+        auth_user = await get_user_from_access_token(
+            db=None, access_token=access_token, user_service=user_service, cache=cache
+        )
+
+        user_service.get_by_id.assert_called_once()
+        assert auth_user.unavailable_categories == []
+
+    async def test_change_by_another_worker(self, user, cache, mocker):
+        mocker.patch("app.auth.dependencies.settings.READ_YOUR_WRITES_WINDOW", 0)
+        user_service = mocker.AsyncMock()
+        user.role = UserRole.ADMIN
+        access_token = generate_access_token(user)
+        user_cache.set(get_auth_user(user), loaded_at=time.time() - 1)
+
+        user.role = UserRole.USER
+        user_service.get_by_id.return_value = user
+        another_worker = UserCache(max_size=10, ttl=30, changes_ttl=60)
+        await another_worker.invalidate(cache, user.id)
+
+        auth_user = await get_user_from_access_token(
+            db=None, access_token=access_token, user_service=user_service, cache=cache
+        )
+
+        user_service.get_by_id.assert_called_once()
+        assert auth_user.role == UserRole.USER
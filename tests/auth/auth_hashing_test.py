@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import pytest
+
+from app.auth.exceptions import PasswordHasherBusy
+from app.auth.hashing import PasswordHasher
+
+
+@pytest.fixture
+async def password_hasher():
+    hasher = PasswordHasher(max_workers=2, max_pending=2, rounds=4)
+    yield hasher
+    await hasher.shutdown()
+
+
+class TestPasswordHasher:
+
+    async def test_hash_and_check(self, password_hasher):
+        hashed_password = await password_hasher.hash("strongpassword123!")
+
+        assert await password_hasher.check("strongpassword123!", hashed_password)
+        assert not await password_hasher.check("wrongpassword123!", hashed_password)
+
+    async def test_rejects_when_busy(self, password_hasher):
+        results = await asyncio.gather(
+            *(password_hasher.hash("strongpassword123!") for _ in range(3)),
+            return_exceptions=True,
+        )
+
+        assert isinstance(results[2], PasswordHasherBusy)
+        assert password_hasher.stats().rejected == 1
+        assert password_hasher.stats().pending == 0
+
+    async def test_shutdown_does_not_block_the_event_loop(self, password_hasher):
+        call = asyncio.create_task(password_hasher.run(time.sleep, 0.3))
+        await asyncio.sleep(0.05)
+
+        shutdown = asyncio.create_task(password_hasher.shutdown())
+        started_at = time.perf_counter()
+        await asyncio.sleep(0.01)
+
+        assert time.perf_counter() - started_at < 0.2
+        await shutdown
+        await call
@@ -1,5 +1,17 @@
 class TestRegisterUser:
 
+    def test_query_budget(self, test_client, assert_max_queries):
+        user_data = {
+            "username": "testuser",
+            "email": "test@example.com",
+            "password": "strongpassword123!",
+        }
+        # the email and username checks, the insert, the reload with the categories
+        with assert_max_queries(5):
+            response = test_client.post("/auth/register", json=user_data)
+
+        assert response.status_code == 201
+
     def test_success(self, test_client):
         user_data = {
             "username": "testuser",
@@ -45,3 +57,32 @@ class TestRegisterUser:
             "value is not a valid email address: "
             "The email address is not valid. It must have exactly one @-sign."
         )
+
+
+class TestGetAccessToken:
+
+    def test_user_is_read_from_the_primary(self, test_client, mocker):
+        user_data = {
+            "username": "testuser",
+            "email": "test@example.com",
+            "password": "strongpassword123!",
+        }
+        test_client.post("/auth/register", json=user_data)
+        response = test_client.post(
+            "/auth/login",
+            data={"username": "testuser", "password": "strongpassword123!"},
+        )
+        refresh_token = response.cookies.get("refreshToken") or next(
+            cookie.split(";")[0].split("=", 1)[1]
+            for cookie in response.headers.get_list("set-cookie")
+            if cookie.startswith("refreshToken=")
+        )
+        # a lagging replica, which does not have the user yet
+        mocker.patch("app.database.replica_session", side_effect=AssertionError)
+
+        response = test_client.post(
+            "/auth/token", headers={"Cookie": f"refreshToken={refresh_token}"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["access_token"]
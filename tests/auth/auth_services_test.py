@@ -0,0 +1,110 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.auth.models import RefreshTokenModel
+from app.auth.services import TokenService
+from app.auth.utils import hash_refresh_token, is_refresh_token_expired
+from app.config import settings
+from app.external.redis_db.services import RedisService
+from app.users.models import UserModel
+
+
+@pytest.fixture
+async def user_id(db_session):
+    user = UserModel(username="user", email="user@example.com")
+    db_session.add(user)
+    await db_session.commit()
+
+    return user.id
+
+
+class TestTokenService:
+
+    async def test_only_the_digest_is_stored(self, db_session, user_id):
+        value = await TokenService().create_refresh_token(db_session, user_id)
+
+        token = await db_session.scalar(select(RefreshTokenModel))
+
+        assert token.token_digest == hash_refresh_token(value)
+        assert value not in token.token_digest
+
+    async def test_session_store_lookup_without_database(
+        self, db_session, user_id, assert_max_queries
+    ):
+        service = TokenService(RedisService())
+        value = await service.create_refresh_token(db_session, user_id)
+
+        with assert_max_queries(0):
+            session = await service.get_refresh_token_by_value(db_session, value)
+
+        assert session.user_id == user_id
+
+        await service.expire_refresh_token(db_session, session.uuid)
+
+        # the expired token is read from the database and not stored again
+        session = await service.get_refresh_token_by_value(db_session, value)
+        assert is_refresh_token_expired(session)
+        key = f"session:{hash_refresh_token(value)}"
+        assert await service.session_store.client.exists(key) == 0
+
+    async def test_session_revoked_during_lookup_is_not_stored(
+        self, db_session, user_id, mocker
+    ):
+        service = TokenService(RedisService())
+        value = await service.create_refresh_token(db_session, user_id)
+        key = f"session:{hash_refresh_token(value)}"
+        await service.session_store.client.delete(key)  # evicted
+        token = await db_session.scalar(select(RefreshTokenModel))
+
+        store_session = service._store_session
+
+        async def logout_then_store(*args, **kwargs):
+            # the logout commits between the read and the write of the lookup
+            await service.expire_refresh_token(db_session, token.uuid)
+            await store_session(*args, **kwargs)
+
+        mocker.patch.object(service, "_store_session", side_effect=logout_then_store)
+        await service.get_refresh_token_by_value(db_session, value)
+
+        assert await service.session_store.client.exists(key) == 0
+        session = await service.get_refresh_token_by_value(db_session, value)
+        assert is_refresh_token_expired(session)
+
+    async def test_unknown_token(self, db_session):
+        service = TokenService(RedisService())
+
+        assert await service.get_refresh_token_by_value(db_session, "unknown") is None
+
+    async def test_oldest_sessions_are_revoked(self, db_session, user_id, mocker):
+        mocker.patch.object(settings, "MAX_SESSIONS_PER_USER", 2)
+        service = TokenService(RedisService())
+
+        values = [
+            await service.create_refresh_token(db_session, user_id) for _ in range(3)
+        ]
+
+        assert await service.get_refresh_token_by_value(db_session, values[0]) is None
+        assert await service.get_refresh_token_by_value(db_session, values[2])
+
+    async def test_expired_tokens_are_purged_in_batches(self, db_session, user_id):
+        now = datetime.utcnow()
+        db_session.add_all(
+            RefreshTokenModel(
+                uuid=str(uuid.uuid4()),
+                user_id=user_id,
+                token_digest=hash_refresh_token(str(i)),
+                expires_at=now + timedelta(days=-1 if i < 5 else 1),
+            )
+            for i in range(6)
+        )
+        await db_session.commit()
+
+        purged = await TokenService().purge_expired_tokens(db_session, batch_size=2)
+
+        remaining = await db_session.scalar(
+            select(func.count()).select_from(RefreshTokenModel)
+        )
+        assert (purged, remaining) == (5, 1)
@@ -1,12 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
 from app.auth.exceptions import AccessTokenRequired
-from app.books.exceptions import NotValidISBN
+from app.auth.utils import generate_access_token
+from app.books.exceptions import ISBNBatchTooLarge, NotValidISBN
+from app.books.schemas import Author, Book, Category
+from app.books.services import BookService
+from app.books.utils import encode_cursor
+from app.config import settings
+from app.database import async_engine
+from app.external.redis_db.cache import local_cache
+from app.external.redis_db.services import RedisService
+from app.users.cache import user_cache
+from app.users.models import UserModel
+from app.users.schemas import MembershipStatus, UserRole
+from app.users.services import UserService
+
+
+def make_auth_headers(unavailable_categories: list[int] = [], user_id: int = 1) -> dict:
+    user = SimpleNamespace(
+        id=user_id,
+        role=UserRole.USER,
+        library_member=SimpleNamespace(membership_status=MembershipStatus.ACTIVE),
+        unavailable_book_categories=[
+            SimpleNamespace(id=id) for id in unavailable_categories
+        ],
+    )
+    return {"Authorization": f"Bearer {generate_access_token(user)}"}
+
+
+@pytest.fixture
+def auth_headers():
+    return make_auth_headers()
 
 
 class TestGetBookByISBN:
 
     def test_not_valid_isbn(self, test_client):
         isbn = "12345678"
-        response = test_client.get(f"books/by-isbn/{isbn}", headers={"Authorization": "Bearer token"})
+        response = test_client.get(
+            f"books/by-isbn/{isbn}", headers={"Authorization": "Bearer token"}
+        )
 
         assert response.status_code == 422
         assert response.json()["detail"] == NotValidISBN.DETAIL
@@ -18,3 +53,175 @@ class TestGetBookByISBN:
 
         assert response.status_code == 403
         assert response_json["detail"] == AccessTokenRequired.DETAIL
+
+    async def test_stale_refresh_releases_its_connection(
+        self, test_client, auth_headers, db_session
+    ):
+        book = Book(
+            isbn="0000000042", title="Stale", language="en", publication_date="2001"
+        )
+        cache = RedisService()
+        await BookService().create_books(db_session, [book], cache)
+
+        for _ in range(3):
+            response = test_client.get("books/by-isbn/0000000042", headers=auth_headers)
+            assert response.status_code == 200
+
+            # the value is served stale and refreshed in the background
+            local_cache.values.clear()
+            async for key in cache.client.scan_iter("fresh:*"):
+                await cache.client.delete(key)
+
+        await cache.disconnect()
+
+        assert async_engine.pool.checkedout() == 0
+
+
+class TestGetBooksByISBNs:
+
+    def test_not_valid_isbn(self, test_client, auth_headers):
+        isbns = ["0704334801", "12345678"]
+        response = test_client.post(
+            "books/by-isbn/batch", json={"isbns": isbns}, headers=auth_headers
+        )
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == NotValidISBN.DETAIL
+
+    def test_too_many_isbns(self, test_client, auth_headers):
+        isbns = ["0704334801"] * (settings.ISBN_BATCH_MAX_SIZE + 1)
+        response = test_client.post(
+            "books/by-isbn/batch", json={"isbns": isbns}, headers=auth_headers
+        )
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == ISBNBatchTooLarge.DETAIL
+
+
+class TestGetBooksByCategory:
+
+    @pytest.mark.parametrize("last_id", [True, 2**31, -(2**31) - 1, 1.5])
+    def test_cursor_out_of_range(self, test_client, auth_headers, last_id):
+        response = test_client.get(
+            "books/by-category/fiction",
+            params={"cursor": encode_cursor(last_id)},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 400
+
+    async def test_query_budget(
+        self, test_client, auth_headers, db_session, assert_max_queries
+    ):
+        books = [
+            Book(
+                isbn=f"97800000002{i:02d}",
+                title=f"Book {i}",
+                language="en",
+                publication_date="2001",
+                authors=[Author(name=f"author {i}"), Author(name="common author")],
+                categories=[Category(name="budget category")],
+            )
+            for i in range(20)
+        ]
+        cache = RedisService()
+        await BookService().create_books(db_session, books, cache)
+        await cache.disconnect()
+
+        # the books, then their authors and categories, whatever the page size
+        with assert_max_queries(3):
+            response = test_client.get(
+                "books/by-category/budget category", headers=auth_headers
+            )
+
+        assert response.status_code == 200
+        assert len(response.json()["books"]) == 20
+
+        with assert_max_queries(0):
+            response = test_client.get(
+                "books/by-category/budget category", headers=auth_headers
+            )
+
+        assert response.status_code == 200
+
+    async def test_unavailable_categories_are_excluded(self, test_client, db_session):
+        books = [
+            Book(
+                isbn=f"97800000003{i:02d}",
+                title=f"Book {i}",
+                language="en",
+                publication_date="2001",
+                categories=[Category(name="fiction")]
+                + ([Category(name="horror")] if i % 2 else []),
+            )
+            for i in range(6)
+        ]
+        cache = RedisService()
+        await BookService().create_books(db_session, books, cache)
+        await cache.disconnect()
+        horror = await BookService().upsert_categories(db_session, ["horror"])
+
+        unrestricted = test_client.get(
+            "books/by-category/fiction", headers=make_auth_headers()
+        )
+        restricted = test_client.get(
+            "books/by-category/fiction", headers=make_auth_headers([horror["horror"]])
+        )
+
+        assert len(unrestricted.json()["books"]) == 6
+        assert [book["isbn"] for book in restricted.json()["books"]] == [
+            book.isbn for book in books[::2]
+        ]
+
+    async def test_restriction_change_applies_to_issued_tokens(
+        self, test_client, db_session
+    ):
+        books = [
+            Book(
+                isbn=f"97800000004{i:02d}",
+                title=f"Book {i}",
+                language="en",
+                publication_date="2001",
+                categories=[Category(name="fiction")]
+                + ([Category(name="horror")] if i % 2 else []),
+            )
+            for i in range(4)
+        ]
+        cache = RedisService()
+        await BookService().create_books(db_session, books, cache)
+        horror = await BookService().upsert_categories(db_session, ["horror"])
+        user = UserModel(username="reader", email="reader@example.com")
+        db_session.add(user)
+        await db_session.commit()
+        # issued before the change, without restrictions in its claims
+        headers = make_auth_headers(user_id=user.id)
+
+        before = test_client.get("books/by-category/fiction", headers=headers)
+        await UserService().add_unavailable_categories(
+            db_session, user.id, [horror["horror"]], cache
+        )
+        after = test_client.get("books/by-category/fiction", headers=headers)
+
+        await cache.client.delete(user_cache._changed_key(user.id))
+        await cache.disconnect()
+
+        assert len(before.json()["books"]) == 4
+        assert [book["isbn"] for book in after.json()["books"]] == [
+            book.isbn for book in books[::2]
+        ]
+
+
+class TestSearchBooks:
+
+    @pytest.mark.parametrize(
+        "cursor", [(float("nan"), 1), (1e39, 1), (True, 1), (0.5, 2**31)]
+    )
+    def test_ranked_cursor_out_of_range(self, test_client, auth_headers, cursor):
+        response = test_client.post(
+            "books/search",
+            params={"cursor": encode_cursor(*cursor)},
+            json={"query": "night"},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 400
@@ -0,0 +1,70 @@
+from sqlalchemy import select, text
+
+from app.books.models import BookModel
+from app.books.schemas import Author, Book, Category
+from app.books.services import BookService
+
+
+class TestGetBooksByCategory:
+
+    async def test_category_lookup_uses_indexes(self, db_session):
+        books = [
+            Book(
+                isbn=f"97800000000{i:02d}",
+                title=f"Book {i}",
+                language="en",
+                publication_date="2001",
+                authors=[Author(name=f"author {i % 5}")],
+                categories=[Category(name=f"category {i % 10}")],
+            )
+            for i in range(50)
+        ]
+        await BookService().create_books(db_session, books)
+
+        query = select(BookModel).filter(BookModel.categories.any(name="category 1"))
+        statement = query.compile(
+            db_session.bind, compile_kwargs={"literal_binds": True}
+        )
+
+        # the tables are tiny, so make the planner pick an index whenever it can
+        await db_session.execute(text("SET LOCAL enable_seqscan = off"))
+        result = await db_session.execute(text(f"EXPLAIN {statement}"))
+        plan = "\n".join(row[0] for row in result)
+
+        assert "Seq Scan" not in plan
+        assert "category_name_idx" in plan
+        assert "book_category_category_id_idx" in plan
+
+
+class TestUpsertCategories:
+
+    async def test_existing_and_new_names(self, db_session):
+        service = BookService()
+        existing = await service.upsert_categories(db_session, ["drama", "poetry"])
+
+        ids = await service.upsert_categories(
+            db_session, ["poetry", "art", "drama", "art"]
+        )
+
+        assert ids["drama"] == existing["drama"]
+        assert ids["poetry"] == existing["poetry"]
+        assert set(ids) == {"art", "drama", "poetry"}
+
+
+class TestCreateBooks:
+
+    async def test_books_created_concurrently_are_skipped(self, db_session, mocker):
+        service = BookService()
+        books = [
+            Book(
+                isbn="9780000000500",
+                title="Book",
+                language="en",
+                publication_date="2001",
+            )
+        ]
+        await service.create_books(db_session, books)
+        # as if another writer created the book after the check
+        mocker.patch.object(service, "get_existing_isbns", return_value=set())
+
+        assert await service.create_books(db_session, books) == 0
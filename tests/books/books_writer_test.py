@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.books.models import BookModel
+from app.books.schemas import Book
+from app.books.services import BookService
+from app.books.writer import BookWriter
+from app.external.redis_db.services import RedisService
+
+
+def make_writer(durable: bool) -> BookWriter:
+    return BookWriter(
+        batch_size=3,
+        flush_interval=0.05,
+        max_pending=100,
+        durable=durable,
+        stream="test:books:new",
+        claim_idle=60,
+    )
+
+
+def make_books(count: int) -> list[Book]:
+    return [
+        Book(
+            isbn=f"97800000001{i:02d}",
+            title=f"Book {i}",
+            language="en",
+            publication_date="2001",
+        )
+        for i in range(count)
+    ]
+
+
+async def count_books(db_session) -> int:
+    return await db_session.scalar(select(func.count()).select_from(BookModel))
+
+
+@pytest.fixture(autouse=True)
+def writer_session(mocker, db_session):
+    # the shared engine's connections belong to the event loops of other tests
+    session = sessionmaker(bind=db_session.bind, class_=AsyncSession)
+    mocker.patch("app.books.writer.async_session", session)
+
+
+class TestBookWriter:
+
+    async def test_books_are_deduplicated_and_batched(self, db_session):
+        writer = make_writer(durable=False)
+        writer.start(RedisService())
+
+        books = make_books(7)
+        await writer.submit(*books, books[0])
+        await writer.stop()
+
+        assert await count_books(db_session) == 7
+        assert writer.written == 7
+        assert writer.flushes == 3
+        assert writer.stats().pending == 0
+
+    async def test_durable_books_are_removed_from_the_stream_once_saved(
+        self, db_session
+    ):
+        cache = RedisService()
+        await cache.client.delete("test:books:new")
+        writer = make_writer(durable=True)
+        writer.start(cache)
+
+        await writer.submit(*make_books(4))
+        for _ in range(50):
+            if writer.written == 4:
+                break
+            await asyncio.sleep(0.05)
+        await writer.stop()
+
+        assert await count_books(db_session) == 4
+        assert await cache.client.xlen("test:books:new") == 0
+
+    async def test_full_stream_drops_the_new_books(self, db_session):
+        cache = RedisService()
+        await cache.client.delete("test:books:new")
+        writer = make_writer(durable=True)
+        writer.max_pending = 3
+        writer.cache = cache
+
+        await writer.submit(*make_books(5))
+
+        assert await cache.client.xlen("test:books:new") == 3
+        assert writer.dropped == 2
+        await cache.client.delete("test:books:new")
+
+    async def test_failed_flush_counts_the_lost_books(self, mocker):
+        writer = make_writer(durable=False)
+        mocker.patch.object(BookService, "create_books", side_effect=OSError)
+
+        await writer.flush([(None, book) for book in make_books(2)])
+
+        assert writer.failed_flushes == 1
+        assert writer.dropped == 2
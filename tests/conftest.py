@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+
 import pytest
 from alembic import command
 from alembic.config import Config
@@ -5,6 +7,7 @@ from fastapi.testclient import TestClient
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from app.config import settings
+from app.database import capture_queries
 from app.main import Base, app
 
 
@@ -16,7 +19,8 @@ def apply_migrations():
 
 @pytest.fixture()
 def test_client():
-    return TestClient(app)
+    with TestClient(app) as client:
+        yield client
 
 
 @pytest.fixture()
@@ -43,3 +47,20 @@ async def clear_db(db_session):
         connection.close()
 
     yield
+
+
+@pytest.fixture()
+def assert_max_queries():
+    """Fails the test if the block executes more SQL statements than allowed"""
+
+    @contextmanager
+    def assert_max_queries(count: int):
+        with capture_queries() as statements:
+            yield statements
+
+        assert len(statements) <= count, (
+            f"{len(statements)} queries executed, expected at most {count}:\n"
+            + "\n".join(statements)
+        )
+
+    return assert_max_queries
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+from fastapi import Request, Response
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import async_engine, create_db_engine, get_db, get_read_db
+from app.metrics import db_pool_checkout_timeouts
+
+
+class TestCreateDbEngine:
+
+    async def test_checkout_timeouts_are_counted(self, mocker):
+        mocker.patch.multiple(
+            settings, DB_POOL_SIZE=1, DB_MAX_OVERFLOW=0, DB_POOL_TIMEOUT=0.1
+        )
+        engine = create_db_engine(settings.DATABASE_URL)
+        timeouts = db_pool_checkout_timeouts.series.get((), 0)
+
+        async with engine.connect():
+            with pytest.raises(sa_exc.TimeoutError):
+                await engine.connect().start()
+        await engine.dispose()
+
+        assert db_pool_checkout_timeouts.series[()] == timeouts + 1
+
+    async def test_pgbouncer_mode_disables_the_statement_caches(self, mocker):
+        mocker.patch.object(settings, "DB_PGBOUNCER", True)
+        engine = create_db_engine(settings.DATABASE_URL)
+
+        async with engine.connect() as connection:
+            raw_connection = await connection.get_raw_connection()
+            cache_size = raw_connection.connection._connection._stmt_cache.get_max_size()
+        await engine.dispose()
+
+        assert cache_size == 0
+
+
+def make_request(method: str, cookie: str = "") -> Request:
+    headers = [(b"cookie", cookie.encode())] if cookie else []
+    return Request({"type": "http", "method": method, "headers": headers})
+
+
+@pytest.fixture
+def replica_engine(mocker):
+    # a second engine of the same database stands in for the replica
+    engine = create_db_engine(settings.DATABASE_URL)
+    mocker.patch("app.database.replica_engine", engine)
+    mocker.patch(
+        "app.database.replica_session",
+        sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession),
+    )
+    mocker.patch.object(settings, "READ_YOUR_WRITES_WINDOW", 5)
+
+    return engine
+
+
+class TestReadReplicaRouting:
+
+    async def test_writes_are_remembered_by_the_client(self, replica_engine):
+        response = Response()
+
+        async for db in get_db(make_request("POST"), response):
+            assert db.bind is async_engine
+
+        assert settings.LAST_WRITE_COOKIE_KEY in response.headers["set-cookie"]
+
+    async def test_reads_use_the_replica(self, replica_engine):
+        async for db in get_read_db(make_request("GET")):
+            assert db.bind is replica_engine
+
+    async def test_reads_after_a_write_use_the_primary(self, replica_engine):
+        recent = f"{settings.LAST_WRITE_COOKIE_KEY}={time.time() - 1}"
+        old = f"{settings.LAST_WRITE_COOKIE_KEY}={time.time() - 10}"
+
+        async for db in get_read_db(make_request("GET", recent)):
+            assert db.bind is async_engine
+        async for db in get_read_db(make_request("GET", old)):
+            assert db.bind is replica_engine
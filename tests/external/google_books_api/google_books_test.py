@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+import pytest
+
+from app.config import settings
+from app.external.google_books_api.services import (
+    GoogleBooksService,
+    create_google_books_client,
+)
+
+VOLUMES_RESPONSE = json.dumps(
+    {
+        "totalItems": 1,
+        "items": [
+            {
+                "volumeInfo": {
+                    "title": "Test book",
+                    "language": "en",
+                    "publishedDate": "2001",
+                    "authors": ["Test Author"],
+                    "categories": ["Fiction"],
+                }
+            }
+        ],
+    }
+).encode()
+
+
+class StubServer:
+    """Minimal keep-alive HTTP/1.1 server counting the opened connections"""
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = 0
+        self.server = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                self.requests += 1
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(VOLUMES_RESPONSE)).encode() + b"\r\n"
+                    b"\r\n" + VOLUMES_RESPONSE
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+@pytest.fixture
+async def stub_server():
+    server = StubServer()
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.fixture
+async def google_books_service(stub_server):
+    client = create_google_books_client(stub_server.base_url)
+    yield GoogleBooksService(client)
+    await client.aclose()
+
+
+class TestGoogleBooksService:
+
+    async def test_get_book_by_isbn(self, google_books_service):
+        book = await google_books_service.get_book_by_isbn("0704334801")
+
+        assert book.isbn == "0704334801"
+        assert book.title == "Test book"
+        assert book.categories[0].name == "fiction"
+
+    async def test_sequential_lookups_reuse_connection(
+        self, stub_server, google_books_service
+    ):
+        for _ in range(300):
+            assert await google_books_service.get_book_by_isbn("0704334801")
+
+        assert stub_server.requests == 300
+        assert stub_server.connections == 1
+
+    async def test_concurrent_lookups_reuse_connections(
+        self, stub_server, google_books_service
+    ):
+        concurrency = settings.GOOGLE_BOOKS_MAX_KEEPALIVE_CONNECTIONS
+
+        async def lookup_batch():
+            books = await asyncio.gather(
+                *(
+                    google_books_service.get_book_by_isbn("0704334801")
+                    for _ in range(concurrency)
+                )
+            )
+            assert all(books)
+
+        await lookup_batch()
+        warm_connections = stub_server.connections
+
+        for _ in range(30):
+            await lookup_batch()
+
+        assert stub_server.requests == concurrency * 31
+        assert warm_connections <= concurrency
+        assert stub_server.connections == warm_connections
@@ -1,7 +1,12 @@
+import asyncio
 from asyncio import sleep
+from app.config import settings
+from app.external.redis_db.cache import LocalCache
+from app.external.redis_db.keys import cache_namespaces
 from app.external.redis_db.services import RedisService
 from app.external.redis_db.schemas import RedisData
 import pytest
+from fastapi import BackgroundTasks
 
 
 @pytest.fixture
@@ -52,3 +57,172 @@ class TestRedisService:
 
         assert ttl <= 0
         assert result is None
+
+    async def test_get_or_load_coalesces_concurrent_misses(self, redis_service):
+        await redis_service.client.delete("test_key", "fresh:test_key")
+        loads = 0
+
+        async def load():
+            nonlocal loads
+            loads += 1
+            await sleep(0.1)
+            return b"test_value"
+
+        values = await asyncio.gather(
+            *[redis_service.get_or_load("test_key", load, ttl=10) for _ in range(20)]
+        )
+
+        assert values == [b"test_value"] * 20
+        assert loads == 1
+        assert await redis_service.get_by_key("test_key") == "test_value"
+
+    async def test_get_or_load_waits_for_other_worker(self, redis_service):
+        await redis_service.client.delete("test_key")
+        lock = redis_service.client.lock("lock:test_key", timeout=10)
+        await lock.acquire()
+
+        async def load():
+            raise AssertionError("the value is loaded by the other worker")
+
+        async def load_in_other_worker():
+            await sleep(0.2)
+            await redis_service.set_key(RedisData(key="test_key", value="test_value"))
+            await lock.release()
+
+        value, _ = await asyncio.gather(
+            redis_service.get_or_load("test_key", load, ttl=10),
+            load_in_other_worker(),
+        )
+
+        assert value == b"test_value"
+
+    async def test_get_or_load_serves_stale_value(self, redis_service):
+        await redis_service.client.delete("test_key")
+        data = RedisData(key="test_key", value="stale_value", ttl=10)
+        await redis_service.set_key(data)
+
+        async def load():
+            return b"fresh_value"
+
+        refresh = BackgroundTasks()
+        value = await redis_service.get_or_load(
+            "test_key",
+            load,
+            ttl=10,
+            stale_ttl=10,
+            worker=refresh,
+            background_load=load,
+        )
+
+        assert value == b"stale_value"
+
+        await refresh()
+        value = await redis_service.get_or_load(
+            "test_key",
+            load,
+            ttl=10,
+            stale_ttl=10,
+            worker=refresh,
+            background_load=load,
+        )
+
+        assert value == b"fresh_value"
+        assert await redis_service.client.ttl("fresh:test_key") == 10
+
+    async def test_invalidate_tags(self, redis_service):
+        await redis_service.set_key(
+            RedisData(key="test_key", value="test_value", ttl=10, tags=["a", "b"])
+        )
+        await redis_service.set_key(
+            RedisData(key="other_key", value="other_value", ttl=20, tags=["b"])
+        )
+
+        assert await redis_service.client.ttl("tag:a") == 10
+        assert await redis_service.client.ttl("tag:b") == 20
+
+        await redis_service.invalidate_tags("a")
+
+        assert await redis_service.get_by_key("test_key") is None
+        assert await redis_service.get_by_key("other_key") == "other_value"
+
+        await redis_service.invalidate_tags("b")
+
+        assert await redis_service.get_by_key("other_key") is None
+        assert not await redis_service.client.exists("tag:a", "tag:b")
+
+    async def test_value_invalidated_while_loaded_is_not_set(self, redis_service):
+        await redis_service.delete_by_key("tagged_key")
+        data = RedisData(key="tagged_key", value="test_value", ttl=10, tags=["a"])
+        tag_versions = await redis_service.get_tag_versions("a")
+
+        await redis_service.invalidate_tags("a")
+        await redis_service.set_key(data, tag_versions=tag_versions)
+
+        assert await redis_service.get_by_key("tagged_key") is None
+
+        await redis_service.set_key(
+            data, tag_versions=await redis_service.get_tag_versions("a")
+        )
+
+        assert await redis_service.get_by_key("tagged_key") == "test_value"
+        assert await redis_service.client.ttl("tag:a") == 10
+
+    async def test_make_key(self, redis_service, mocker):
+        mocker.patch.dict(cache_namespaces.versions, clear=True)
+        await redis_service.client.delete("namespace:test")
+
+        key = await redis_service.make_key("test", {"b": 1, "a": "x"}, 50, None)
+        same_key = await redis_service.make_key("test", {"a": "x", "b": 1}, 50, None)
+        other_key = await redis_service.make_key("test", {"a": "y", "b": 1}, 50, None)
+
+        assert key == same_key != other_key
+        assert key.startswith("v1:test:") and len(key) == len("v1:test:") + 32
+        assert await redis_service.make_key("test", 42, hashed=False) == "v1:test:42"
+
+        await redis_service.bump_namespace("test")
+
+        assert await redis_service.make_key("test", 42, hashed=False) == "v2:test:42"
+
+
+class TestLocalCache:
+
+    async def test_hit_is_served_from_memory(self, redis_service):
+        cache = RedisService(redis_service.pool, LocalCache(max_size=10, ttl=10))
+        await cache.set_key(RedisData(key="test_key", value="test_value", ttl=10))
+        await redis_service.client.delete("test_key")
+
+        assert await cache.get_by_key("test_key") == "test_value"
+        assert cache.local_cache.stats().hits == 1
+
+    async def test_other_workers_are_invalidated(self, redis_service):
+        worker = RedisService(redis_service.pool, LocalCache(max_size=10, ttl=10))
+        other_worker = RedisService(redis_service.pool, LocalCache(max_size=10, ttl=10))
+        listener = asyncio.create_task(other_worker.local_cache.listen())
+        await sleep(0.1)
+
+        await worker.set_key(RedisData(key="test_key", value="old_value", ttl=10))
+        assert await other_worker.get_by_key("test_key") == "old_value"
+
+        await worker.set_key(RedisData(key="test_key", value="new_value", ttl=10))
+        await sleep(0.1)
+        listener.cancel()
+
+        assert await other_worker.get_by_key("test_key") == "new_value"
+        assert other_worker.local_cache.stats().invalidations == 1
+
+    async def test_invalid_message_does_not_stop_the_listener(self, redis_service):
+        worker = RedisService(redis_service.pool, LocalCache(max_size=10, ttl=10))
+        other_worker = RedisService(redis_service.pool, LocalCache(max_size=10, ttl=10))
+        other_worker.local_cache.start()
+        await sleep(0.1)
+
+        await worker.set_key(RedisData(key="test_key", value="old_value", ttl=10))
+        assert await other_worker.get_by_key("test_key") == "old_value"
+
+        await redis_service.client.publish(settings.CACHE_INVALIDATION_CHANNEL, "{")
+        await worker.set_key(RedisData(key="test_key", value="new_value", ttl=10))
+        await sleep(0.1)
+
+        assert not other_worker.local_cache.listener.done()
+        await other_worker.local_cache.stop()
+        assert await other_worker.get_by_key("test_key") == "new_value"
@@ -0,0 +1,34 @@
+from app.metrics import Histogram
+
+
+class TestHistogram:
+
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram("test_seconds", "Test", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, "/books/{isbn}")
+
+        assert histogram.samples() == [
+            'test_seconds_bucket{route="/books/{isbn}",le="0.1"} 2',
+            'test_seconds_bucket{route="/books/{isbn}",le="1.0"} 3',
+            'test_seconds_bucket{route="/books/{isbn}",le="+Inf"} 4',
+            'test_seconds_sum{route="/books/{isbn}"} 2.65',
+            'test_seconds_count{route="/books/{isbn}"} 4',
+        ]
+
+
+class TestMetricsEndpoint:
+
+    def test_requests_are_recorded_by_route_template(self, test_client):
+        test_client.get("/healthcheck")
+        test_client.get("/books/by-isbn/0000000000")
+
+        response = test_client.get("/metrics")
+
+        assert response.status_code == 200
+        assert (
+            'http_request_duration_seconds_count{method="GET",route="/healthcheck",'
+            'status="200"}' in response.text
+        )
+        assert 'route="/books/by-isbn/{isbn}"' in response.text
+        assert "/books/by-isbn/0000000000" not in response.text
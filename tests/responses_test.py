@@ -0,0 +1,64 @@
+import gzip
+
+from starlette.requests import Request
+
+from app.books.schemas import Book, Books
+from app.responses import CachedJSONResponse, accepts_gzip, encode_response_body
+
+
+def make_request(accept_encoding: str) -> Request:
+    headers = [(b"accept-encoding", accept_encoding.encode())]
+    return Request({"type": "http", "headers": headers})
+
+
+class TestCachedJSONResponse:
+
+    books = Books(
+        books=[
+            Book(isbn=str(i), title=f"Book {i}", language="en", publication_date="2001")
+            for i in range(100)
+        ]
+    )
+
+    def test_small_body_is_not_compressed(self):
+        book = self.books.books[0]
+        body = encode_response_body(book)
+        response = CachedJSONResponse(body, make_request("gzip"))
+
+        assert response.body == book.model_dump_json().encode()
+        assert "content-encoding" not in response.headers
+
+    def test_compressed_body_is_sent_as_is(self):
+        body = encode_response_body(self.books)
+        response = CachedJSONResponse(body, make_request("gzip, deflate"))
+
+        assert response.body == body
+        assert response.headers["content-encoding"] == "gzip"
+        assert gzip.decompress(response.body) == self.books.model_dump_json().encode()
+
+    def test_compressed_body_is_decompressed_for_other_clients(self):
+        body = encode_response_body(self.books)
+        response = CachedJSONResponse(body, make_request("identity"))
+
+        assert response.body == self.books.model_dump_json().encode()
+        assert "content-encoding" not in response.headers
+
+    def test_compressed_body_is_decompressed_for_refused_gzip(self):
+        body = encode_response_body(self.books)
+        response = CachedJSONResponse(body, make_request("gzip;q=0, identity"))
+
+        assert response.body == self.books.model_dump_json().encode()
+        assert "content-encoding" not in response.headers
+
+
+class TestAcceptsGzip:
+
+    def test_quality_values(self):
+        assert accepts_gzip("gzip")
+        assert accepts_gzip("deflate, gzip;q=0.5")
+        assert accepts_gzip("*")
+        assert not accepts_gzip("gzip;q=0")
+        assert not accepts_gzip("gzip; q=0.0, *")
+        assert not accepts_gzip("*;q=0")
+        assert not accepts_gzip("br, deflate")
+        assert not accepts_gzip("")
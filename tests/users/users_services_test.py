@@ -0,0 +1,67 @@
+import pytest
+
+from app.books.models import CategoryModel
+from app.users.exceptions import UserNotFound
+from app.users.models import UserModel
+from app.users.services import UserService
+
+
+@pytest.fixture
+async def users_and_categories(db_session):
+    users = [
+        UserModel(username=f"user{i}", email=f"user{i}@example.com") for i in range(3)
+    ]
+    categories = [CategoryModel(name=f"category {i}") for i in range(2)]
+    db_session.add_all(users + categories)
+    await db_session.commit()
+
+    return [user.id for user in users], [category.id for category in categories]
+
+
+class TestChangeUnavailableCategories:
+
+    async def test_users_are_changed_with_one_statement(
+        self, db_session, users_and_categories, assert_max_queries
+    ):
+        users_id, categories_id = users_and_categories
+        service = UserService()
+
+        # the check of the users and the insert
+        with assert_max_queries(2):
+            added = await service.change_users_unavailable_categories(
+                db_session, users_id, categories_id + [0], unavailable=True
+            )
+        again = await service.change_users_unavailable_categories(
+            db_session, users_id, categories_id, unavailable=True
+        )
+        removed = await service.change_users_unavailable_categories(
+            db_session, users_id[:1], categories_id, unavailable=False
+        )
+
+        assert (added, again, removed) == (6, 0, 2)
+
+    async def test_missing_user(self, db_session, users_and_categories):
+        users_id, categories_id = users_and_categories
+
+        with pytest.raises(UserNotFound):
+            await UserService().change_users_unavailable_categories(
+                db_session, users_id + [0], categories_id, unavailable=True
+            )
+
+    async def test_single_user(self, db_session, users_and_categories):
+        users_id, categories_id = users_and_categories
+        service = UserService()
+
+        user = await service.add_unavailable_categories(
+            db_session, users_id[0], categories_id
+        )
+        assert {category.id for category in user.unavailable_book_categories} == set(
+            categories_id
+        )
+
+        user = await service.remove_unavailable_categories(
+            db_session, users_id[0], categories_id[:1]
+        )
+        assert [category.id for category in user.unavailable_book_categories] == [
+            categories_id[1]
+        ]